@@ -0,0 +1,77 @@
+"""
+Asynchronous TTS job API endpoints
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from loguru import logger
+
+from app.models.schemas import JobRequest, JobResponse
+from app.models.jobs import JobNotFoundError, WebhookRejected
+from app.auth import get_current_user
+
+router = APIRouter()
+
+@router.post("", response_model=JobResponse, status_code=202)
+async def create_job(
+    request: JobRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: str = Depends(get_current_user)
+) -> JobResponse:
+    """Queue a generation and return its job immediately"""
+    from main import tts_engine
+    
+    if not tts_engine:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+    
+    try:
+        job, created = await tts_engine.submit_job(
+            request.model_dump(exclude={"webhook_url", "persist"}),
+            current_user,
+            idempotency_key=idempotency_key,
+            webhook_url=request.webhook_url
+        )
+    except WebhookRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to queue job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not created:
+        # Retried submission: hand back the original job
+        response.status_code = 200
+    return JobResponse(**job)
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    current_user: str = Depends(get_current_user)
+) -> JobResponse:
+    """Get the status, progress and result of a job"""
+    from main import tts_engine
+    
+    if not tts_engine:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+    
+    try:
+        return JobResponse(**await tts_engine.get_job(job_id, current_user))
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+@router.delete("/{job_id}", response_model=JobResponse)
+async def cancel_job(
+    job_id: str,
+    current_user: str = Depends(get_current_user)
+) -> JobResponse:
+    """Cancel a job; running jobs stop shortly after"""
+    from main import tts_engine
+    
+    if not tts_engine:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+    
+    try:
+        return JobResponse(**await tts_engine.cancel_job(job_id, current_user))
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found")
@@ -2,27 +2,120 @@
 TTS API endpoints
 """
 
-import os
+import json
 import asyncio
 from pathlib import Path
-from typing import List
+from typing import Awaitable, Callable, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from loguru import logger
 
 from app.models.schemas import (
     TTSRequest, TTSResponse, BatchTTSRequest, BatchTTSResponse
 )
+from app.models.admission import AdmissionRejected
+from app.models.executor import ExecutorBusyError
+from app.models.encoders import StreamEncoder, get_encoder, media_type_for
+from app.models.streaming import StreamingUnavailable
 from app.auth import get_current_user
 from app.config import settings
 
 router = APIRouter()
 
+_PRIORITY = Query(None, description="Priority class (e.g. high, normal, low); at most the caller's own")
+
+async def _admit(tts_engine, items: List[TTSRequest], user: str, priority: Optional[str]) -> str:
+    """Admit a request's items as one unit, or reject it with 429 and Retry-After"""
+    try:
+        return await tts_engine.admit(
+            [item.model_dump(include={"text", "voice_id", "long_form"}) for item in items],
+            user,
+            priority
+        )
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _release_once(tts_engine, ticket: str) -> Callable[[], Awaitable[None]]:
+    """Release an admission ticket; later calls do nothing"""
+    released = False
+    
+    async def release():
+        nonlocal released
+        if not released:
+            released = True
+            await tts_engine.release_admission(ticket)
+    return release
+
+class _AdmittedStream(StreamingResponse):
+    """Streaming response that gives its admission ticket back however the stream ends
+
+    The body generator's ``finally`` never runs when the client is gone
+    before the body is first iterated, so the response releases it as well.
+    """
+    
+    def __init__(self, content, release: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.release()
+
+async def _generate_item(tts_engine, item: TTSRequest, user: str) -> TTSResponse:
+    """Generate speech for a single request"""
+    filename, metadata = await tts_engine.generate_speech(
+        text=item.text,
+        voice_id=item.voice_id,
+        temperature=item.temperature,
+        guidance_scale=item.guidance_scale,
+        guidance_steps=item.guidance_steps,
+        top_p=item.top_p,
+        top_k=item.top_k,
+        seed=item.seed,
+        long_form=item.long_form,
+        output_format=item.format,
+        output_sample_rate=item.sample_rate,
+        user=user
+    )
+    
+    # Build response
+    audio_url = f"/outputs/{filename}"
+    
+    return TTSResponse(
+        success=True,
+        filename=filename,
+        audio_url=audio_url,
+        metadata=metadata
+    )
+
+def _start_batch(tts_engine, items: List[TTSRequest], user: str) -> Dict[asyncio.Task, int]:
+    """Submit all batch items at once so the scheduler can pack them into model batches"""
+    # Submitting similar lengths together keeps padding inside each model batch small
+    order = sorted(range(len(items)), key=lambda idx: len(items[idx].text))
+    return {
+        asyncio.create_task(_generate_item(tts_engine, items[idx], user)): idx
+        for idx in order
+    }
+
+def _failed_item(idx: int, item: TTSRequest, error: BaseException) -> dict:
+    """Describe a batch item that could not be generated"""
+    logger.error(f"Failed to process item {idx}: {error}")
+    return {
+        "index": idx,
+        "text": item.text[:50] + "...",
+        "error": str(error)
+    }
+
 @router.post("/generate", response_model=TTSResponse)
 async def generate_speech(
     request: TTSRequest,
     background_tasks: BackgroundTasks,
+    priority: Optional[str] = _PRIORITY,
     current_user: str = Depends(get_current_user)
 ) -> TTSResponse:
     """Generate speech from text"""
@@ -32,35 +125,76 @@ async def generate_speech(
         if not tts_engine:
             raise HTTPException(status_code=503, detail="TTS engine not initialized")
         
-        # Generate speech
-        filename, metadata = await tts_engine.generate_speech(
-            text=request.text,
-            voice_id=request.voice_id,
-            temperature=request.temperature,
-            guidance_scale=request.guidance_scale,
-            top_p=request.top_p,
-            top_k=request.top_k,
-            seed=request.seed
-        )
+        ticket = await _admit(tts_engine, [request], current_user, priority)
+        try:
+            return await _generate_item(tts_engine, request, current_user)
+        finally:
+            await tts_engine.release_admission(ticket)
         
-        # Build response
-        audio_url = f"/outputs/{filename}"
+    except HTTPException:
+        raise
+    except ExecutorBusyError as e:
+        logger.warning(f"TTS generation rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"TTS generation failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/audio")
+async def generate_audio(
+    request: TTSRequest,
+    priority: Optional[str] = _PRIORITY,
+    current_user: str = Depends(get_current_user)
+) -> Response:
+    """Generate speech from text and return the audio itself in the requested format"""
+    try:
+        from main import tts_engine
         
-        return TTSResponse(
-            success=True,
-            filename=filename,
-            audio_url=audio_url,
-            metadata=metadata
-        )
+        if not tts_engine:
+            raise HTTPException(status_code=503, detail="TTS engine not initialized")
         
+        ticket = await _admit(tts_engine, [request], current_user, priority)
+        try:
+            data, metadata = await tts_engine.render_speech(
+                text=request.text,
+                voice_id=request.voice_id,
+                temperature=request.temperature,
+                guidance_scale=request.guidance_scale,
+                guidance_steps=request.guidance_steps,
+                top_p=request.top_p,
+                top_k=request.top_k,
+                seed=request.seed,
+                long_form=request.long_form,
+                output_format=request.format,
+                output_sample_rate=request.sample_rate,
+                persist=request.persist,
+                user=current_user
+            )
+        finally:
+            await tts_engine.release_admission(ticket)
+        
+    except HTTPException:
+        raise
+    except ExecutorBusyError as e:
+        logger.warning(f"TTS generation rejected: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"TTS generation failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    headers = {
+        "X-Sample-Rate": str(metadata["sample_rate"]),
+        "X-Audio-Duration": str(metadata["duration"])
+    }
+    if metadata["filename"]:
+        headers["X-Audio-Filename"] = metadata["filename"]
+    return Response(content=data, media_type=get_encoder(metadata["format"]).media_type, headers=headers)
 
 @router.post("/batch", response_model=BatchTTSResponse)
 async def batch_generate(
     request: BatchTTSRequest,
     background_tasks: BackgroundTasks,
+    priority: Optional[str] = _PRIORITY,
     current_user: str = Depends(get_current_user)
 ) -> BatchTTSResponse:
     """Generate speech for multiple texts"""
@@ -70,38 +204,23 @@ async def batch_generate(
         if not tts_engine:
             raise HTTPException(status_code=503, detail="TTS engine not initialized")
         
+        # The batch is admitted as a whole; its items are processed concurrently
+        ticket = await _admit(tts_engine, request.items, current_user, priority)
+        try:
+            tasks = _start_batch(tts_engine, request.items, current_user)
+            await asyncio.wait(tasks)
+        finally:
+            await tts_engine.release_admission(ticket)
+        
         results = []
         failed = []
         
-        # Process each item
-        for idx, item in enumerate(request.items):
-            try:
-                filename, metadata = await tts_engine.generate_speech(
-                    text=item.text,
-                    voice_id=item.voice_id,
-                    temperature=item.temperature,
-                    guidance_scale=item.guidance_scale,
-                    top_p=item.top_p,
-                    top_k=item.top_k,
-                    seed=item.seed
-                )
-                
-                audio_url = f"/outputs/{filename}"
-                
-                results.append(TTSResponse(
-                    success=True,
-                    filename=filename,
-                    audio_url=audio_url,
-                    metadata=metadata
-                ))
-                
-            except Exception as e:
-                logger.error(f"Failed to process item {idx}: {e}")
-                failed.append({
-                    "index": idx,
-                    "text": item.text[:50] + "...",
-                    "error": str(e)
-                })
+        # Report in request order
+        for task, idx in sorted(tasks.items(), key=lambda entry: entry[1]):
+            if task.exception() is not None:
+                failed.append(_failed_item(idx, request.items[idx], task.exception()))
+            else:
+                results.append(task.result())
         
         return BatchTTSResponse(
             success=len(failed) == 0,
@@ -110,10 +229,151 @@ async def batch_generate(
             total=len(request.items)
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Batch generation failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/batch/stream")
+async def batch_generate_stream(
+    request: BatchTTSRequest,
+    priority: Optional[str] = _PRIORITY,
+    current_user: str = Depends(get_current_user)
+) -> StreamingResponse:
+    """Generate speech for multiple texts, streaming each result as NDJSON when it finishes"""
+    from main import tts_engine
+    
+    if not tts_engine:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+    
+    release = _release_once(tts_engine, await _admit(tts_engine, request.items, current_user, priority))
+    
+    async def results():
+        tasks = _start_batch(tts_engine, request.items, current_user)
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    idx = tasks[task]
+                    if task.exception() is not None:
+                        line = {"success": False, **_failed_item(idx, request.items[idx], task.exception())}
+                    else:
+                        line = {"index": idx, **task.result().model_dump()}
+                    yield json.dumps(line) + "\n"
+        finally:
+            # Client went away; stop waiting on the rest
+            for task in pending:
+                task.cancel()
+            await release()
+    
+    return _AdmittedStream(results(), release, media_type="application/x-ndjson")
+
+@router.post("/stream")
+async def stream_speech(
+    request: TTSRequest,
+    priority: Optional[str] = _PRIORITY,
+    current_user: str = Depends(get_current_user)
+) -> StreamingResponse:
+    """Generate speech from text, streaming audio while it is generated (wav, pcm, ogg or opus)"""
+    from main import tts_engine
+    
+    if not tts_engine:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+    if not tts_engine.supports_streaming:
+        raise HTTPException(status_code=501, detail="Streaming requires the thread inference executor")
+    
+    # Streams are WAV unless a format is asked for
+    encoder = get_encoder(request.format if "format" in request.model_fields_set else "wav")
+    if not encoder.streamable:
+        raise HTTPException(status_code=400, detail=f"{encoder.name} output cannot be streamed")
+    stream = StreamEncoder(
+        encoder,
+        tts_engine.sample_rate,
+        encoder.output_rate(tts_engine.sample_rate, request.sample_rate)
+    )
+    
+    release = _release_once(tts_engine, await _admit(tts_engine, [request], current_user, priority))
+    try:
+        chunks = tts_engine.stream_speech(
+            text=request.text,
+            voice_id=request.voice_id,
+            temperature=request.temperature,
+            guidance_scale=request.guidance_scale,
+            guidance_steps=request.guidance_steps,
+            top_p=request.top_p,
+            top_k=request.top_k,
+            seed=request.seed
+        )
+    except StreamingUnavailable as e:
+        await release()
+        raise HTTPException(status_code=501, detail=str(e))
+    except BaseException:
+        await release()
+        raise
+    
+    async def audio():
+        yield stream.header()
+        try:
+            async for chunk in chunks:
+                data = await asyncio.to_thread(stream.write, chunk)
+                if data:
+                    yield data
+            yield await asyncio.to_thread(stream.finish)
+        except Exception as e:
+            # Headers are already sent; all we can do is end the stream
+            logger.error(f"TTS streaming failed: {e}")
+        finally:
+            await chunks.aclose()
+            await release()
+    
+    return _AdmittedStream(
+        audio(),
+        release,
+        media_type=encoder.media_type,
+        headers={"X-Sample-Rate": str(stream.sample_rate)}
+    )
+
+@router.get("/cache/stats")
+async def cache_stats(
+    current_user: str = Depends(get_current_user)
+) -> dict:
+    """Result cache hit/miss counters and size"""
+    from main import tts_engine
+    
+    if not tts_engine:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+    stats = (await tts_engine.get_stats())["cache"]
+    if stats is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **stats}
+
+@router.get("/budget/stats")
+async def budget_stats(
+    current_user: str = Depends(get_current_user)
+) -> dict:
+    """Estimated vs actual generation lengths per voice"""
+    from main import tts_engine
+    
+    if not tts_engine:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+    
+    return (await tts_engine.get_stats())["budget"]
+
+@router.get("/retention/stats")
+async def retention_stats(
+    current_user: str = Depends(get_current_user)
+) -> dict:
+    """Output usage, retention limits, and files and bytes reclaimed by the sweeper"""
+    from main import tts_engine
+    
+    if not tts_engine:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+    
+    return (await tts_engine.get_stats())["retention"]
+
 @router.get("/download/{filename}")
 async def download_audio(
     filename: str,
@@ -125,9 +385,13 @@ async def download_audio(
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
     
+    from main import tts_engine
+    if tts_engine:
+        await tts_engine.touch_output(filename)
+    
     return FileResponse(
         path=str(file_path),
-        media_type="audio/mpeg",
+        media_type=media_type_for(filename),
         filename=filename
     )
 
@@ -137,52 +401,53 @@ async def delete_audio(
     current_user: str = Depends(get_current_user)
 ) -> dict:
     """Delete generated audio file"""
-    file_path = Path(settings.OUTPUTS_DIR) / filename
+    from main import tts_engine
     
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found")
+    if not tts_engine:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
     
     try:
-        os.remove(file_path)
-        return {"success": True, "message": "File deleted successfully"}
+        deleted = await tts_engine.delete_output(Path(filename).name)
     except Exception as e:
         logger.error(f"Failed to delete file: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete file")
+    
+    if not deleted:
+        raise HTTPException(status_code=404, detail="File not found")
+    return {"success": True, "message": "File deleted successfully"}
 
 @router.get("/list")
 async def list_audio_files(
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    user: Optional[str] = None,
+    voice_id: Optional[str] = None,
+    format: Optional[str] = None,
+    created_after: Optional[float] = None,
+    created_before: Optional[float] = None,
     current_user: str = Depends(get_current_user)
 ) -> dict:
-    """List generated audio files"""
+    """List generated audio files, newest first
+
+    Pass ``next_cursor`` from a response as ``cursor`` to get the next page.
+    """
+    from main import tts_engine
+    
+    if not tts_engine:
+        raise HTTPException(status_code=503, detail="TTS engine not initialized")
+    
     try:
-        output_dir = Path(settings.OUTPUTS_DIR)
-        files = []
-        
-        # Get all audio files
-        audio_files = list(output_dir.glob("*.mp3")) + list(output_dir.glob("*.wav"))
-        audio_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-        
-        # Apply pagination
-        paginated_files = audio_files[offset:offset + limit]
-        
-        for file_path in paginated_files:
-            stat = file_path.stat()
-            files.append({
-                "filename": file_path.name,
-                "size": stat.st_size,
-                "created_at": stat.st_mtime,
-                "url": f"/outputs/{file_path.name}"
-            })
-        
-        return {
-            "files": files,
-            "total": len(audio_files),
-            "limit": limit,
-            "offset": offset
-        }
-        
+        return await tts_engine.list_outputs(
+            limit,
+            cursor,
+            user=user,
+            voice_id=voice_id,
+            format=format,
+            created_after=created_after,
+            created_before=created_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to list audio files: {e}")
-        raise HTTPException(status_code=500, detail="Failed to list files")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to list files")
@@ -3,21 +3,40 @@ Voice management API endpoints
 """
 
 import os
-import shutil
+import uuid
 from pathlib import Path
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+import aiofiles
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
 from loguru import logger
 
 from app.models.schemas import (
-    VoiceCloneRequest, VoiceCloneResponse, Voice, VoiceListResponse
+    VoiceCloneRequest, VoiceCloneResponse, Voice, VoiceListResponse, VoiceImportResponse
 )
+from app.models.reference_audio import AUDIO_EXTENSIONS
+from app.models.voice_archive import ArchiveError
 from app.auth import get_current_user
 from app.config import settings
 
 router = APIRouter()
 
+_UPLOAD_CHUNK_BYTES = 1024 ** 2
+
+async def _save_upload(upload: UploadFile, path: Path, max_bytes: int):
+    """Stream an upload to ``path`` in chunks off the event loop, stopping as soon as it exceeds ``max_bytes``"""
+    too_large = HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+    if max_bytes and upload.size is not None and upload.size > max_bytes:
+        raise too_large
+    
+    written = 0
+    async with aiofiles.open(path, "wb") as f:
+        while chunk := await upload.read(_UPLOAD_CHUNK_BYTES):
+            written += len(chunk)
+            if max_bytes and written > max_bytes:
+                raise too_large
+            await f.write(chunk)
+
 @router.post("/clone", response_model=VoiceCloneResponse)
 async def clone_voice(
     audio_file: UploadFile = File(...),
@@ -34,21 +53,19 @@ async def clone_voice(
             raise HTTPException(status_code=503, detail="TTS engine not initialized")
         
         # Validate file type
-        allowed_types = [".mp3", ".wav", ".flac", ".ogg"]
-        file_ext = Path(audio_file.filename).suffix.lower()
-        if file_ext not in allowed_types:
+        file_ext = Path(audio_file.filename or "").suffix.lower()
+        if file_ext not in AUDIO_EXTENSIONS:
             raise HTTPException(
                 status_code=400,
-                detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
+                detail=f"Invalid file type. Allowed: {', '.join(AUDIO_EXTENSIONS)}"
             )
         
-        # Save uploaded file
-        temp_path = Path(settings.VOICES_DIR) / f"temp_{audio_file.filename}"
-        with open(temp_path, "wb") as f:
-            shutil.copyfileobj(audio_file.file, f)
-        
+        # Unique name, so concurrent uploads of the same file can't collide
+        temp_path = Path(settings.VOICES_DIR) / f"upload_{uuid.uuid4().hex}{file_ext}"
         try:
-            # Clone voice
+            await _save_upload(audio_file, temp_path, settings.MAX_CLONE_UPLOAD_BYTES)
+            
+            # Clone voice; the engine writes a preprocessed PCM16 copy and deletes the upload
             voice_id = await tts_engine.clone_voice(
                 audio_path=str(temp_path),
                 transcript=transcript,
@@ -56,10 +73,6 @@ async def clone_voice(
                 voice_description=description
             )
             
-            # Move file to permanent location
-            perm_path = Path(settings.VOICES_DIR) / f"{voice_id}{file_ext}"
-            shutil.move(str(temp_path), str(perm_path))
-            
             return VoiceCloneResponse(
                 success=True,
                 voice_id=voice_id,
@@ -67,26 +80,62 @@ async def clone_voice(
             )
             
         finally:
-            # Clean up temp file if it exists
+            # The upload is left behind when cloning fails
             if temp_path.exists():
                 os.remove(temp_path)
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Voice cloning failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/import", response_model=VoiceImportResponse)
+async def import_voices(
+    archive: UploadFile = File(..., description="zip or tar(.gz) of audio files with voices.csv, voices.json or .txt transcripts"),
+    current_user: str = Depends(get_current_user)
+) -> VoiceImportResponse:
+    """Clone many voices at once from an archive"""
+    try:
+        from main import tts_engine
+        
+        if not tts_engine:
+            raise HTTPException(status_code=503, detail="TTS engine not initialized")
+        
+        temp_path = Path(settings.VOICES_DIR) / f"upload_{uuid.uuid4().hex}.archive"
+        try:
+            await _save_upload(archive, temp_path, settings.VOICE_IMPORT_MAX_BYTES)
+            result = await tts_engine.import_voices(str(temp_path))
+        finally:
+            if temp_path.exists():
+                os.remove(temp_path)
+        
+        return VoiceImportResponse(success=not result["failed"], **result)
+        
+    except HTTPException:
+        raise
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Voice import failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/list", response_model=VoiceListResponse)
 async def list_voices(
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
     current_user: str = Depends(get_current_user)
 ) -> VoiceListResponse:
-    """List all available voices"""
+    """List available voices, oldest first"""
     try:
         from main import tts_engine
         
         if not tts_engine:
             raise HTTPException(status_code=503, detail="TTS engine not initialized")
         
-        voices_data = await tts_engine.list_voices()
+        voices_data, total = await tts_engine.list_voices(limit, offset)
         
         # Convert to Voice objects
         voices = [
@@ -102,7 +151,9 @@ async def list_voices(
         
         return VoiceListResponse(
             voices=voices,
-            total=len(voices)
+            total=total,
+            limit=limit,
+            offset=offset
         )
         
     except Exception as e:
@@ -154,13 +205,11 @@ async def get_voice(
         if not tts_engine:
             raise HTTPException(status_code=503, detail="TTS engine not initialized")
         
-        voices = await tts_engine.list_voices()
-        
-        for voice in voices:
-            if voice["id"] == voice_id:
-                return voice
+        voice = await tts_engine.get_voice(voice_id)
+        if voice is None:
+            raise HTTPException(status_code=404, detail="Voice not found")
         
-        raise HTTPException(status_code=404, detail="Voice not found")
+        return voice
         
     except HTTPException:
         raise
@@ -3,7 +3,7 @@ Configuration settings for driaClaude
 """
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     # Server settings
@@ -24,18 +24,117 @@ class Settings(BaseSettings):
     # Model settings
     MODEL_NAME: str = "nari-labs/Dia-1.6B-0626"
     MAX_NEW_TOKENS: int = 3072
+    INFERENCE_PRECISION: str = "fp32"  # "fp32", "bf16", "int8" or "auto"
+    MODEL_SNAPSHOT_DIR: str = ""  # written by `python -m app.models.snapshot`; empty loads MODEL_NAME
+    DECODER_MODE: str = "eager"  # "eager", "static" (preallocated KV caches from a pool) or "compiled" (static plus torch.compile)
+    DECODER_COMPILE_MODE: str = "default"  # torch.compile mode of the compiled decoder
     GUIDANCE_SCALE: float = 3.0
+    GUIDANCE_STEPS: int = 0  # guide only the first N decoder steps, then decode conditionally; 0 guides every step
     TEMPERATURE: float = 1.8
     TOP_P: float = 0.90
     TOP_K: int = 45
     
+    # KV cache pool (DECODER_MODE static or compiled)
+    KV_CACHE_POOL_MAX_BYTES: int = 4 * 1024 ** 3  # idle caches kept for reuse; 0 frees each one after its generation
+    KV_CACHE_LENGTH_STEP: int = 256  # cache lengths are rounded up to a multiple of this
+    
+    # Warm-up generations run after the model loads; /health/ready reports ready once they finish
+    WARMUP_ENABLED: bool = True
+    WARMUP_LENGTHS: List[int] = [32, 64]  # decoder steps of each warm-up generation
+    WARMUP_BATCH_SIZES: List[int] = [1]  # each length runs at each batch size
+    
+    # Deployment
+    DEPLOYMENT_MODE: str = "standalone"  # "standalone" (model per HTTP worker) or "model_server"
+    MODEL_SERVER_SOCKET: str = ""  # defaults to DATA_DIR/model_server.sock
+    MODEL_SERVER_AUTOSTART: bool = True  # main.py starts the model server itself
+    MODEL_SERVER_START_TIMEOUT: int = 600  # seconds HTTP workers wait for the model to load
+    
+    # Inference executor
+    INFERENCE_EXECUTOR: str = "thread"  # "thread" or "process"
+    INFERENCE_WORKERS: int = 1  # model replicas; more than 1 needs the process executor
+    INFERENCE_MAX_QUEUE: int = 64  # 0 disables the limit
+    
+    # CPU topology of model processes (each engine, or each process executor worker)
+    CPU_AFFINITY: str = ""  # "" (no pinning), "auto", "numa" or core sets like "0-31;32-63"
+    TORCH_THREADS: int = 0  # intra-op threads per model process; 0 sizes them to its cores
+    TORCH_INTEROP_THREADS: int = 1  # 0 keeps torch's default
+    
+    # Admission control (POST /tts/generate, /tts/audio, /tts/stream and /tts/batch*)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_WAIT: Dict[str, float] = {"high": 300, "normal": 120, "low": 30}  # projected seconds of queued work per priority class
+    ADMISSION_DEFAULT_PRIORITY: str = "normal"
+    ADMISSION_USER_PRIORITIES: Dict[str, str] = {}  # highest class each user may ask for, if not the default
+    ADMISSION_USER_MAX_CONCURRENT: int = 0  # requests in progress per user; 0 disables the limit
+    ADMISSION_USER_LIMITS: Dict[str, int] = {}  # per-user overrides of ADMISSION_USER_MAX_CONCURRENT
+    ADMISSION_TOKENS_PER_SECOND: float = 20.0  # decoder steps per second per inference worker until measured
+    
+    # Micro-batching
+    BATCH_WINDOW_MS: int = 10
+    BATCH_MAX_SIZE: int = 8
+    MAX_BATCH_ITEMS: int = 200  # items per /tts/batch request
+    
+    # Streaming
+    STREAM_CHUNK_FRAMES: int = 43  # ~0.5s of audio per chunk
+    STREAM_CONTEXT_FRAMES: int = 16
+    STREAM_LOOKAHEAD_FRAMES: int = 4
+    
+    # Result cache (requests with a seed only)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MEMORY_ENTRIES: int = 1024
+    RESULT_CACHE_MAX_BYTES: int = 2 * 1024 ** 3  # of indexed files; evicting leaves the files to retention
+    RESULT_CACHE_MAX_AGE_HOURS: float = 720  # 0 disables age-based eviction
+    
+    # Token budget (max_new_tokens sized from the text)
+    BUDGET_CHARS_PER_SECOND: float = 14.0  # initial speaking rate, calibrated per voice
+    BUDGET_MARGIN: float = 1.4
+    BUDGET_BUCKETS: List[int] = [256, 512, 1024, 2048]  # MAX_NEW_TOKENS is always the last bucket
+    
+    # Long-form synthesis
+    LONGFORM_MIN_CHARS: int = 400  # longer texts are split into segments
+    LONGFORM_SEGMENT_CHARS: int = 250
+    LONGFORM_CROSSFADE_MS: int = 40
+    LONGFORM_ANCHOR_VOICE: bool = True  # without a cloned voice, condition segments on the first one
+    
+    # Job queue
+    JOB_WORKERS: int = 4  # jobs run concurrently per engine process; 0 only accepts jobs
+    JOB_POLL_INTERVAL: float = 1.0  # seconds
+    JOB_LEASE_SECONDS: int = 60
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETENTION_HOURS: float = 24
+    WEBHOOK_TIMEOUT: int = 10  # seconds
+    WEBHOOK_MAX_RETRIES: int = 3
+    WEBHOOK_ALLOWED_HOSTS: List[str] = []  # when set, webhooks may only go to these hosts
+    WEBHOOK_ALLOW_PRIVATE: bool = False  # allow loopback, private and link-local addresses
+    
+    # Output retention (0 disables a limit)
+    OUTPUT_TTL_HOURS: float = 0
+    OUTPUT_MAX_BYTES: int = 0  # total size of OUTPUTS_DIR; least recently used files go first
+    OUTPUT_USER_QUOTA_BYTES: int = 0  # per authenticated user
+    OUTPUT_USER_QUOTAS: Dict[str, int] = {}  # per-user overrides of OUTPUT_USER_QUOTA_BYTES
+    RETENTION_SWEEP_INTERVAL: float = 60  # seconds
+    RETENTION_SWEEP_BATCH: int = 500  # files removed per step before yielding
+    
+    # Metrics
+    METRICS_ENABLED: bool = True  # serve GET /metrics
+    METRICS_MAX_VOICE_LABELS: int = 50  # voices beyond this are labeled "other"
+    
     # Audio settings
     MAX_AUDIO_LENGTH: int = 300  # seconds
     SAMPLE_RATE: int = 22050
+    DEFAULT_OUTPUT_FORMAT: str = "mp3"  # mp3, wav, pcm, flac, ogg or opus
     
     # Voice cloning
     MAX_CLONE_DURATION: int = 10  # seconds
     MIN_CLONE_DURATION: int = 5   # seconds
+    MAX_CLONE_UPLOAD_BYTES: int = 20 * 1024 ** 2  # per reference audio file, checked before decoding
+    VOICE_IMPORT_MAX_BYTES: int = 2 * 1024 ** 3  # archive size for POST /voices/import
+    VOICE_IMPORT_MAX_ENTRIES: int = 10000
+    VOICE_IMPORT_CONCURRENCY: int = 0  # voices cloned at once during an import; 0 uses VOICE_PREPROCESS_WORKERS
+    VOICE_PREPROCESS_WORKERS: int = 0  # processes resampling, normalizing and trimming samples; 0 uses all cores
+    VOICE_TARGET_LUFS: float = -20.0  # loudness reference audio is normalized to
+    VOICE_TRIM_DB: float = -45.0  # leading/trailing audio below this level (after normalizing) is trimmed
+    AUDIO_PROMPT_CACHE_SIZE: int = 256  # encoded voice prompts kept in memory
+    VOICE_STORE_POLL_INTERVAL: float = 1.0  # seconds between checks for voices changed by other workers
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,348 @@
+"""
+Prometheus metrics for the TTS pipeline
+
+Counters, gauges and histograms are kept in memory and rendered in the
+Prometheus text exposition format by ``GET /metrics``. Collected metrics are
+plain tuples, so the model server can send its own to the HTTP workers,
+which merge them with theirs before rendering.
+"""
+
+import math
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+# (name, type, help, [(sample name, labels, value)])
+Family = Tuple[str, str, str, List[Tuple[str, Dict[str, str], float]]]
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+RTF_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 5, 10)
+
+
+class _Metric:
+    """A named metric with a fixed set of label names"""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def collect(self) -> Family:
+        with self._lock:
+            items = [(key, self._snapshot(value)) for key, value in self._values.items()]
+        samples = []
+        for key, value in items:
+            samples.extend(self._samples(dict(zip(self.labels, key)), value))
+        return self.name, self.type, self.help, samples
+
+    def _snapshot(self, value):
+        """Copy of a stored value that later updates can't change (taken under the lock)"""
+        return value
+
+    def _samples(self, labels: Dict[str, str], value) -> List[Tuple[str, Dict[str, str], float]]:
+        return [(self.name, labels, value)]
+
+
+class Counter(_Metric):
+    """A value that only goes up"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[idx] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe how long the block took, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _snapshot(self, value):
+        # observe updates the bucket counts in place
+        counts, total = value
+        return list(counts), total
+
+    def _samples(self, labels: Dict[str, str], value) -> List[Tuple[str, Dict[str, str], float]]:
+        counts, total = value
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            le = "+Inf" if bound == math.inf else f"{bound:g}"
+            samples.append((f"{self.name}_bucket", dict(labels, le=le), cumulative))
+        samples.append((f"{self.name}_sum", labels, total))
+        samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class Registry:
+    """All metrics of this process, plus collectors that read gauges at scrape time"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], List[Family]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[Family]]):
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], List[Family]]):
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def collect(self) -> List[Family]:
+        families = [metric.collect() for metric in self._metrics.values()]
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(families: List[Family]) -> str:
+    """Text exposition format; families of the same name (e.g. from two processes) are merged"""
+    merged: Dict[str, Family] = {}
+    for name, kind, help, samples in families:
+        if name in merged:
+            merged[name][3].extend(samples)
+        else:
+            merged[name] = (name, kind, help, list(samples))
+
+    lines = []
+    for name, kind, help, samples in merged.values():
+        lines.append(f"# HELP {name} {_escape(help)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample, labels, value in samples:
+            if labels:
+                label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                lines.append(f"{sample}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{sample} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Pipeline
+PHASE_SECONDS = REGISTRY.register(Histogram(
+    "tts_phase_seconds",
+    "Time per request in each pipeline phase (tokenize, generate, decode, encode, write)",
+    ["phase", "voice"]
+))
+QUEUE_SECONDS = REGISTRY.register(Histogram(
+    "tts_queue_wait_seconds",
+    "Time requests wait before running (batch: batching window, executor: free inference worker)",
+    ["stage"]
+))
+GENERATION_SECONDS = REGISTRY.register(Histogram(
+    "tts_generation_seconds",
+    "End-to-end time of a generation in the engine, from request to encoded audio",
+    ["voice", "cached"]
+))
+TOKENS_PER_SECOND = REGISTRY.register(Histogram(
+    "tts_decoder_tokens_per_second",
+    "Decoder steps (audio frames) generated per second of model.generate",
+    ["voice"],
+    buckets=RATE_BUCKETS
+))
+REAL_TIME_FACTOR = REGISTRY.register(Histogram(
+    "tts_real_time_factor",
+    "Seconds of audio generated per second of wall time",
+    ["voice"],
+    buckets=RTF_BUCKETS
+))
+AUDIO_SECONDS = REGISTRY.register(Counter(
+    "tts_audio_seconds_total",
+    "Seconds of audio generated",
+    ["voice"]
+))
+GENERATIONS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "tts_generations_in_flight",
+    "Generations the engine is working on, including ones waiting for a batch or worker"
+))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "tts_batch_size",
+    "Requests per model.generate call",
+    buckets=(1, 2, 4, 8, 16, 32)
+))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    "tts_admission_rejected_total",
+    "Requests shed by admission control (overloaded: projected wait too long, user_limit: too many in progress)",
+    ["reason", "priority"]
+))
+
+# Storage
+RETENTION_FILES_REMOVED = REGISTRY.register(Counter(
+    "tts_retention_files_removed_total",
+    "Output files deleted by retention sweeps, by policy (ttl, user_quota, max_bytes)",
+    ["policy"]
+))
+RETENTION_BYTES_RECLAIMED = REGISTRY.register(Counter(
+    "tts_retention_bytes_reclaimed_total",
+    "Bytes of output files deleted by retention sweeps, by policy",
+    ["policy"]
+))
+RETENTION_SWEEP_SECONDS = REGISTRY.register(Histogram(
+    "tts_retention_sweep_seconds",
+    "Time per retention sweep run by this process"
+))
+RETENTION_LAST_SWEEP = REGISTRY.register(Gauge(
+    "tts_retention_last_sweep_timestamp_seconds",
+    "Unix time the last retention sweep run by this process finished"
+))
+RESULT_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "tts_result_cache_lookups_total",
+    "Result cache lookups for seeded requests (hit or miss)",
+    ["result"]
+))
+RESULT_CACHE_STORES = REGISTRY.register(Counter(
+    "tts_result_cache_stores_total",
+    "Generated results added to the result cache"
+))
+RESULT_CACHE_EVICTIONS = REGISTRY.register(Counter(
+    "tts_result_cache_evictions_total",
+    "Result cache entries evicted by age or size, with their files"
+))
+
+# HTTP
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds",
+    "Time to handle an HTTP request (until the response starts, for streams)",
+    ["endpoint", "method", "status"]
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being handled"
+))
+
+_voice_labels = set()
+_voice_labels_lock = threading.Lock()
+_process_role = "main"
+
+
+def voice_label(voice_id: Optional[str]) -> str:
+    """Label value for a voice; past METRICS_MAX_VOICE_LABELS voices, new ones are "other" """
+    if not voice_id:
+        return "default"
+    with _voice_labels_lock:
+        if voice_id in _voice_labels:
+            return voice_id
+        if len(_voice_labels) < settings.METRICS_MAX_VOICE_LABELS:
+            _voice_labels.add(voice_id)
+            return voice_id
+    return "other"
+
+
+def set_process_role(role: str):
+    """Name this process in process-level metrics (e.g. "model_server")"""
+    global _process_role
+    _process_role = role
+
+
+def resident_memory() -> int:
+    """Resident set size of this process, in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Peak rather than current RSS, but better than nothing (kilobytes on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, int]:
+    """Current and peak resident memory of a process (this one by default), in bytes"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {"rss": int(fields["VmRSS"].split()[0]) * 1024, "peak_rss": int(fields["VmHWM"].split()[0]) * 1024}
+    except (OSError, KeyError, ValueError, IndexError):
+        if pid is not None:
+            return {}
+        return {"rss": resident_memory(), "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+def _collect_process() -> List[Family]:
+    labels = {"role": _process_role}
+    memory = process_memory()
+    return [
+        ("process_resident_memory_bytes", "gauge", "Resident memory size in bytes",
+         [("process_resident_memory_bytes", labels, memory["rss"])]),
+        ("process_peak_resident_memory_bytes", "gauge", "Highest resident memory size since the process started",
+         [("process_peak_resident_memory_bytes", labels, memory["peak_rss"])]),
+        ("process_cpu_seconds_total", "counter", "User and system CPU time in seconds",
+         [("process_cpu_seconds_total", labels, round(sum(os.times()[:2]), 3))])
+    ]
+
+
+REGISTRY.add_collector(_collect_process)
@@ -0,0 +1,179 @@
+"""
+Admission control: reject requests that could not start within their deadline
+"""
+
+import math
+import time
+import uuid
+from typing import Dict, Hashable, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.metrics import ADMISSION_REJECTED
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a request is shed; ``retry_after`` is in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def __reduce__(self):
+        # Keeps retry_after when the error crosses from the model server
+        return AdmissionRejected, (str(self), self.retry_after)
+
+
+class _Ticket:
+    def __init__(self, user: str, priority: str, tokens: int, owner: Optional[Hashable]):
+        self.user = user
+        self.priority = priority
+        self.tokens = tokens
+        self.owner = owner
+        self.started = time.monotonic()
+
+
+class AdmissionController:
+    """Tracks admitted work and sheds requests whose projected wait is too long
+
+    Every request's cost is its estimated decoder steps. Admitted requests
+    hold a ticket until they finish; the work still ahead of a new request
+    is the tickets' remaining steps, drained at the decoder throughput
+    observed for model batches (starting from ADMISSION_TOKENS_PER_SECOND)
+    times the number of inference workers. Each priority class has its own
+    maximum wait, so lower classes are shed first, and users can be held to
+    a number of concurrent requests.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.ADMISSION_ENABLED,
+        max_wait: Dict[str, float] = settings.ADMISSION_MAX_WAIT,
+        default_priority: str = settings.ADMISSION_DEFAULT_PRIORITY,
+        user_priorities: Dict[str, str] = settings.ADMISSION_USER_PRIORITIES,
+        user_max_concurrent: int = settings.ADMISSION_USER_MAX_CONCURRENT,
+        user_limits: Dict[str, int] = settings.ADMISSION_USER_LIMITS,
+        tokens_per_second: float = settings.ADMISSION_TOKENS_PER_SECOND,
+        smoothing: float = 0.2
+    ):
+        if default_priority not in max_wait:
+            raise ValueError(f"Unknown default priority: {default_priority}")
+
+        self.enabled = enabled
+        self.max_wait = max_wait
+        self.default_priority = default_priority
+        self.user_priorities = user_priorities
+        self.user_max_concurrent = user_max_concurrent
+        self.user_limits = user_limits
+        self.tokens_per_second = tokens_per_second
+        self.smoothing = smoothing
+        self.workers = 1
+
+        self._tickets: Dict[str, _Ticket] = {}
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+
+    def _rank(self, priority: str) -> float:
+        """Classes allowed to wait longer rank higher"""
+        return self.max_wait[priority]
+
+    def resolve_priority(self, user: str, requested: Optional[str] = None) -> str:
+        """The class a request runs in: the one asked for, at most the user's own"""
+        allowed = self.user_priorities.get(user, self.default_priority)
+        if requested is None:
+            return allowed
+        if requested not in self.max_wait:
+            raise ValueError(f"Unknown priority {requested!r}; expected one of {', '.join(self.max_wait)}")
+        return requested if self._rank(requested) <= self._rank(allowed) else allowed
+
+    def _throughput(self) -> float:
+        """Decoder steps per second the whole executor gets through"""
+        return self.tokens_per_second * self.workers
+
+    def _remaining(self, now: float) -> Dict[str, float]:
+        """Steps each admitted request still needs, assuming they share throughput evenly"""
+        if not self._tickets:
+            return {}
+        share = self._throughput() / len(self._tickets)
+        return {
+            ticket_id: max(0.0, ticket.tokens - (now - ticket.started) * share)
+            for ticket_id, ticket in self._tickets.items()
+        }
+
+    def projected_wait(self) -> float:
+        """Seconds until the work already admitted is done"""
+        return sum(self._remaining(time.monotonic()).values()) / self._throughput()
+
+    def _reject(self, reason: str, priority: str, message: str, retry_after: float):
+        key = f"{reason}:{priority}"
+        self.rejected[key] = self.rejected.get(key, 0) + 1
+        ADMISSION_REJECTED.inc(reason=reason, priority=priority)
+        logger.warning(f"Request rejected: {message}")
+        raise AdmissionRejected(message, max(1, math.ceil(retry_after)))
+
+    def admit(
+        self,
+        user: str,
+        tokens: int,
+        priority: Optional[str] = None,
+        owner: Optional[Hashable] = None
+    ) -> str:
+        """Admit a request costing ``tokens`` decoder steps or raise AdmissionRejected; returns its ticket"""
+        priority = self.resolve_priority(user, priority)
+        now = time.monotonic()
+
+        if self.enabled:
+            limit = self.user_limits.get(user, self.user_max_concurrent)
+            if limit > 0:
+                mine = [ticket_id for ticket_id, ticket in self._tickets.items() if ticket.user == user]
+                if len(mine) >= limit:
+                    remaining = self._remaining(now)
+                    soonest = min(remaining[ticket_id] for ticket_id in mine) * len(self._tickets) / self._throughput()
+                    self._reject("user_limit", priority, f"{user} already has {len(mine)} requests in progress", soonest)
+
+            wait = sum(self._remaining(now).values()) / self._throughput()
+            if wait > self.max_wait[priority]:
+                self._reject(
+                    "overloaded",
+                    priority,
+                    f"Server is overloaded (projected wait {wait:.0f}s, {priority} priority allows {self.max_wait[priority]:.0f}s)",
+                    wait - self.max_wait[priority]
+                )
+
+        ticket_id = uuid.uuid4().hex
+        self._tickets[ticket_id] = _Ticket(user, priority, tokens, owner)
+        self.admitted += 1
+        return ticket_id
+
+    def release(self, ticket_id: str):
+        """The request finished (or failed)"""
+        self._tickets.pop(ticket_id, None)
+
+    def release_owner(self, owner: Hashable):
+        """Drop the tickets of a client that went away without releasing them"""
+        for ticket_id in [ticket_id for ticket_id, ticket in self._tickets.items() if ticket.owner == owner]:
+            del self._tickets[ticket_id]
+
+    def observe(self, tokens: int, seconds: float):
+        """Calibrate throughput from a model batch: decoder steps times rows, over its generate time"""
+        if tokens <= 0 or seconds <= 0:
+            return
+        rate = tokens / seconds
+        self.tokens_per_second += self.smoothing * (rate - self.tokens_per_second)
+
+    def stats(self) -> Dict:
+        """Admitted work, projected wait and rejections"""
+        by_priority: Dict[str, int] = {}
+        for ticket in self._tickets.values():
+            by_priority[ticket.priority] = by_priority.get(ticket.priority, 0) + 1
+        return {
+            "enabled": self.enabled,
+            "in_progress": len(self._tickets),
+            "in_progress_by_priority": by_priority,
+            "projected_wait": round(self.projected_wait(), 2),
+            "tokens_per_second": round(self.tokens_per_second, 1),
+            "max_wait": self.max_wait,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected)
+        }
@@ -0,0 +1,128 @@
+"""
+Token budget estimation: how many decoder steps a text needs
+"""
+
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+_SPEAKER_TAG = re.compile(r"\[S[12]\]")
+_NON_VERBAL = re.compile(r"\([^)]*\)")
+
+
+def spoken_length(text: str) -> Tuple[int, int]:
+    """Characters of speech and number of non-verbal tags like ``(laughs)`` in a text"""
+    text = _SPEAKER_TAG.sub(" ", text)
+    non_verbal = len(_NON_VERBAL.findall(text))
+    text = " ".join(_NON_VERBAL.sub(" ", text).split())
+    return len(text), non_verbal
+
+
+class TokenBudget:
+    """Sizes ``max_new_tokens`` from the text instead of always reserving MAX_NEW_TOKENS
+
+    Speech duration is estimated from the character count and a speaking
+    rate per voice. That rate starts at BUDGET_CHARS_PER_SECOND and is
+    calibrated from finished generations with an exponential moving
+    average. The estimate, with a safety margin, is rounded up to a length
+    bucket, so requests of similar length can share a model batch.
+    """
+
+    def __init__(
+        self,
+        chars_per_second: float = settings.BUDGET_CHARS_PER_SECOND,
+        margin: float = settings.BUDGET_MARGIN,
+        buckets: List[int] = settings.BUDGET_BUCKETS,
+        max_new_tokens: int = settings.MAX_NEW_TOKENS,
+        non_verbal_seconds: float = 1.0,
+        padding_seconds: float = 1.0,
+        smoothing: float = 0.1
+    ):
+        self.default_rate = chars_per_second
+        self.margin = margin
+        self.max_new_tokens = max_new_tokens
+        self.buckets = sorted({b for b in buckets if b < max_new_tokens} | {max_new_tokens})
+        self.non_verbal_seconds = non_verbal_seconds
+        self.padding_seconds = padding_seconds
+        self.smoothing = smoothing
+
+        # Set from the loaded model
+        self.frame_rate: Optional[float] = None
+        self.max_delay = 0
+
+        self._rates: Dict[str, float] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def configure(self, frame_rate: float, max_delay: int):
+        """Audio frames per second and codebook delay of the loaded model"""
+        self.frame_rate = frame_rate
+        self.max_delay = max_delay
+
+    def estimate(self, text: str, voice_id: Optional[str] = None) -> Tuple[int, int]:
+        """Estimated decoder steps for a text, and the bucket to generate with"""
+        if self.frame_rate is None:
+            return self.max_new_tokens, self.max_new_tokens
+
+        chars, non_verbal = spoken_length(text)
+        seconds = chars / self._rates.get(voice_id or "", self.default_rate) + non_verbal * self.non_verbal_seconds
+        estimate = math.ceil((seconds * self.margin + self.padding_seconds) * self.frame_rate) + self.max_delay + 1
+        estimate = min(estimate, self.max_new_tokens)
+        bucket = next(b for b in self.buckets if b >= estimate)
+        return estimate, bucket
+
+    def record(
+        self,
+        text: str,
+        voice_id: Optional[str],
+        estimate: int,
+        budget: int,
+        seconds: float,
+        overrun: bool,
+        truncated: bool
+    ):
+        """Compare a generation against its estimate and calibrate the voice's rate
+
+        ``overrun`` means the estimated budget ran out; ``truncated`` means
+        even the final attempt was cut short.
+        """
+        key = voice_id or ""
+        actual = math.ceil(seconds * self.frame_rate) + self.max_delay + 1 if self.frame_rate else 0
+        stats = self._stats.setdefault(key, {
+            "requests": 0, "estimated_tokens": 0, "actual_tokens": 0, "budget_tokens": 0, "overruns": 0
+        })
+        stats["requests"] += 1
+        stats["estimated_tokens"] += estimate
+        stats["actual_tokens"] += actual
+        stats["budget_tokens"] += budget
+        stats["overruns"] += int(overrun)
+
+        # A truncated generation only tells us the rate is lower than assumed
+        chars, non_verbal = spoken_length(text)
+        speech_seconds = seconds - self.padding_seconds - non_verbal * self.non_verbal_seconds
+        if truncated or chars < 20 or speech_seconds <= 0.5:
+            return
+        observed = chars / speech_seconds
+        rate = self._rates.get(key, self.default_rate)
+        self._rates[key] = rate + self.smoothing * (observed - rate)
+
+    def stats(self) -> Dict:
+        """Estimated vs actual lengths per voice ("default" when no voice is used)"""
+        voices = {}
+        for key, stats in self._stats.items():
+            requests = stats["requests"]
+            voices[key or "default"] = {
+                "requests": requests,
+                "chars_per_second": round(self._rates.get(key, self.default_rate), 2),
+                "avg_estimated_tokens": round(stats["estimated_tokens"] / requests, 1),
+                "avg_actual_tokens": round(stats["actual_tokens"] / requests, 1),
+                "avg_budget_tokens": round(stats["budget_tokens"] / requests, 1),
+                "actual_to_estimated": round(stats["actual_tokens"] / max(1, stats["estimated_tokens"]), 3),
+                "overruns": stats["overruns"]
+            }
+        return {
+            "buckets": self.buckets,
+            "max_new_tokens": self.max_new_tokens,
+            "voices": voices
+        }
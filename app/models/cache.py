@@ -0,0 +1,231 @@
+"""
+Content-addressed cache of generated audio for deterministic requests
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.config import settings
+from app.metrics import RESULT_CACHE_EVICTIONS, RESULT_CACHE_LOOKUPS, RESULT_CACHE_STORES
+
+
+def make_cache_key(
+    text: str,
+    voice_id: Optional[str],
+    temperature: float,
+    guidance_scale: float,
+    top_p: float,
+    top_k: int,
+    seed: int,
+    model: str,
+    variant: Optional[str] = None,
+    user: Optional[str] = None
+) -> str:
+    """Hash of the normalized request and model revision
+
+    ``variant`` distinguishes ways of generating the same request
+    (e.g. long-form synthesis). ``user`` scopes the entry to its owner:
+    a hit returns their cataloged file, which only they may see or delete.
+    """
+    request = {
+        "text": " ".join(text.split()),
+        "voice_id": voice_id or None,
+        "temperature": round(float(temperature), 6),
+        "guidance_scale": round(float(guidance_scale), 6),
+        "top_p": round(float(top_p), 6),
+        "top_k": int(top_k),
+        "seed": int(seed),
+        "model": model
+    }
+    if variant:
+        request["variant"] = variant
+    if user:
+        request["user"] = user
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """Maps request keys to files in OUTPUTS_DIR
+
+    The index lives in SQLite under DATA_DIR so it survives restarts and is
+    shared by all workers; a small in-memory LRU sits in front of it.
+    Entries are evicted by age and by total size, oldest access first.
+    Eviction only drops index entries: the audio files belong to their
+    users' outputs and are removed by the retention sweeper, like any other.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = Path(settings.DATA_DIR) / "result_cache.db",
+        memory_entries: int = settings.RESULT_CACHE_MEMORY_ENTRIES,
+        max_bytes: int = settings.RESULT_CACHE_MAX_BYTES,
+        max_age_hours: float = settings.RESULT_CACHE_MAX_AGE_HOURS
+    ):
+        self.db_path = Path(db_path)
+        self.output_dir = Path(settings.OUTPUTS_DIR)
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age_hours * 3600
+
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def open(self):
+        """Open (and create) the on-disk index"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                metadata TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Metadata of a cached result, or None on a miss"""
+        entry = self._memory.get(key)
+        if entry is None:
+            entry = await asyncio.to_thread(self._load, key)
+
+        expired = entry is not None and self.max_age and time.time() - entry["created_at"] > self.max_age
+        if entry is None or expired or not (self.output_dir / entry["filename"]).exists():
+            if entry is not None:
+                # Expired, or the file was deleted behind our back
+                await asyncio.to_thread(self._forget, key)
+            self.misses += 1
+            RESULT_CACHE_LOOKUPS.inc(result="miss")
+            return None
+
+        self._remember(key, entry)
+        await asyncio.to_thread(self._touch, key)
+        self.hits += 1
+        RESULT_CACHE_LOOKUPS.inc(result="hit")
+        return entry["metadata"]
+
+    async def put(self, key: str, metadata: Dict):
+        """Record a freshly generated result"""
+        filename = metadata["filename"]
+        try:
+            size = (self.output_dir / filename).stat().st_size
+        except OSError:
+            return
+
+        entry = {"filename": filename, "metadata": metadata, "created_at": time.time()}
+        await asyncio.to_thread(self._store, key, entry, size)
+        self._remember(key, entry)
+        self.stores += 1
+        RESULT_CACHE_STORES.inc()
+
+        # Never evict the entry we are about to hand out
+        await asyncio.to_thread(self._evict, key)
+
+    def _remember(self, key: str, entry: Dict):
+        """Insert into the in-memory LRU"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT filename, metadata, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"filename": row[0], "metadata": json.loads(row[1]), "created_at": row[2]}
+
+    def _touch(self, key: str):
+        with self._lock:
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+
+    def _store(self, key: str, entry: Dict, size: int):
+        now = entry["created_at"]
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, filename, size, metadata, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entry["filename"], size, json.dumps(entry["metadata"]), now, now)
+            )
+
+    def _forget(self, key: str):
+        self._memory.pop(key, None)
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self, keep: Optional[str] = None):
+        """Drop expired entries, then least recently used ones until under the size limit"""
+        victims = []
+        with self._lock:
+            if self.max_age:
+                victims += self._db.execute(
+                    "SELECT key, filename FROM entries WHERE created_at < ?",
+                    (time.time() - self.max_age,)
+                ).fetchall()
+                for key, _ in victims:
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+            expired = len(victims)
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if self.max_bytes and total > self.max_bytes:
+                for key, filename, size in self._db.execute(
+                    "SELECT key, filename, size FROM entries ORDER BY last_access"
+                ):
+                    if total <= self.max_bytes:
+                        break
+                    if key == keep:
+                        continue
+                    victims.append((key, filename))
+                    total -= size
+
+            for key, _ in victims[expired:]:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+        for key, _ in victims:
+            self._memory.pop(key, None)
+            self.evictions += 1
+            RESULT_CACHE_EVICTIONS.inc()
+
+    def stats(self) -> Dict:
+        """Cache counters and size"""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "memory_entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions
+        }
+
+    def close(self):
+        """Close the on-disk index"""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,84 @@
+"""
+Decoder modes and warm-up generations
+
+- ``eager``: the KV cache grows step by step, as in plain ``generate``.
+- ``static``: the KV cache is allocated at its full length, so decoding
+  does not reallocate it on every step; caches come from the engine's
+  pool and are reused across generations (``app.models.kv_cache``).
+- ``compiled``: a static cache, plus the model forward that runs every
+  decoder step compiled with torch.compile (inductor, which needs a C++
+  compiler at runtime).
+
+Compiled graphs are built by the first generations that use them, so the
+engine runs warm-up generations of a few lengths before it reports ready.
+After a second shape is seen the graph is recompiled once with dynamic
+sizes, so later text lengths, budgets and batch sizes reuse it.
+"""
+
+import math
+import shutil
+from typing import Dict, List, Tuple
+
+from loguru import logger
+from transformers.generation.configuration_utils import CompileConfig
+
+DECODER_MODES = ("eager", "static", "compiled")
+
+WARMUP_SENTENCES = [
+    "[S1] Thank you for calling. How can I help you today?",
+    "[S2] I'd like to check on the status of my order, please.",
+    "[S1] Of course. Could you read me the order number?",
+    "[S2] Sure, it's on the email I got this morning. (laughs)",
+]
+
+
+def resolve_decoder_mode(requested: str) -> str:
+    """Map a configured decoder mode to one this host can run"""
+    requested = requested.lower()
+    if requested not in DECODER_MODES:
+        raise ValueError(f"Unknown decoder mode: {requested}. Choose from {', '.join(DECODER_MODES)}")
+    if requested == "compiled" and not any(shutil.which(cxx) for cxx in ("g++", "c++", "clang++")):
+        logger.warning("No C++ compiler found for torch.compile, falling back to the static decoder mode")
+        return "static"
+    return requested
+
+
+def generation_options(mode: str, compile_mode: str = "default") -> Dict:
+    """Extra ``generate`` arguments for a decoder mode, besides the static cache itself"""
+    if mode != "compiled":
+        return {}
+
+    # dynamic=None: specialize on the first shape, go dynamic on the next one
+    compile_config = CompileConfig(fullgraph=False, dynamic=None, mode=compile_mode)
+    # generate only compiles on accelerators unless told otherwise
+    compile_config._compile_all_devices = True
+    return {"compile_config": compile_config}
+
+
+def warmup_text(sentences: int) -> str:
+    """Dialogue of the given number of sentences"""
+    return " ".join(WARMUP_SENTENCES[idx % len(WARMUP_SENTENCES)] for idx in range(sentences))
+
+
+def warmup_plan(
+    lengths: List[int],
+    batch_sizes: List[int],
+    frame_rate: float,
+    chars_per_second: float,
+    max_new_tokens: int
+) -> List[Tuple[List[str], int]]:
+    """Texts and decoder steps of each warm-up generation, every length at every batch size
+
+    Texts are sized so the model would need about as many steps as the
+    generation is given, at the default speaking rate. Each length gets a
+    longer text than the one before, so text length varies along with the
+    number of steps and neither is compiled as a constant.
+    """
+    sentence_chars = sum(len(sentence) for sentence in WARMUP_SENTENCES) / len(WARMUP_SENTENCES)
+    plan = []
+    for idx, steps in enumerate(sorted({min(length, max_new_tokens) for length in lengths})):
+        chars = steps / frame_rate * chars_per_second
+        text = warmup_text(max(idx + 1, math.ceil(chars / sentence_chars)))
+        for batch_size in sorted(set(batch_sizes)):
+            plan.append(([text] * batch_size, steps))
+    return plan
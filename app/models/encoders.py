@@ -0,0 +1,294 @@
+"""
+Audio output encoders: from an in-memory waveform to the bytes of a format
+
+Every output format is an AudioEncoder in the ENCODERS registry, keyed by
+the name clients pass as ``format``. Raw PCM and WAV are produced directly
+from the samples without going through libsndfile; the compressed formats
+are encoded with soundfile into memory. Encoding is blocking, so callers
+run it in a worker thread.
+"""
+
+import io
+import math
+import struct
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import soundfile as sf
+import torch
+import torchaudio
+
+# Input samples of real audio kept on each side of a chunk when resampling a
+# stream, so chunk edges come out the same as a one-shot resample
+_RESAMPLE_CONTEXT = 64
+
+
+def resample(audio: np.ndarray, orig_rate: int, new_rate: int) -> np.ndarray:
+    """Resample a mono float waveform"""
+    if orig_rate == new_rate:
+        return audio
+    waveform = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))
+    return torchaudio.functional.resample(waveform, orig_rate, new_rate).numpy()
+
+
+def to_pcm16(audio: np.ndarray) -> bytes:
+    """Convert a float waveform to little-endian 16-bit PCM"""
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def wav_header(sample_rate: int, data_size: Optional[int] = None, channels: int = 1, bits_per_sample: int = 16) -> bytes:
+    """WAV header for ``data_size`` bytes of PCM, or for a stream of unknown length"""
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    riff_size = 0xFFFFFFFF if data_size is None else 36 + data_size
+    data_size = 0xFFFFFFFF if data_size is None else data_size
+    return (
+        b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample)
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+
+class _Sink:
+    """Write-only file object that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        # libsndfile only probes the position of stream formats
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        return b""
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+class StreamResampler:
+    """Resamples a waveform that arrives in chunks
+
+    Input is resampled in whole periods of the rate ratio with real audio
+    on both sides, so the concatenated output matches resampling the whole
+    waveform at once.
+    """
+
+    def __init__(self, orig_rate: int, new_rate: int):
+        divisor = math.gcd(orig_rate, new_rate)
+        self.orig_rate = orig_rate
+        self.new_rate = new_rate
+        self.step_in = orig_rate // divisor
+        self.step_out = new_rate // divisor
+        self.context = self.step_in * math.ceil(_RESAMPLE_CONTEXT / self.step_in)
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._done = 0  # samples at the start of the buffer that were already resampled
+
+    def write(self, chunk: np.ndarray) -> np.ndarray:
+        """Resampled audio for as much of the input as has enough context"""
+        if self.orig_rate == self.new_rate:
+            return chunk
+        self._buffer = np.concatenate([self._buffer, chunk.astype(np.float32)])
+        ready = (len(self._buffer) - self._done - self.context) // self.step_in * self.step_in
+        if ready <= 0:
+            return np.zeros(0, dtype=np.float32)
+
+        end = self._done + ready
+        out = resample(self._buffer[:end + self.context], self.orig_rate, self.new_rate)
+        out = out[self._done // self.step_in * self.step_out:end // self.step_in * self.step_out]
+
+        # Keep the tail as left context for the next chunk
+        start = max(0, end - self.context)
+        self._buffer = self._buffer[start:]
+        self._done = end - start
+        return out
+
+    def finish(self) -> np.ndarray:
+        """Resampled audio for the rest of the input"""
+        if self.orig_rate == self.new_rate or len(self._buffer) <= self._done:
+            return np.zeros(0, dtype=np.float32)
+        out = resample(self._buffer, self.orig_rate, self.new_rate)
+        return out[self._done // self.step_in * self.step_out:]
+
+
+class AudioEncoder:
+    """One output format encoded with libsndfile
+
+    ``sample_rates`` lists the rates the codec accepts (any when empty);
+    ``streamable`` formats can be written out chunk by chunk as they are
+    generated.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        extension: str,
+        media_type: str,
+        sf_format: Optional[str] = None,
+        sf_subtype: Optional[str] = None,
+        sample_rates: Sequence[int] = (),
+        streamable: bool = False
+    ):
+        self.name = name
+        self.extension = extension
+        self.media_type = media_type
+        self.sf_format = sf_format
+        self.sf_subtype = sf_subtype
+        self.sample_rates = tuple(sorted(sample_rates))
+        self.streamable = streamable
+
+    def output_rate(self, model_rate: int, requested: Optional[int] = None) -> int:
+        """Sample rate to encode at: the requested one, else the model's (or the nearest the codec accepts)"""
+        if requested is not None:
+            if self.sample_rates and requested not in self.sample_rates:
+                rates = ", ".join(str(rate) for rate in self.sample_rates)
+                raise ValueError(f"{self.name} supports sample rates {rates}, not {requested}")
+            return requested
+        if not self.sample_rates or model_rate in self.sample_rates:
+            return model_rate
+        return next((rate for rate in self.sample_rates if rate >= model_rate), self.sample_rates[-1])
+
+    def encode(self, audio: np.ndarray, sample_rate: int) -> bytes:
+        """Encode a whole waveform"""
+        buffer = io.BytesIO()
+        sf.write(buffer, audio, sample_rate, format=self.sf_format, subtype=self.sf_subtype)
+        return buffer.getvalue()
+
+    def start_stream(self, sample_rate: int) -> Tuple[bytes, "_StreamWriter"]:
+        """Leading bytes of a stream, and a writer for its chunks"""
+        if not self.streamable:
+            raise ValueError(f"{self.name} output cannot be streamed")
+        sink = _Sink()
+        soundfile = sf.SoundFile(
+            sink, "w", samplerate=sample_rate, channels=1, format=self.sf_format, subtype=self.sf_subtype
+        )
+        return sink.drain(), _StreamWriter(lambda chunk: soundfile.write(chunk), soundfile.close, sink)
+
+
+class PCMEncoder(AudioEncoder):
+    """Headerless 16-bit little-endian PCM"""
+
+    def encode(self, audio: np.ndarray, sample_rate: int) -> bytes:
+        return to_pcm16(audio)
+
+    def start_stream(self, sample_rate: int) -> Tuple[bytes, "_StreamWriter"]:
+        return b"", _StreamWriter(to_pcm16)
+
+
+class WAVEncoder(AudioEncoder):
+    """16-bit PCM WAV, written without libsndfile"""
+
+    def encode(self, audio: np.ndarray, sample_rate: int) -> bytes:
+        data = to_pcm16(audio)
+        return wav_header(sample_rate, len(data)) + data
+
+    def start_stream(self, sample_rate: int) -> Tuple[bytes, "_StreamWriter"]:
+        # Length unknown up front; players read until the connection closes
+        return wav_header(sample_rate), _StreamWriter(to_pcm16)
+
+
+class _StreamWriter:
+    """Encodes the chunks of one stream in order"""
+
+    def __init__(self, write, close=None, sink: Optional[_Sink] = None):
+        self._write = write
+        self._close = close
+        self._sink = sink
+
+    def write(self, chunk: np.ndarray) -> bytes:
+        data = self._write(chunk)
+        return self._sink.drain() if self._sink is not None else data
+
+    def close(self) -> bytes:
+        if self._close is not None:
+            self._close()
+        return self._sink.drain() if self._sink is not None else b""
+
+
+class StreamEncoder:
+    """Resamples and encodes audio chunks as they are generated (blocking calls)"""
+
+    def __init__(self, encoder: AudioEncoder, model_rate: int, output_rate: int):
+        self.encoder = encoder
+        self.sample_rate = output_rate
+        self._resampler = StreamResampler(model_rate, output_rate)
+        self._header, self._writer = encoder.start_stream(output_rate)
+
+    def header(self) -> bytes:
+        """Bytes to send before the first chunk"""
+        return self._header
+
+    def write(self, chunk: np.ndarray) -> bytes:
+        audio = self._resampler.write(chunk)
+        return self._writer.write(audio) if len(audio) else b""
+
+    def finish(self) -> bytes:
+        audio = self._resampler.finish()
+        data = self._writer.write(audio) if len(audio) else b""
+        return data + self._writer.close()
+
+
+ENCODERS: Dict[str, AudioEncoder] = {}
+
+
+def register_encoder(encoder: AudioEncoder):
+    """Make an output format available under its name"""
+    ENCODERS[encoder.name] = encoder
+
+
+def get_encoder(name: str) -> AudioEncoder:
+    """Encoder for a format name"""
+    encoder = ENCODERS.get(name.lower())
+    if encoder is None:
+        raise ValueError(f"Unsupported audio format '{name}'; use one of: {', '.join(ENCODERS)}")
+    return encoder
+
+
+def encode_audio(
+    audio: np.ndarray,
+    model_rate: int,
+    format: str,
+    sample_rate: Optional[int] = None
+) -> Tuple[bytes, int]:
+    """Resample and encode a waveform; returns the bytes and their sample rate"""
+    encoder = get_encoder(format)
+    output_rate = encoder.output_rate(model_rate, sample_rate)
+    return encoder.encode(resample(audio, model_rate, output_rate), output_rate), output_rate
+
+
+def media_type_for(filename: str) -> str:
+    """Content type to serve a generated file with"""
+    suffix = Path(filename).suffix.lower()
+    for encoder in ENCODERS.values():
+        if encoder.extension == suffix:
+            return encoder.media_type
+    return "application/octet-stream"
+
+
+def audio_extensions() -> Tuple[str, ...]:
+    """File extensions of all registered formats"""
+    return tuple(sorted({encoder.extension for encoder in ENCODERS.values()}))
+
+
+register_encoder(AudioEncoder("mp3", ".mp3", "audio/mpeg", "MP3", "MPEG_LAYER_III"))
+register_encoder(WAVEncoder("wav", ".wav", "audio/wav", streamable=True))
+register_encoder(PCMEncoder("pcm", ".pcm", "audio/pcm", streamable=True))
+register_encoder(AudioEncoder("flac", ".flac", "audio/flac", "FLAC", "PCM_16"))
+register_encoder(AudioEncoder("ogg", ".ogg", "audio/ogg", "OGG", "VORBIS", streamable=True))
+register_encoder(AudioEncoder(
+    "opus", ".opus", "audio/ogg; codecs=opus", "OGG", "OPUS",
+    sample_rates=(8000, 12000, 16000, 24000, 48000), streamable=True
+))
@@ -0,0 +1,227 @@
+"""
+Inference executor for running blocking model work off the event loop
+
+With the process executor every worker process is a replica with its own
+model, pinned to its own cores (see ``app.models.topology``); calls go to
+the least-loaded replica. The thread executor is a single replica with
+one worker running on the engine's model: concurrent generations on one
+model would race on Dia's per-call state and on torch's process-global
+random generator, which seeded requests rely on.
+"""
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.metrics import QUEUE_SECONDS, process_memory
+from app.models import topology
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when the inference queue is full"""
+
+
+def _init_replica(initializer: Optional[Callable]):
+    """Set up CPU topology before the worker process loads anything"""
+    topology.configure_process()
+    if initializer is not None:
+        initializer()
+
+
+class _Replica:
+    """One pool of workers sharing a model, with its load counters"""
+
+    def __init__(self, index: int, pool: Executor, capacity: int):
+        self.index = index
+        self.pool = pool
+        self.capacity = capacity
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.monotonic()
+        self.running: Dict[Future, float] = {}  # future -> start time
+        self.info: Dict = {}
+
+    def load(self) -> float:
+        return self.in_flight / self.capacity
+
+    def utilization(self) -> float:
+        """Fraction of worker time spent running calls since the replica started"""
+        now = time.monotonic()
+        busy = self.busy_seconds + sum(now - start for start in self.running.values())
+        return busy / max(1e-9, (now - self.started_at) * self.capacity)
+
+    def stats(self) -> Dict:
+        memory = process_memory(self.info["pid"]) if "pid" in self.info else {}
+        return {
+            "replica": self.index,
+            "workers": self.capacity,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "utilization": round(self.utilization(), 4),
+            "rss_bytes": memory.get("rss"),
+            "peak_rss_bytes": memory.get("peak_rss"),
+            **{key: self.info[key] for key in ("pid", "cpus", "numa_nodes", "threads") if key in self.info}
+        }
+
+
+class InferenceExecutor:
+    """Bounded thread pool or set of process replicas that every blocking engine call goes through"""
+
+    def __init__(
+        self,
+        kind: str = settings.INFERENCE_EXECUTOR,
+        max_workers: int = settings.INFERENCE_WORKERS,
+        max_queue: int = settings.INFERENCE_MAX_QUEUE,
+        process_initializer: Optional[Callable] = None
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor kind: {kind}")
+        if kind == "thread" and max_workers > 1:
+            raise ValueError(
+                "INFERENCE_WORKERS > 1 needs INFERENCE_EXECUTOR=process: thread workers would share one model "
+                "and its random generator"
+            )
+
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+        self.process_initializer = process_initializer
+
+        self._replicas: List[_Replica] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Counters
+        self.in_flight = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        """Create the worker pools"""
+        if self._replicas:
+            return
+
+        if self.kind == "process":
+            # Spawn so children never inherit a half-initialized torch runtime;
+            # one pool per worker so calls can be routed to a given replica
+            context = multiprocessing.get_context("spawn")
+            self._replicas = [
+                _Replica(idx, ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=context,
+                    initializer=_init_replica,
+                    initargs=(self.process_initializer,)
+                ), 1)
+                for idx in range(self.max_workers)
+            ]
+        else:
+            # The model lives in this process
+            replica = _Replica(0, ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference"
+            ), self.max_workers)
+            replica.info = topology.configure_process()
+            self._replicas = [replica]
+
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._loop = asyncio.get_running_loop()
+        logger.info(
+            f"Inference executor started ({self.kind}, {len(self._replicas)} replicas, {self.max_workers} workers)"
+        )
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the least-loaded replica, waiting for a free slot"""
+        if not self._replicas:
+            raise RuntimeError("Inference executor not started")
+
+        if self.max_queue and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise ExecutorBusyError(f"Inference queue is full ({self.queued} waiting)")
+
+        self.queued += 1
+        start = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        QUEUE_SECONDS.observe(time.perf_counter() - start, stage="executor")
+
+        # Holding a global slot guarantees some replica has a free worker
+        replica = min(self._replicas, key=lambda r: (r.load(), r.busy_seconds))
+        self.in_flight += 1
+        replica.in_flight += 1
+        try:
+            future = replica.pool.submit(partial(fn, *args, **kwargs))
+        except Exception:
+            self._release(replica, None)
+            raise
+        replica.running[future] = time.monotonic()
+
+        # Release the slot when the work really finishes, even if the caller
+        # stops waiting, so cancelled requests can't oversubscribe the pool
+        future.add_done_callback(
+            lambda f: self._loop.is_closed() or self._loop.call_soon_threadsafe(self._release, replica, f)
+        )
+        return await asyncio.wrap_future(future)
+
+    async def broadcast(self, fn: Callable, *args, **kwargs) -> List[Any]:
+        """Run a callable once on every replica (outside the slot accounting), e.g. at startup"""
+        if not self._replicas:
+            raise RuntimeError("Inference executor not started")
+        return await asyncio.gather(*[
+            asyncio.wrap_future(replica.pool.submit(partial(fn, *args, **kwargs)))
+            for replica in self._replicas
+        ])
+
+    def set_replica_info(self, infos: List[Dict]):
+        """Attach each replica's topology (pid, cores, threads) once its model is loaded"""
+        for replica, info in zip(self._replicas, infos):
+            replica.info = info
+            replica.started_at = time.monotonic()
+
+    def _release(self, replica: _Replica, future):
+        """Free a worker slot and update counters"""
+        self.in_flight -= 1
+        replica.in_flight -= 1
+        start = replica.running.pop(future, None)
+        if start is not None:
+            replica.busy_seconds += time.monotonic() - start
+        if future is None or future.cancelled() or future.exception() is not None:
+            self.failed += 1
+            replica.failed += 1
+        else:
+            self.completed += 1
+            replica.completed += 1
+        self._slots.release()
+
+    def stats(self) -> Dict:
+        """Current executor load"""
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "replicas": [replica.stats() for replica in self._replicas]
+        }
+
+    def shutdown(self):
+        """Stop the worker pools"""
+        for replica in self._replicas:
+            replica.pool.shutdown(wait=False, cancel_futures=True)
+        self._replicas = []
@@ -0,0 +1,130 @@
+"""
+Classifier-free guidance limited to the first decoder steps
+
+Dia guides every step by running each row twice in one batched forward,
+conditioned on the text and unconditioned, so guidance doubles the rows
+the decoder works on. Most of what guidance buys (adherence to the text,
+the voice settling in) is decided by the first frames, so a generation
+can be guided for its first ``steps`` steps and then continue on the
+conditional rows alone.
+
+This hooks into the model rather than ``generate``: from step ``steps``
+on, each forward is given only the conditional half of the batch (inputs,
+encoder states and KV caches, sliced in place), and its logits are handed
+back twice. Dia's guidance then works out to ``cond + (cond - cond) *
+scale``, which is the conditional logits unchanged.
+
+The hooks are installed on a model once and stay; each generation's step
+counter and slicing live in a window bound to the thread running it, so
+generations on other executor threads pass through untouched.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+import torch
+from transformers.modeling_outputs import BaseModelOutput
+
+# Forward arguments with one row per batch item (twice the batch when guided)
+_BATCHED_INPUTS = ("decoder_input_ids", "decoder_attention_mask", "decoder_position_ids", "attention_mask")
+
+# The window of the generation running on each thread
+_active = threading.local()
+_install_lock = threading.Lock()
+
+
+def uses_guidance(guidance_scale: Optional[float]) -> bool:
+    """Whether Dia runs an unconditional copy of every row (any scale but 1)"""
+    return guidance_scale is not None and guidance_scale != 1
+
+
+class _GuidanceWindow:
+    """One generation's steps: drops the unconditional rows once ``steps`` forwards have run"""
+
+    def __init__(self, steps: int):
+        self.steps = steps
+        self.calls = 0
+        self.rows: Optional[int] = None  # conditional rows, once dropping
+        self._sliced: List[Tuple[object, torch.Tensor, torch.Tensor]] = []
+
+    def _drop_unconditional(self, cache):
+        """Keep only the conditional half of every initialized cache layer"""
+        for layers in (cache.self_attention_cache.layers, cache.cross_attention_cache.layers):
+            for layer in layers:
+                if getattr(layer, "is_initialized", False):
+                    self._sliced.append((layer, layer.keys, layer.values))
+                    # Views, so static caches keep updating their own storage
+                    layer.keys, layer.values = layer.keys[:self.rows], layer.values[:self.rows]
+
+    def restore(self):
+        """Put back the full cache tensors (pooled static caches are reused at full size)"""
+        for layer, keys, values in self._sliced:
+            layer.keys, layer.values = keys, values
+        self._sliced.clear()
+
+    def before_forward(self, args, kwargs):
+        self.calls += 1
+        if self.calls <= self.steps:
+            return args, kwargs
+
+        encoder_outputs = kwargs["encoder_outputs"]
+        if self.rows is None:
+            self.rows = encoder_outputs[0].shape[0] // 2
+            self._drop_unconditional(kwargs["past_key_values"])
+
+        kwargs = dict(kwargs)
+        for key in _BATCHED_INPUTS:
+            if kwargs.get(key) is not None:
+                kwargs[key] = kwargs[key][:self.rows]
+        kwargs["encoder_outputs"] = BaseModelOutput(last_hidden_state=encoder_outputs[0][:self.rows])
+        return args, kwargs
+
+    def after_forward(self, output):
+        if self.rows is not None:
+            output.logits = torch.cat([output.logits, output.logits], dim=0)
+        return output
+
+
+@torch.compiler.disable
+def _before_forward(module, args, kwargs):
+    window = getattr(_active, "window", None)
+    return (args, kwargs) if window is None else window.before_forward(args, kwargs)
+
+
+@torch.compiler.disable
+def _after_forward(module, args, kwargs, output):
+    window = getattr(_active, "window", None)
+    return output if window is None else window.after_forward(output)
+
+
+def _install_hooks(model: torch.nn.Module):
+    """Hook the model once; models that never limit guidance are left alone"""
+    with _install_lock:
+        if getattr(model, "_guidance_window_hooks", None) is None:
+            model._guidance_window_hooks = (
+                model.register_forward_pre_hook(_before_forward, with_kwargs=True),
+                model.register_forward_hook(_after_forward, with_kwargs=True)
+            )
+
+
+@contextmanager
+def guidance_window(model: torch.nn.Module, guidance_scale: Optional[float], steps: int) -> Iterator[None]:
+    """Guide only the first ``steps`` decoder steps of the ``generate`` calls made inside
+
+    A no-op when ``steps`` is 0 or the scale doesn't guide. The first
+    forward (the prompt) counts as one step. Only forwards on the calling
+    thread are affected.
+    """
+    if not steps or not uses_guidance(guidance_scale):
+        yield
+        return
+
+    _install_hooks(model)
+    window = _GuidanceWindow(steps)
+    _active.window = window
+    try:
+        yield
+    finally:
+        _active.window = None
+        window.restore()
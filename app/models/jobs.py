@@ -0,0 +1,520 @@
+"""
+Persistent queue of asynchronous generation jobs
+"""
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.models.executor import ExecutorBusyError
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+_COLUMNS = (
+    "id, user, status, request, result, error, progress, attempts, webhook_url, "
+    "webhook_status, created_at, started_at, finished_at"
+)
+
+
+class JobNotFoundError(LookupError):
+    """Raised when a job does not exist or belongs to another user"""
+
+
+class WebhookRejected(ValueError):
+    """Raised for webhook URLs the server must not call"""
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Redirects could lead a webhook to a host that was never checked"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+_webhook_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def check_webhook_url(url: str):
+    """Reject webhook URLs that aren't http(s) or point at internal hosts (blocking: resolves the host)
+
+    With WEBHOOK_ALLOWED_HOSTS set, only those hosts are accepted. Otherwise
+    every address the host resolves to must be public, unless
+    WEBHOOK_ALLOW_PRIVATE is set.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise WebhookRejected("Webhook URL must be http(s) with a host")
+    host = parsed.hostname.lower()
+
+    if settings.WEBHOOK_ALLOWED_HOSTS:
+        if host not in {allowed.lower() for allowed in settings.WEBHOOK_ALLOWED_HOSTS}:
+            raise WebhookRejected(f"Webhook host {host} is not allowed")
+        return
+    if settings.WEBHOOK_ALLOW_PRIVATE:
+        return
+
+    try:
+        addresses = socket.getaddrinfo(host, parsed.port or 443, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise WebhookRejected(f"Webhook host {host} does not resolve")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if not address.is_global:
+            raise WebhookRejected(f"Webhook host {host} resolves to a non-public address")
+
+
+class JobQueue:
+    """Jobs stored in SQLite under DATA_DIR and drained by background workers
+
+    Every engine process runs its own workers against the same database.
+    A worker claims a job with a lease that it keeps renewing while the job
+    runs. If the process dies, the lease expires and another worker picks
+    the job up again, until the job has used up its attempts.
+    """
+
+    def __init__(
+        self,
+        run_job: Callable[[Dict, str, Callable[[float], None]], Awaitable[Dict]],
+        db_path: Path = Path(settings.DATA_DIR) / "jobs.db",
+        workers: int = settings.JOB_WORKERS,
+        poll_interval: float = settings.JOB_POLL_INTERVAL,
+        lease_seconds: int = settings.JOB_LEASE_SECONDS,
+        max_attempts: int = settings.JOB_MAX_ATTEMPTS,
+        retention_hours: float = settings.JOB_RETENTION_HOURS
+    ):
+        self.run_job = run_job
+        self.db_path = Path(db_path)
+        self.workers = max(0, workers)
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.retention = retention_hours * 3600
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}  # job id -> task, for jobs run by this process
+        self._progress: Dict[str, float] = {}
+        self._stopping = False
+        self._stopped = threading.Event()  # wakes webhook retries sleeping in threads
+
+        # Counters
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def open(self):
+        """Open (and create) the job database"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                user TEXT NOT NULL,
+                idempotency_key TEXT,
+                status TEXT NOT NULL,
+                request TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_expires_at REAL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                webhook_url TEXT,
+                webhook_status TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                UNIQUE (user, idempotency_key)
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    def start(self):
+        """Start the workers and the lease / cleanup loop"""
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+        logger.info(f"Job queue started ({self.workers} workers)")
+
+    async def submit(
+        self,
+        request: Dict,
+        user: str,
+        idempotency_key: Optional[str] = None,
+        webhook_url: Optional[str] = None
+    ) -> Tuple[Dict, bool]:
+        """Queue a job; returns the job and whether it was newly created
+
+        Repeating a submission with the same idempotency key returns the
+        original job instead of queueing the work again. Raises
+        WebhookRejected for a webhook URL that may not be called.
+        """
+        if webhook_url is not None:
+            await asyncio.to_thread(check_webhook_url, webhook_url)
+        job_id = uuid.uuid4().hex
+        created = await asyncio.to_thread(self._insert, job_id, request, user, idempotency_key, webhook_url)
+        if created:
+            self.submitted += 1
+            if self._wakeup is not None:
+                self._wakeup.set()
+            return await self.get(job_id, user), True
+
+        job = await asyncio.to_thread(self._find_by_key, user, idempotency_key)
+        return job, False
+
+    async def get(self, job_id: str, user: str) -> Dict:
+        """Current state of a job"""
+        job = await asyncio.to_thread(self._select, job_id, user)
+        if job is None:
+            raise JobNotFoundError(job_id)
+        return job
+
+    async def cancel(self, job_id: str, user: str) -> Dict:
+        """Cancel a queued job, or ask the worker running it to stop"""
+        cancelled = await asyncio.to_thread(self._cancel, job_id, user)
+        job = await self.get(job_id, user)
+        if cancelled:
+            self.cancelled += 1
+            self._notify(job)
+        elif job["status"] == "running" and job["job_id"] in self._running:
+            self._running[job["job_id"]].cancel()
+        return job
+
+    async def _worker(self):
+        """Claim and run jobs until stopped"""
+        while not self._stopping:
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to claim job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _run(self, job: Dict):
+        """Run one claimed job and record the outcome"""
+        job_id = job["id"]
+        self._progress[job_id] = 0.0
+        task = asyncio.create_task(self._execute(job_id, job["request"], job["user"]))
+        self._running[job_id] = task
+
+        result, error = None, None
+        try:
+            result = await task
+            status = "succeeded"
+        except asyncio.CancelledError:
+            if self._stopping:
+                # Shutting down: hand the job back to the queue
+                await asyncio.to_thread(self._release, job_id)
+                raise
+            status = "cancelled"
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            status, error = "failed", str(e)
+        finally:
+            self._running.pop(job_id, None)
+            self._progress.pop(job_id, None)
+
+        finished = await asyncio.to_thread(self._finish, job_id, status, result, error)
+        if finished is not None:
+            setattr(self, status, getattr(self, status) + 1)
+            self._notify(finished)
+
+    async def _execute(self, job_id: str, request: Dict, user: str) -> Dict:
+        """Generate the job's audio, waiting out a full inference queue"""
+        def on_progress(fraction: float):
+            self._progress[job_id] = fraction
+
+        while True:
+            try:
+                return await self.run_job(request, user, on_progress)
+            except ExecutorBusyError:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _maintain(self):
+        """Renew leases, pick up cancellations and purge old jobs"""
+        last_purge = 0.0
+        while not self._stopping:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                cancel_ids = await asyncio.to_thread(self._heartbeat, dict(self._progress))
+                for job_id in cancel_ids:
+                    task = self._running.get(job_id)
+                    if task is not None:
+                        task.cancel()
+
+                # Jobs whose worker died on their last attempt
+                for job in await asyncio.to_thread(self._fail_abandoned):
+                    self.failed += 1
+                    self._notify(job)
+
+                if self.retention and time.time() - last_purge > 60:
+                    last_purge = time.time()
+                    await asyncio.to_thread(self._purge)
+            except sqlite3.Error as e:
+                logger.error(f"Job queue maintenance failed: {e}")
+
+    def _notify(self, job: Dict):
+        """Deliver the completion webhook in the background"""
+        if job.get("webhook_url"):
+            task = asyncio.create_task(asyncio.to_thread(self._deliver_webhook, job))
+            self._tasks.append(task)
+            task.add_done_callback(self._tasks.remove)
+
+    def _deliver_webhook(self, job: Dict):
+        """POST the finished job to its webhook URL, retrying with backoff (blocking)
+
+        The URL is checked again before delivering, since its host may
+        resolve elsewhere by now. Retries stop when the queue stops.
+        """
+        body = json.dumps(job).encode()
+        signature = hmac.new(settings.SECRET_KEY.encode(), body, hashlib.sha256).hexdigest()
+        delivered = False
+        try:
+            check_webhook_url(job["webhook_url"])
+            attempts = settings.WEBHOOK_MAX_RETRIES + 1
+        except WebhookRejected as e:
+            logger.warning(f"Webhook for job {job['job_id']} not delivered: {e}")
+            attempts = 0
+        for attempt in range(attempts):
+            if attempt and self._stopped.wait(2 ** (attempt - 1)):
+                break
+            request = urllib.request.Request(
+                job["webhook_url"],
+                data=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Driaclaude-Signature": f"sha256={signature}"
+                },
+                method="POST"
+            )
+            try:
+                with _webhook_opener.open(request, timeout=settings.WEBHOOK_TIMEOUT):
+                    delivered = True
+                    break
+            except Exception as e:
+                logger.warning(f"Webhook for job {job['job_id']} failed (attempt {attempt + 1}): {e}")
+
+        with self._lock:
+            if self._db is None:
+                # The queue stopped while we were retrying
+                return
+            self._db.execute(
+                "UPDATE jobs SET webhook_status = ? WHERE id = ?",
+                ("delivered" if delivered else "failed", job["job_id"])
+            )
+
+    def _to_dict(self, row: Tuple) -> Dict:
+        """API view of a job row"""
+        (job_id, user, status, request, result, error, progress, attempts,
+         webhook_url, webhook_status, created_at, started_at, finished_at) = row
+
+        def iso(timestamp: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+        job = {
+            "job_id": job_id,
+            "status": status,
+            "progress": 1.0 if status == "succeeded" else round(self._progress.get(job_id, progress), 4),
+            "queue_position": None,
+            "attempts": attempts,
+            "request": json.loads(request),
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "webhook_url": webhook_url,
+            "webhook_status": webhook_status,
+            "created_at": iso(created_at),
+            "started_at": iso(started_at),
+            "finished_at": iso(finished_at)
+        }
+        if status == "queued":
+            job["queue_position"] = self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (created_at,)
+            ).fetchone()[0]
+        return job
+
+    def _insert(
+        self,
+        job_id: str,
+        request: Dict,
+        user: str,
+        idempotency_key: Optional[str],
+        webhook_url: Optional[str]
+    ) -> bool:
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO jobs (id, user, idempotency_key, status, request, webhook_url, created_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, user, idempotency_key, json.dumps(request), webhook_url, time.time())
+            )
+        return cursor.rowcount == 1
+
+    def _select(self, job_id: str, user: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE id = ? AND user = ?", (job_id, user)
+            ).fetchone()
+            return self._to_dict(row) if row else None
+
+    def _find_by_key(self, user: str, idempotency_key: str) -> Dict:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE user = ? AND idempotency_key = ?", (user, idempotency_key)
+            ).fetchone()
+            return self._to_dict(row)
+
+    def _claim(self) -> Optional[Dict]:
+        """Take the oldest queued job, or one whose worker's lease ran out"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                """UPDATE jobs
+                   SET status = 'running', worker = ?, lease_expires_at = ?,
+                       started_at = COALESCE(started_at, ?), attempts = attempts + 1
+                   WHERE id = (
+                       SELECT id FROM jobs
+                       WHERE status = 'queued'
+                          OR (status = 'running' AND lease_expires_at < ? AND attempts < ?)
+                       ORDER BY created_at LIMIT 1
+                   )
+                   RETURNING id, user, request""",
+                (self.worker_id, now + self.lease_seconds, now, now, self.max_attempts)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "user": row[1], "request": json.loads(row[2])}
+
+    def _heartbeat(self, progress: Dict[str, float]) -> List[str]:
+        """Extend leases of running jobs, store their progress, and return those to cancel"""
+        lease = time.time() + self.lease_seconds
+        with self._lock:
+            for job_id, fraction in progress.items():
+                self._db.execute(
+                    "UPDATE jobs SET lease_expires_at = ?, progress = ? WHERE id = ? AND worker = ?",
+                    (lease, fraction, job_id, self.worker_id)
+                )
+            return [
+                row[0] for row in self._db.execute(
+                    "SELECT id FROM jobs WHERE worker = ? AND status = 'running' AND cancel_requested = 1",
+                    (self.worker_id,)
+                )
+            ]
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict], error: Optional[str]) -> Optional[Dict]:
+        """Record the outcome, unless another worker has taken the job over"""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, progress = ?, finished_at = ?, "
+                "lease_expires_at = NULL WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, json.dumps(result) if result else None, error,
+                 1.0 if status == "succeeded" else 0.0, time.time(), job_id, self.worker_id)
+            )
+            if cursor.rowcount != 1:
+                return None
+            return self._to_dict(self._db.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def _release(self, job_id: str):
+        """Put a job this worker can't finish back in the queue"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, lease_expires_at = NULL, "
+                "attempts = attempts - 1 WHERE id = ? AND worker = ? AND status = 'running'",
+                (job_id, self.worker_id)
+            )
+
+    def _cancel(self, job_id: str, user: str) -> bool:
+        """Cancel a queued job outright, or flag a running one; True if it is now cancelled"""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? "
+                "WHERE id = ? AND user = ? AND status = 'queued'",
+                (time.time(), job_id, user)
+            )
+            if cursor.rowcount == 1:
+                return True
+            self._db.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND user = ? AND status = 'running'",
+                (job_id, user)
+            )
+        return False
+
+    def _fail_abandoned(self) -> List[Dict]:
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Worker stopped while running the job', "
+                "finished_at = ? WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ? "
+                "RETURNING id",
+                (now, now, self.max_attempts)
+            ).fetchall()
+            return [
+                self._to_dict(self._db.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (row[0],)).fetchone())
+                for row in rows
+            ]
+
+    def _purge(self):
+        """Forget finished jobs past the retention period"""
+        with self._lock:
+            self._db.execute(
+                f"DELETE FROM jobs WHERE status IN {FINISHED_STATUSES} AND finished_at < ?",
+                (time.time() - self.retention,)
+            )
+
+    def stats(self) -> Dict:
+        """Queue depth and job counters"""
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "workers": self.workers,
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "running_here": len(self._running),
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "cancelled": self.cancelled
+        }
+
+    async def stop(self):
+        """Stop the workers, returning unfinished jobs to the queue"""
+        self._stopping = True
+        self._stopped.set()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Webhook deliveries keep running in their threads; they check for this under the lock
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,167 @@
+"""
+Pool of preallocated static KV caches, reused across generations
+
+With a static decoder mode (see ``app.models.compilation``) every
+generation needs a decoder KV cache of its full length up front. For the
+full model that is hundreds of megabytes per batch row, and allocating
+and freeing one per request churns the allocator and fragments the heap,
+so resident memory creeps up over long uptimes. The pool keeps them:
+caches are bucketed by batch rows and length (rounded up to
+KV_CACHE_LENGTH_STEP), lent to one generation at a time, reset and kept
+for the next. Idle caches beyond KV_CACHE_POOL_MAX_BYTES are freed, least
+recently used first.
+
+Cross-attention caches hold the encoded text, are sized to its exact
+length and are small, so they are allocated per generation.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import torch
+from loguru import logger
+from transformers.cache_utils import EncoderDecoderCache, StaticCache
+
+from app.config import settings
+from app.metrics import resident_memory
+from app.models.guidance import uses_guidance
+
+_Key = Tuple[int, int]  # (batch rows, cache length)
+
+
+def cache_bytes(cache: StaticCache) -> int:
+    """Bytes held by a cache's key and value tensors"""
+    return sum(
+        layer.keys.nbytes + layer.values.nbytes
+        for layer in cache.layers if getattr(layer, "is_initialized", False)
+    )
+
+
+class KVCachePool:
+    """Decoder self-attention caches, bucketed by batch rows and length and lent out one generation at a time"""
+
+    def __init__(
+        self,
+        model: torch.nn.Module,
+        max_bytes: int = settings.KV_CACHE_POOL_MAX_BYTES,
+        length_step: int = settings.KV_CACHE_LENGTH_STEP
+    ):
+        self.config = model.config.get_text_config(decoder=True)
+        self.max_delay = max(model.config.delay_pattern)
+        self.dtype = model.dtype
+        self.device = model.device
+        self.max_bytes = max_bytes
+        self.length_step = max(1, length_step)
+
+        self._idle: "OrderedDict[_Key, List[StaticCache]]" = OrderedDict()
+        self._lock = threading.Lock()  # generations run on several executor threads
+
+        # Counters
+        self.idle_bytes = 0
+        self.in_use_bytes = 0
+        self.peak_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.idle_rss: Optional[int] = None  # resident memory the last time no cache was in use
+
+    def _bucket(self, rows: int, length: int) -> _Key:
+        return rows, math.ceil(length / self.length_step) * self.length_step
+
+    def _allocate(self, key: _Key) -> StaticCache:
+        rows, length = key
+        cache = StaticCache(self.config, max_cache_len=length)
+        cache.early_initialization(
+            batch_size=rows,
+            num_heads=self.config.num_key_value_heads,
+            head_dim=self.config.head_dim,
+            dtype=self.dtype,
+            device=self.device
+        )
+        return cache
+
+    def acquire(self, rows: int, length: int) -> Tuple[_Key, StaticCache]:
+        """An idle cache of at least ``length`` positions for ``rows`` batch rows, or a new one"""
+        key = self._bucket(rows, length)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                cache = idle.pop()
+                if not idle:
+                    del self._idle[key]
+                size = cache_bytes(cache)
+                self.idle_bytes -= size
+                self.in_use_bytes += size
+                self.hits += 1
+                return key, cache
+            self.misses += 1
+
+        cache = self._allocate(key)
+        size = cache_bytes(cache)
+        with self._lock:
+            self.in_use_bytes += size
+            self.peak_bytes = max(self.peak_bytes, self.in_use_bytes + self.idle_bytes)
+        return key, cache
+
+    def release(self, key: _Key, cache: StaticCache):
+        """Take a cache back after its generation, freeing idle ones beyond the byte limit"""
+        cache.reset()
+        size = cache_bytes(cache)
+        with self._lock:
+            self.in_use_bytes -= size
+            self._idle.setdefault(key, []).append(cache)
+            self._idle.move_to_end(key)
+            self.idle_bytes += size
+
+            # Least recently used buckets first
+            while self.idle_bytes > self.max_bytes and self._idle:
+                evicted_key, idle = next(iter(self._idle.items()))
+                evicted = idle.pop(0)
+                if not idle:
+                    del self._idle[evicted_key]
+                self.idle_bytes -= cache_bytes(evicted)
+                self.evictions += 1
+                logger.debug(f"KV cache pool: freed a {evicted_key[0]}x{evicted_key[1]} cache")
+
+            idle_now = self.in_use_bytes == 0
+
+        if idle_now:
+            self.idle_rss = resident_memory()
+
+    @contextmanager
+    def generation_cache(
+        self,
+        batch_size: int,
+        guidance_scale: Optional[float],
+        decoder_length: int,
+        encoder_length: int,
+        max_new_tokens: int
+    ) -> Iterator[EncoderDecoderCache]:
+        """Cache for one ``generate`` call, returned to the pool when the call ends"""
+        # Guidance runs an unconditional copy of every row
+        rows = batch_size * (2 if uses_guidance(guidance_scale) else 1)
+        # Dia generates up to its delay pattern past max_length
+        key, cache = self.acquire(rows, decoder_length + max_new_tokens + self.max_delay)
+        try:
+            yield EncoderDecoderCache(cache, StaticCache(self.config, max_cache_len=encoder_length))
+        finally:
+            self.release(key, cache)
+
+    def stats(self) -> Dict:
+        """Pooled bytes, reuse counters and the buckets held"""
+        with self._lock:
+            buckets = {f"{rows}x{length}": len(idle) for (rows, length), idle in self._idle.items()}
+            return {
+                "idle_bytes": self.idle_bytes,
+                "in_use_bytes": self.in_use_bytes,
+                "peak_bytes": self.peak_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "idle_buckets": buckets,
+                "idle_rss_bytes": self.idle_rss
+            }
@@ -0,0 +1,111 @@
+"""
+Splitting long texts into segments and stitching their audio back together
+"""
+
+import re
+from typing import List, Tuple
+
+import numpy as np
+
+_SPEAKER_TAG = re.compile(r"(\[S[12]\])")
+# Sentence end, optionally followed by closing quotes / brackets
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"'”’)\]]*\s+")
+_CLAUSE_END = re.compile(r"(?<=[,;:—])\s+")
+
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """Break a sentence longer than ``max_chars`` at clauses, then at words"""
+    if len(sentence) <= max_chars:
+        return [sentence]
+
+    pieces, current = [], ""
+    for clause in _CLAUSE_END.split(sentence):
+        words = [clause] if len(clause) <= max_chars else clause.split()
+        for word in words:
+            if current and len(current) + 1 + len(word) > max_chars:
+                pieces.append(current)
+                current = word
+            else:
+                current = f"{current} {word}".strip()
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """Split text into segments of at most ``max_chars`` at sentence and speaker-turn boundaries
+
+    Every segment starts with the speaker tag in effect at that point, and
+    tags are repeated inside a segment wherever the speaker changes. Raises
+    ValueError when there is nothing to speak besides speaker tags.
+    """
+    speaker = "[S1]"
+    sentences: List[Tuple[str, str]] = []
+    for part in _SPEAKER_TAG.split(text):
+        if _SPEAKER_TAG.fullmatch(part):
+            speaker = part
+            continue
+        part = " ".join(part.split())
+        for sentence in _SENTENCE_END.split(part):
+            if sentence:
+                sentences += [(speaker, piece) for piece in _split_long(sentence, max_chars)]
+
+    segments, current, current_speaker = [], "", None
+    for speaker, sentence in sentences:
+        addition = sentence if speaker == current_speaker else f"{speaker} {sentence}"
+        if current and len(current) + 1 + len(addition) > max_chars:
+            segments.append(current)
+            addition = f"{speaker} {sentence}"
+            current = ""
+        current = f"{current} {addition}".strip()
+        current_speaker = speaker
+    if current:
+        segments.append(current)
+    if not segments:
+        raise ValueError("Text has nothing to speak besides speaker tags")
+    return segments
+
+
+def trim_silence(audio: np.ndarray, sample_rate: int, keep_ms: int = 100, threshold_db: float = -45.0) -> np.ndarray:
+    """Shorten leading and trailing silence to at most ``keep_ms``"""
+    loud = np.flatnonzero(np.abs(audio) > 10 ** (threshold_db / 20))
+    if not loud.size:
+        return audio
+    keep = sample_rate * keep_ms // 1000
+    return audio[max(0, loud[0] - keep):loud[-1] + 1 + keep]
+
+
+def stitch_segments(
+    segments: List[np.ndarray],
+    sample_rate: int,
+    crossfade_ms: int,
+    max_seconds: float
+) -> Tuple[np.ndarray, bool]:
+    """Join segment waveforms with equal-power crossfades, capped at ``max_seconds``
+
+    Returns the audio and whether it had to be cut short.
+    """
+    if not segments:
+        raise ValueError("No segments to stitch")
+    segments = [trim_silence(segment.astype(np.float32), sample_rate) for segment in segments]
+    fade = sample_rate * crossfade_ms // 1000
+
+    audio = segments[0]
+    for segment in segments[1:]:
+        overlap = min(fade, len(audio), len(segment))
+        if overlap:
+            t = np.linspace(0.0, np.pi / 2, overlap, dtype=np.float32)
+            mixed = audio[-overlap:] * np.cos(t) + segment[:overlap] * np.sin(t)
+            audio = np.concatenate([audio[:-overlap], mixed, segment[overlap:]])
+        else:
+            audio = np.concatenate([audio, segment])
+
+    max_samples = int(max_seconds * sample_rate)
+    if len(audio) <= max_samples:
+        return audio, False
+
+    # Fade out instead of cutting mid-waveform
+    audio = audio[:max_samples].copy()
+    tail = min(fade or 1, max_samples)
+    audio[-tail:] *= np.linspace(1.0, 0.0, tail, dtype=np.float32)
+    return audio, True
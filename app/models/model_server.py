@@ -0,0 +1,380 @@
+"""
+Model server that lets several HTTP workers share one loaded model
+
+In ``DEPLOYMENT_MODE=model_server`` a single process owns the TTSEngine
+(model weights, batching scheduler, result cache and voices database) and
+serves it over a unix socket. Each uvicorn worker talks to it through a
+RemoteTTSEngine, so adding HTTP workers does not add model copies.
+
+Run the server on its own with:
+
+    python -m app.models.model_server
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import pickle
+import signal
+import struct
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.metrics import REGISTRY, Family, set_process_role
+
+# Engine methods HTTP workers may call, and those that yield results
+CALL_METHODS = (
+    "generate_speech", "render_speech", "clone_voice", "list_voices", "get_voice", "delete_voice",
+    "get_stats", "submit_job", "get_job", "cancel_job", "list_outputs", "touch_output",
+    "delete_output", "get_metrics", "admit", "release_admission", "import_voices",
+    "readiness"
+)
+STREAM_METHODS = ("stream_speech",)
+
+_HEADER = struct.Struct("!I")
+
+
+class ModelServerError(RuntimeError):
+    """Raised when the model server cannot be reached"""
+
+
+def socket_path() -> Path:
+    """Unix socket the model server listens on"""
+    return Path(settings.MODEL_SERVER_SOCKET or Path(settings.DATA_DIR) / "model_server.sock")
+
+
+async def _read_message(reader: asyncio.StreamReader) -> Tuple:
+    """Read one length-prefixed message"""
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return pickle.loads(await reader.readexactly(size))
+
+
+def _encode_message(message: Tuple) -> bytes:
+    """Frame one message; errors that can't be pickled are sent as their text"""
+    try:
+        data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        kind, call_id, payload = message
+        if kind != "error":
+            raise
+        data = pickle.dumps((kind, call_id, RuntimeError(str(payload))))
+    return _HEADER.pack(len(data)) + data
+
+
+class ModelServer:
+    """Serves one TTSEngine to any number of local clients"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or socket_path())
+        self.engine = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def serve(self):
+        """Load the model, then accept connections until SIGTERM / SIGINT"""
+        from app.models.tts_engine import TTSEngine
+
+        set_process_role("model_server")
+        for dir_path in [settings.DATA_DIR, settings.VOICES_DIR, settings.OUTPUTS_DIR]:
+            Path(dir_path).mkdir(parents=True, exist_ok=True)
+
+        self.engine = TTSEngine()
+        await self.engine.initialize()
+
+        # The socket only appears once the model is loaded, so a successful
+        # connect also means the server is ready
+        if self.path.exists():
+            self.path.unlink()
+        self._server = await asyncio.start_unix_server(self._handle_client, path=str(self.path))
+        os.chmod(self.path, 0o600)
+        logger.info(f"Model server listening on {self.path}")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+
+        try:
+            await stop.wait()
+        finally:
+            logger.info("Shutting down model server...")
+            self._server.close()
+            if self.path.exists():
+                self.path.unlink()
+            await self.engine.cleanup()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Run the calls of one HTTP worker concurrently over its connection"""
+        tasks: Dict[int, asyncio.Task] = {}
+        await self._send(writer, ("hello", None, {
+            "sample_rate": self.engine.sample_rate,
+            "model_revision": self.engine.model_revision,
+            "supports_streaming": self.engine.supports_streaming
+        }))
+
+        try:
+            while True:
+                kind, call_id, payload = await _read_message(reader)
+                if kind == "cancel":
+                    task = tasks.get(call_id)
+                    if task is not None:
+                        task.cancel()
+                    continue
+
+                task = asyncio.create_task(self._dispatch(writer, kind, call_id, *payload))
+                tasks[call_id] = task
+                task.add_done_callback(lambda _, call_id=call_id: tasks.pop(call_id, None))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            # Worker went away; stop its outstanding work
+            for task in list(tasks.values()):
+                task.cancel()
+            self.engine.admission.release_owner(id(writer))
+            writer.close()
+
+    async def _dispatch(
+        self,
+        writer: asyncio.StreamWriter,
+        kind: str,
+        call_id: int,
+        method: str,
+        args: Tuple,
+        kwargs: Dict
+    ):
+        """Run one engine call and send its result, chunks or error back"""
+        try:
+            if kind == "stream" and method in STREAM_METHODS:
+                async for chunk in getattr(self.engine, method)(*args, **kwargs):
+                    await self._send(writer, ("chunk", call_id, chunk))
+                await self._send(writer, ("end", call_id, None))
+            elif kind == "call" and method in CALL_METHODS:
+                if method == "admit":
+                    # Tickets of a worker that disconnects are released with it
+                    kwargs = dict(kwargs, owner=id(writer))
+                result = await getattr(self.engine, method)(*args, **kwargs)
+                await self._send(writer, ("result", call_id, result))
+            else:
+                raise ValueError(f"Unknown model server method: {method}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._send(writer, ("error", call_id, e))
+
+    async def _send(self, writer: asyncio.StreamWriter, message: Tuple):
+        try:
+            writer.write(_encode_message(message))
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+class RemoteTTSEngine:
+    """Client for the model server with the same async interface as TTSEngine"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or socket_path())
+        self.sample_rate = None
+        self.model_revision = None
+        self.supports_streaming = False
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._receiver: Optional[asyncio.Task] = None
+        self._connecting = asyncio.Lock()
+        self._pending: Dict[int, Any] = {}  # call id -> Future or Queue
+        self._ids = itertools.count()
+
+    async def initialize(self):
+        """Wait for the model server to come up and connect"""
+        logger.info(f"Connecting to model server at {self.path}...")
+        deadline = asyncio.get_running_loop().time() + settings.MODEL_SERVER_START_TIMEOUT
+        while True:
+            try:
+                await self._connect()
+                break
+            except ModelServerError:
+                if asyncio.get_running_loop().time() > deadline:
+                    raise
+                await asyncio.sleep(0.5)
+        logger.info("Connected to model server")
+
+    async def _connect(self):
+        """Open the connection if it is not already open"""
+        async with self._connecting:
+            if self._writer is not None:
+                return
+            try:
+                reader, writer = await asyncio.open_unix_connection(str(self.path))
+                _, _, info = await _read_message(reader)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                raise ModelServerError(f"Model server unavailable: {e}") from e
+
+            self.sample_rate = info["sample_rate"]
+            self.model_revision = info["model_revision"]
+            self.supports_streaming = info["supports_streaming"]
+            self._reader, self._writer = reader, writer
+            self._receiver = asyncio.create_task(self._receive())
+
+    async def _receive(self):
+        """Route responses to the calls waiting for them"""
+        try:
+            while True:
+                kind, call_id, payload = await _read_message(self._reader)
+                waiter = self._pending.get(call_id)
+                if waiter is None:
+                    continue
+                if isinstance(waiter, asyncio.Queue):
+                    waiter.put_nowait((kind, payload))
+                elif not waiter.done():
+                    if kind == "error":
+                        waiter.set_exception(payload)
+                    else:
+                        waiter.set_result(payload)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            logger.error(f"Lost connection to model server: {e}")
+        finally:
+            self._writer.close()
+            self._reader = self._writer = None
+            error = ModelServerError("Lost connection to model server")
+            for waiter in self._pending.values():
+                if isinstance(waiter, asyncio.Queue):
+                    waiter.put_nowait(("error", error))
+                elif not waiter.done():
+                    waiter.set_exception(error)
+
+    async def _send(self, kind: str, call_id: int, payload: Any):
+        # Reconnects if the server was restarted
+        await self._connect()
+        self._writer.write(_encode_message((kind, call_id, payload)))
+        await self._writer.drain()
+
+    def _cancel(self, call_id: int):
+        """Tell the server to stop work nobody is waiting for any more"""
+        if self._writer is not None:
+            self._writer.write(_encode_message(("cancel", call_id, None)))
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        """Run an engine method on the server and wait for its result"""
+        call_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[call_id] = future
+        try:
+            await self._send("call", call_id, (method, args, kwargs))
+            return await future
+        except asyncio.CancelledError:
+            self._cancel(call_id)
+            raise
+        finally:
+            self._pending.pop(call_id, None)
+
+    async def _stream(self, method: str, *args, **kwargs) -> AsyncIterator[Any]:
+        """Run a streaming engine method on the server, yielding its chunks"""
+        call_id = next(self._ids)
+        queue: asyncio.Queue = asyncio.Queue()
+        self._pending[call_id] = queue
+        finished = False
+        try:
+            await self._send("stream", call_id, (method, args, kwargs))
+            while True:
+                kind, payload = await queue.get()
+                if kind == "end":
+                    finished = True
+                    return
+                if kind == "error":
+                    finished = True
+                    raise payload
+                yield payload
+        finally:
+            if not finished:
+                self._cancel(call_id)
+            self._pending.pop(call_id, None)
+
+    async def generate_speech(self, text: str, **kwargs) -> Tuple[str, Dict]:
+        return await self._call("generate_speech", text, **kwargs)
+
+    async def render_speech(self, text: str, **kwargs) -> Tuple[bytes, Dict]:
+        return await self._call("render_speech", text, **kwargs)
+
+    def stream_speech(self, text: str, **kwargs) -> AsyncIterator:
+        return self._stream("stream_speech", text, **kwargs)
+
+    async def clone_voice(self, audio_path: str, **kwargs) -> str:
+        return await self._call("clone_voice", audio_path, **kwargs)
+
+    async def import_voices(self, archive_path: str) -> Dict:
+        return await self._call("import_voices", archive_path)
+
+    async def list_voices(self, limit: Optional[int] = None, offset: int = 0) -> Tuple[List[Dict], int]:
+        return await self._call("list_voices", limit, offset)
+
+    async def get_voice(self, voice_id: str) -> Optional[Dict]:
+        return await self._call("get_voice", voice_id)
+
+    async def delete_voice(self, voice_id: str) -> bool:
+        return await self._call("delete_voice", voice_id)
+
+    async def get_stats(self) -> Dict:
+        return await self._call("get_stats")
+
+    async def readiness(self) -> Dict:
+        return await self._call("readiness")
+
+    async def admit(self, items: List[Dict], user: str, priority: Optional[str] = None) -> str:
+        return await self._call("admit", items, user, priority)
+
+    async def release_admission(self, ticket: str):
+        return await self._call("release_admission", ticket)
+
+    async def submit_job(self, request: Dict, user: str, **kwargs) -> Tuple[Dict, bool]:
+        return await self._call("submit_job", request, user, **kwargs)
+
+    async def get_job(self, job_id: str, user: str) -> Dict:
+        return await self._call("get_job", job_id, user)
+
+    async def cancel_job(self, job_id: str, user: str) -> Dict:
+        return await self._call("cancel_job", job_id, user)
+
+    async def list_outputs(self, limit: int = 50, cursor: Optional[str] = None, **filters) -> Dict:
+        return await self._call("list_outputs", limit, cursor, **filters)
+
+    async def touch_output(self, filename: str):
+        return await self._call("touch_output", filename)
+
+    async def delete_output(self, filename: str) -> bool:
+        return await self._call("delete_output", filename)
+
+    async def get_metrics(self) -> List[Family]:
+        """This worker's HTTP metrics and the model server's engine metrics"""
+        return REGISTRY.collect() + await self._call("get_metrics")
+
+    async def cleanup(self):
+        """Close the connection (the server keeps running)"""
+        if self._receiver is not None:
+            self._receiver.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def run_model_server():
+    """Process entry point"""
+    asyncio.run(ModelServer().serve())
+
+
+def start_model_server_process() -> multiprocessing.Process:
+    """Start the model server next to the HTTP workers"""
+    # Not a daemon: the engine may start its own inference worker processes
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_model_server,
+        name="model-server"
+    )
+    process.start()
+    logger.info(f"Started model server (pid {process.pid})")
+    return process
+
+
+if __name__ == "__main__":
+    run_model_server()
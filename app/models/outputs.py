@@ -0,0 +1,332 @@
+"""
+Catalog of generated audio files in OUTPUTS_DIR
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import soundfile as sf
+from loguru import logger
+
+from app.config import settings
+from app.models.encoders import ENCODERS, audio_extensions
+
+_COLUMNS = "filename, user, size, duration, format, sample_rate, voice_id, parameters, created_at"
+
+
+def _encode_cursor(created_at: float, filename: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, filename]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        created_at, filename = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(created_at), str(filename)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class OutputCatalog:
+    """One row per generated file, indexed for newest-first listing and filtering
+
+    The catalog lives in SQLite under DATA_DIR and is shared by all
+    workers. Files generated before the catalog existed are picked up by a
+    one-time backfill that scans OUTPUTS_DIR in the background.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = Path(settings.DATA_DIR) / "outputs.db",
+        output_dir: Path = Path(settings.OUTPUTS_DIR)
+    ):
+        self.db_path = Path(db_path)
+        self.output_dir = Path(output_dir)
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._backfill: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def open(self):
+        """Open (and create) the catalog"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS outputs (
+                filename TEXT PRIMARY KEY,
+                user TEXT,
+                size INTEGER NOT NULL,
+                duration REAL,
+                format TEXT,
+                sample_rate INTEGER,
+                voice_id TEXT,
+                parameters TEXT,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS outputs_created ON outputs (created_at, filename)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS outputs_user_created ON outputs (user, created_at, filename)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS outputs_voice_created ON outputs (voice_id, created_at, filename)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS leases (
+                name TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )"""
+        )
+
+        # Catalogs created before files had an access time
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(outputs)")}
+        if "last_access" not in columns:
+            self._db.execute("ALTER TABLE outputs ADD COLUMN last_access REAL")
+        self._db.execute("UPDATE outputs SET last_access = created_at WHERE last_access IS NULL")
+        self._db.execute("CREATE INDEX IF NOT EXISTS outputs_last_access ON outputs (last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS outputs_user_last_access ON outputs (user, last_access)")
+
+    def start(self):
+        """Backfill files that predate the catalog, once, in the background"""
+        self._backfill = asyncio.create_task(asyncio.to_thread(self.backfill))
+
+    def backfill(self, force: bool = False) -> int:
+        """Add every audio file in OUTPUTS_DIR that is not in the catalog yet (blocking)
+
+        Only the first process to start does this, unless ``force``. A
+        backfill interrupted by shutdown runs again on the next start.
+        """
+        with self._lock:
+            claimed = self._db.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('backfill', ?)", (str(time.time()),)
+            ).rowcount
+        if not claimed and not force:
+            return 0
+
+        extensions = audio_extensions()
+        formats = {encoder.extension: name for name, encoder in ENCODERS.items()}
+        added, batch = 0, []
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                if self._stopping:
+                    with self._lock:
+                        self._db.execute("DELETE FROM meta WHERE key = 'backfill'")
+                    return added
+                suffix = Path(entry.name).suffix.lower()
+                if suffix not in extensions or not entry.is_file():
+                    continue
+                batch.append(self._describe_file(entry, formats[suffix]))
+                if len(batch) >= 500:
+                    added += self._insert_missing(batch)
+                    batch = []
+        added += self._insert_missing(batch)
+
+        if added:
+            logger.info(f"Added {added} existing files to the output catalog")
+        return added
+
+    def _describe_file(self, entry: os.DirEntry, format: str) -> Tuple:
+        stat = entry.stat()
+        duration, sample_rate = None, None
+        try:
+            info = sf.info(entry.path)
+            duration, sample_rate = round(info.duration, 3), info.samplerate
+        except Exception:
+            # Headerless PCM, or a file libsndfile can't read
+            pass
+        return (entry.name, None, stat.st_size, duration, format, sample_rate, None, None, stat.st_mtime, stat.st_mtime)
+
+    def _insert_missing(self, rows: List[Tuple]) -> int:
+        if not rows:
+            return 0
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                f"INSERT OR IGNORE INTO outputs ({_COLUMNS}, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            return self._db.total_changes - before
+
+    async def record(
+        self,
+        filename: str,
+        size: int,
+        user: Optional[str] = None,
+        duration: Optional[float] = None,
+        format: Optional[str] = None,
+        sample_rate: Optional[int] = None,
+        voice_id: Optional[str] = None,
+        parameters: Optional[Dict] = None
+    ):
+        """Add a freshly written file"""
+        now = time.time()
+        row = (
+            filename, user, size, duration, format, sample_rate, voice_id,
+            json.dumps(parameters) if parameters is not None else None, now, now
+        )
+        await asyncio.to_thread(self._insert, row)
+
+    def _insert(self, row: Tuple):
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO outputs ({_COLUMNS}, last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row
+            )
+
+    async def touch(self, filename: str):
+        """Mark a file as just used, so size limits evict it last"""
+        await asyncio.to_thread(self._touch, filename)
+
+    def _touch(self, filename: str):
+        with self._lock:
+            self._db.execute("UPDATE outputs SET last_access = ? WHERE filename = ?", (time.time(), filename))
+
+    def forget(self, filename: str):
+        """Drop a file's entry (blocking; safe from any thread)"""
+        with self._lock:
+            self._db.execute("DELETE FROM outputs WHERE filename = ?", (filename,))
+
+    async def remove(self, filename: str):
+        """Drop a file's entry"""
+        await asyncio.to_thread(self.forget, filename)
+
+    def forget_many(self, filenames: List[str]):
+        """Drop several entries at once (blocking)"""
+        with self._lock:
+            self._db.executemany("DELETE FROM outputs WHERE filename = ?", [(name,) for name in filenames])
+
+    def expired(self, before: float, limit: int) -> List[Tuple[str, int]]:
+        """Oldest files created before ``before``, as (filename, size)"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT filename, size FROM outputs WHERE created_at < ? ORDER BY created_at LIMIT ?",
+                (before, limit)
+            ).fetchall()
+
+    def least_recent(self, limit: int, user: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Least recently used files, of one user or overall, as (filename, size)"""
+        with self._lock:
+            if user is None:
+                return self._db.execute(
+                    "SELECT filename, size FROM outputs ORDER BY last_access LIMIT ?", (limit,)
+                ).fetchall()
+            return self._db.execute(
+                "SELECT filename, size FROM outputs WHERE user = ? ORDER BY last_access LIMIT ?", (user, limit)
+            ).fetchall()
+
+    def usage(self) -> Tuple[int, int, Dict[str, int]]:
+        """Number of files, their total size, and total size per user"""
+        with self._lock:
+            files, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM outputs").fetchone()
+            per_user = dict(self._db.execute(
+                "SELECT user, SUM(size) FROM outputs WHERE user IS NOT NULL GROUP BY user"
+            ).fetchall())
+        return files, size, per_user
+
+    def acquire_lease(self, name: str, owner: str, seconds: float) -> bool:
+        """Take or renew a named lease that only one process can hold at a time"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                """INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+                   ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                   WHERE leases.owner = excluded.owner OR leases.expires_at < ?""",
+                (name, owner, now + seconds, now)
+            )
+            row = self._db.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == owner
+
+    async def list(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        user: Optional[str] = None,
+        voice_id: Optional[str] = None,
+        format: Optional[str] = None,
+        created_after: Optional[float] = None,
+        created_before: Optional[float] = None
+    ) -> Dict:
+        """One page of files, newest first, with the cursor of the next page"""
+        return await asyncio.to_thread(
+            self._page, limit, cursor, user, voice_id, format, created_after, created_before
+        )
+
+    def _page(
+        self,
+        limit: int,
+        cursor: Optional[str],
+        user: Optional[str],
+        voice_id: Optional[str],
+        format: Optional[str],
+        created_after: Optional[float],
+        created_before: Optional[float]
+    ) -> Dict:
+        conditions, args = [], []
+        for column, value in (("user", user), ("voice_id", voice_id), ("format", format)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                args.append(value)
+        if created_after is not None:
+            conditions.append("created_at >= ?")
+            args.append(created_after)
+        if created_before is not None:
+            conditions.append("created_at < ?")
+            args.append(created_before)
+
+        filters = " AND ".join(conditions) or "1"
+        page_conditions, page_args = filters, list(args)
+        if cursor is not None:
+            created_at, filename = _decode_cursor(cursor)
+            page_conditions += " AND (created_at, filename) < (?, ?)"
+            page_args += [created_at, filename]
+
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM outputs WHERE {filters}", args).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM outputs WHERE {page_conditions} "
+                "ORDER BY created_at DESC, filename DESC LIMIT ?",
+                page_args + [limit + 1]
+            ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1][8], rows[-1][0])
+
+        files = [
+            {
+                "filename": filename,
+                "size": size,
+                "created_at": created_at,
+                "url": f"/outputs/{filename}",
+                "duration": duration,
+                "format": format,
+                "sample_rate": sample_rate,
+                "voice_id": voice_id,
+                "user": user,
+                "parameters": json.loads(parameters) if parameters else None
+            }
+            for filename, user, size, duration, format, sample_rate, voice_id, parameters, created_at in rows
+        ]
+        return {"files": files, "total": total, "limit": limit, "next_cursor": next_cursor}
+
+    async def close(self):
+        """Stop the backfill and close the catalog"""
+        self._stopping = True
+        if self._backfill is not None:
+            await asyncio.gather(self._backfill, return_exceptions=True)
+            self._backfill = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+if __name__ == "__main__":
+    catalog = OutputCatalog()
+    catalog.open()
+    print(f"Added {catalog.backfill(force=True)} files")
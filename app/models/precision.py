@@ -0,0 +1,200 @@
+"""
+Reduced-precision inference modes and a quality check against fp32
+
+Run the quality check with:
+
+    python -m app.models.precision --precision int8 bf16
+"""
+
+import argparse
+import json
+import resource
+import time
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from loguru import logger
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+DEFAULT_CHECK_TEXTS = [
+    "[S1] Thank you for calling. How can I help you today?",
+    "[S1] The quick brown fox jumps over the lazy dog. [S2] Does it really? (laughs)",
+]
+
+
+def cpu_supports_bf16() -> bool:
+    """Whether this CPU has native bfloat16 matmul support (AVX512-BF16 / AMX)"""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        pass
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:
+        return False
+
+
+def resolve_precision(requested: str) -> str:
+    """Map a configured precision (including "auto") to one this host can run"""
+    requested = requested.lower()
+    if requested == "auto":
+        return "bf16" if cpu_supports_bf16() else "fp32"
+    if requested not in PRECISIONS:
+        raise ValueError(f"Unknown inference precision: {requested}. Choose from {', '.join(PRECISIONS)} or auto")
+    if requested == "bf16" and not cpu_supports_bf16():
+        logger.warning("CPU has no native bfloat16 support, falling back to fp32")
+        return "fp32"
+    return requested
+
+
+def load_dtype(precision: str) -> torch.dtype:
+    """dtype to load checkpoint weights in for a precision mode"""
+    return torch.bfloat16 if precision == "bf16" else torch.float32
+
+
+def apply_precision(model: torch.nn.Module, precision: str) -> torch.nn.Module:
+    """Convert a loaded model to the given precision mode"""
+    if precision == "int8":
+        # Dynamic quantization: int8 weights, activations quantized per batch
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model.to(load_dtype(precision))
+
+
+def model_memory_bytes(model: torch.nn.Module) -> int:
+    """Bytes held by a model's weights and buffers, including packed int8 weights"""
+    def size(value) -> int:
+        if isinstance(value, torch.Tensor):
+            return value.nelement() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(size(v) for v in value)
+        return 0
+
+    return sum(size(value) for value in model.state_dict().values())
+
+
+def process_rss_bytes() -> int:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        # ru_maxrss is the peak, in KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def log_memory_footprint(model: torch.nn.Module, precision: str):
+    """Log weight and process memory after loading"""
+    logger.info(
+        f"Model precision {precision}: weights {model_memory_bytes(model) / 1024 ** 2:.0f} MB, "
+        f"process RSS {process_rss_bytes() / 1024 ** 2:.0f} MB"
+    )
+
+
+def compare_precisions(
+    model_name: str,
+    precisions: List[str],
+    texts: Optional[List[str]] = None,
+    max_new_tokens: int = 256,
+    seed: int = 0
+) -> Dict:
+    """Compare reduced-precision models against fp32 on the same inputs
+
+    fp32 generates a reference token sequence for each text (greedy, so it
+    is deterministic). Each candidate is then teacher-forced on that
+    sequence, and its next-token predictions are compared with fp32's:
+    top-1 agreement, mean KL divergence, and max absolute logit error. Also
+    reported: weight memory and decode speed (ms per generated step).
+    """
+    from transformers import AutoProcessor, DiaForConditionalGeneration
+
+    texts = texts or DEFAULT_CHECK_TEXTS
+    processor = AutoProcessor.from_pretrained(model_name)
+
+    def load(precision: str) -> torch.nn.Module:
+        model = DiaForConditionalGeneration.from_pretrained(model_name, torch_dtype=load_dtype(precision))
+        return apply_precision(model, precision).eval()
+
+    def timed_generate(model, inputs) -> Tuple[torch.Tensor, float]:
+        torch.manual_seed(seed)
+        start = time.perf_counter()
+        with torch.no_grad():
+            sequences = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
+        elapsed = time.perf_counter() - start
+        return sequences, elapsed * 1000 / max(1, sequences.shape[1] - 1)
+
+    def teacher_forced_logits(model, inputs, sequences) -> torch.Tensor:
+        with torch.no_grad():
+            return model(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                decoder_input_ids=sequences.contiguous()
+            ).logits.float()
+
+    reference = load("fp32")
+    cases = []
+    for text in texts:
+        inputs = processor(text=[text], padding=True, return_tensors="pt")
+        sequences, ms_per_step = timed_generate(reference, inputs)
+        cases.append({
+            "inputs": inputs,
+            "sequences": sequences,
+            "logits": teacher_forced_logits(reference, inputs, sequences),
+            "ms_per_step": ms_per_step
+        })
+
+    report = {
+        "model": model_name,
+        "max_new_tokens": max_new_tokens,
+        "fp32": {
+            "weights_mb": round(model_memory_bytes(reference) / 1024 ** 2, 1),
+            "ms_per_step": round(sum(c["ms_per_step"] for c in cases) / len(cases), 2)
+        }
+    }
+    del reference
+
+    for precision in precisions:
+        precision = resolve_precision(precision)
+        if precision == "fp32" or precision in report:
+            continue
+
+        model = load(precision)
+        agreement, kl, max_err, speed = [], [], [], []
+        for case in cases:
+            logits = teacher_forced_logits(model, case["inputs"], case["sequences"])
+            ref_logits = case["logits"]
+            agreement.append((logits.argmax(-1) == ref_logits.argmax(-1)).float().mean().item())
+            kl.append(torch.nn.functional.kl_div(
+                logits.log_softmax(-1), ref_logits.log_softmax(-1), log_target=True, reduction="batchmean"
+            ).item())
+            max_err.append((logits - ref_logits).abs().max().item())
+            speed.append(timed_generate(model, case["inputs"])[1])
+
+        report[precision] = {
+            "weights_mb": round(model_memory_bytes(model) / 1024 ** 2, 1),
+            "ms_per_step": round(sum(speed) / len(speed), 2),
+            "top1_agreement": round(sum(agreement) / len(agreement), 4),
+            "mean_kl": round(sum(kl) / len(kl), 6),
+            "max_abs_logit_error": round(max(max_err), 4)
+        }
+        del model
+
+    return report
+
+
+if __name__ == "__main__":
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="Compare reduced-precision inference against fp32")
+    parser.add_argument("--model", default=settings.MODEL_NAME)
+    parser.add_argument("--precision", nargs="+", default=["bf16", "int8"], choices=PRECISIONS + ("auto",))
+    parser.add_argument("--text", action="append", help="Text to check (repeatable)")
+    parser.add_argument("--max-new-tokens", type=int, default=256)
+    args = parser.parse_args()
+
+    print(json.dumps(
+        compare_precisions(args.model, args.precision, args.text, args.max_new_tokens),
+        indent=2
+    ))
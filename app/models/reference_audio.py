@@ -0,0 +1,157 @@
+"""
+Reference audio for voice cloning: probing, decoding and preprocessing uploaded samples
+
+Durations come from the container header, so uploads that are too short
+or too long are rejected without decoding them. Decoding uses libsndfile
+(WAV, FLAC, Ogg and MP3), falling back to torchaudio for anything else.
+
+Accepted samples are preprocessed once into a canonical form: mono at the
+model's sample rate, loudness-normalized (ITU-R BS.1770 gated loudness)
+and with leading and trailing silence trimmed, stored as 16-bit PCM WAV.
+Encoding the voice prompt from it needs no resampling or downmixing.
+
+Everything here is blocking; callers run it in a worker thread or process.
+"""
+
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+import soundfile as sf
+import torch
+import torchaudio
+
+from app.config import settings
+from app.models.encoders import resample
+from app.models.longform import trim_silence
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg")
+
+
+@dataclass
+class AudioInfo:
+    """What the header of an audio file says"""
+    duration: float
+    sample_rate: int
+    channels: int
+    format: str
+
+
+def probe_audio(path: Path) -> AudioInfo:
+    """Duration and layout of an audio file, decoding it only when its header can't be read"""
+    try:
+        info = sf.info(str(path))
+    except RuntimeError:
+        waveform, sample_rate = load_audio(path)
+        return AudioInfo(waveform.shape[1] / sample_rate, sample_rate, waveform.shape[0], Path(path).suffix[1:].upper())
+    if info.frames <= 0 or info.samplerate <= 0:
+        # Some MP3 headers carry no length
+        waveform, sample_rate = load_audio(path)
+        return AudioInfo(waveform.shape[1] / sample_rate, sample_rate, waveform.shape[0], info.format)
+    return AudioInfo(info.frames / info.samplerate, info.samplerate, info.channels, info.format)
+
+
+def load_audio(path: Path) -> Tuple[torch.Tensor, int]:
+    """Decode a whole file into a float waveform of shape (channels, samples)"""
+    try:
+        data, sample_rate = sf.read(str(path), dtype="float32", always_2d=True)
+    except RuntimeError:
+        return torchaudio.load(str(path))
+    return torch.from_numpy(data.T.copy()), sample_rate
+
+
+def _biquad(audio: torch.Tensor, b: Tuple[float, float, float], a: Tuple[float, float, float]) -> torch.Tensor:
+    return torchaudio.functional.lfilter(
+        audio, torch.tensor(a, dtype=audio.dtype), torch.tensor(b, dtype=audio.dtype), clamp=False
+    )
+
+
+def _k_weighted(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    """BS.1770 K-weighting (high shelf plus high pass), with coefficients for any sample rate"""
+    waveform = torch.from_numpy(audio.astype(np.float64))
+
+    # Shelf: +4 dB above ~1.5 kHz
+    gain, w0 = 10 ** (4.0 / 40), 2 * math.pi * 1500.0 / sample_rate
+    alpha, cos = math.sin(w0) / (2 * (1 / math.sqrt(2))), math.cos(w0)
+    root = 2 * math.sqrt(gain) * alpha
+    waveform = _biquad(
+        waveform,
+        (
+            gain * ((gain + 1) + (gain - 1) * cos + root),
+            -2 * gain * ((gain - 1) + (gain + 1) * cos),
+            gain * ((gain + 1) + (gain - 1) * cos - root)
+        ),
+        ((gain + 1) - (gain - 1) * cos + root, 2 * ((gain - 1) - (gain + 1) * cos), (gain + 1) - (gain - 1) * cos - root)
+    )
+
+    # High pass at 38 Hz
+    w0 = 2 * math.pi * 38.0 / sample_rate
+    alpha, cos = math.sin(w0) / (2 * 0.5), math.cos(w0)
+    waveform = _biquad(waveform, ((1 + cos) / 2, -(1 + cos), (1 + cos) / 2), (1 + alpha, -2 * cos, 1 - alpha))
+    return waveform.numpy()
+
+
+def loudness(audio: np.ndarray, sample_rate: int) -> float:
+    """Integrated loudness of a mono waveform in LUFS (400 ms blocks, absolute and relative gates)"""
+    weighted = _k_weighted(audio, sample_rate)
+    block, step = int(0.4 * sample_rate), int(0.1 * sample_rate)
+    if len(weighted) < block:
+        powers = np.array([np.mean(weighted ** 2)])
+    else:
+        starts = range(0, len(weighted) - block + 1, step)
+        powers = np.array([np.mean(weighted[start:start + block] ** 2) for start in starts])
+
+    def lufs(power):
+        return -0.691 + 10 * np.log10(np.maximum(power, 1e-12))
+
+    gated = powers[lufs(powers) > -70.0]
+    if not gated.size:
+        return -70.0
+    gated = gated[lufs(gated) > lufs(np.mean(gated)) - 10.0]
+    return float(lufs(np.mean(gated)))
+
+
+def preprocess_reference(
+    source: Path,
+    destination: Path,
+    sample_rate: int,
+    target_lufs: float = settings.VOICE_TARGET_LUFS,
+    peak_db: float = -1.0,
+    trim_db: float = settings.VOICE_TRIM_DB,
+    keep_ms: int = 100
+) -> Dict:
+    """Write the canonical form of a reference sample to ``destination`` (a WAV file)
+
+    The gain that brings the sample to ``target_lufs`` is lowered if it
+    would push peaks above ``peak_db``. Silence is trimmed after
+    normalizing, so the threshold is relative to the normalized level.
+    """
+    waveform, original_rate = load_audio(source)
+    original_duration = waveform.shape[1] / original_rate
+
+    audio = resample(waveform.float().mean(dim=0).numpy(), original_rate, sample_rate)
+    measured = loudness(audio, sample_rate)
+    gain_db = target_lufs - measured
+    peak = float(np.max(np.abs(audio))) if audio.size else 0.0
+    if peak > 0:
+        gain_db = min(gain_db, peak_db - 20 * math.log10(peak))
+    audio = audio * 10 ** (gain_db / 20)
+    audio = trim_silence(audio, sample_rate, keep_ms=keep_ms, threshold_db=trim_db)
+
+    sf.write(str(destination), np.clip(audio, -1.0, 1.0), sample_rate, subtype="PCM_16", format="WAV")
+    return {
+        "duration": round(len(audio) / sample_rate, 3),
+        "original_duration": round(original_duration, 3),
+        "original_sample_rate": original_rate,
+        "original_channels": waveform.shape[0],
+        "sample_rate": sample_rate,
+        "loudness": round(measured, 2),
+        "gain_db": round(gain_db, 2)
+    }
+
+
+def init_preprocess_worker():
+    """Preprocessing processes run one sample each; they don't need more than one thread"""
+    torch.set_num_threads(1)
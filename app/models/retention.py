@@ -0,0 +1,187 @@
+"""
+Retention of generated audio: expiry, total size limit and per-user quotas
+"""
+
+import asyncio
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.metrics import RETENTION_BYTES_RECLAIMED, RETENTION_FILES_REMOVED, RETENTION_LAST_SWEEP, RETENTION_SWEEP_SECONDS
+from app.models.outputs import OutputCatalog
+
+POLICIES = ("ttl", "user_quota", "max_bytes")
+
+
+def _select(candidates: List[Tuple[str, int]], excess: int) -> List[Tuple[str, int]]:
+    """Shortest prefix of the candidates that frees at least ``excess`` bytes"""
+    selected, freed = [], 0
+    for filename, size in candidates:
+        if freed >= excess:
+            break
+        selected.append((filename, size))
+        freed += size
+    return selected
+
+
+class RetentionSweeper:
+    """Removes outputs past OUTPUT_TTL_HOURS, over a user's quota, or over OUTPUT_MAX_BYTES
+
+    Size limits remove the least recently used files first (files are used
+    when they are written, downloaded or served from the result cache).
+    One process at a time sweeps, under a lease in the output catalog.
+    Files are removed in batches of RETENTION_SWEEP_BATCH in a worker
+    thread, so a large backlog is worked off without blocking the event
+    loop.
+    """
+
+    def __init__(
+        self,
+        catalog: OutputCatalog,
+        ttl_hours: float = settings.OUTPUT_TTL_HOURS,
+        max_bytes: int = settings.OUTPUT_MAX_BYTES,
+        user_quota: int = settings.OUTPUT_USER_QUOTA_BYTES,
+        user_quotas: Optional[Dict[str, int]] = None,
+        interval: float = settings.RETENTION_SWEEP_INTERVAL,
+        batch: int = settings.RETENTION_SWEEP_BATCH
+    ):
+        self.catalog = catalog
+        self.output_dir = catalog.output_dir
+        self.ttl = ttl_hours * 3600
+        self.max_bytes = max_bytes
+        self.user_quota = user_quota
+        self.user_quotas = settings.OUTPUT_USER_QUOTAS if user_quotas is None else user_quotas
+        self.interval = interval
+        self.batch = max(1, batch)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.lease_seconds = max(60.0, interval * 3)
+
+        self._task: Optional[asyncio.Task] = None
+
+        # Counters (of sweeps run by this process)
+        self.sweeps = 0
+        self.last_sweep_at: Optional[float] = None
+        self.last_sweep_seconds = 0.0
+        self.total_sweep_seconds = 0.0
+        self.files_removed = {policy: 0 for policy in POLICIES}
+        self.bytes_reclaimed = {policy: 0 for policy in POLICIES}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.ttl or self.max_bytes or self.user_quota or any(self.user_quotas.values()))
+
+    def start(self):
+        """Start sweeping in the background, if any limit is set"""
+        if self.enabled:
+            self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        while True:
+            try:
+                if await asyncio.to_thread(self._renew_lease):
+                    await self.sweep()
+            except sqlite3.Error as e:
+                logger.error(f"Output retention sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def _renew_lease(self) -> bool:
+        return self.catalog.acquire_lease("retention", self.owner, self.lease_seconds)
+
+    async def sweep(self) -> Dict[str, int]:
+        """Apply all limits once; returns the number of files removed per policy"""
+        start = time.perf_counter()
+        removed = {policy: 0 for policy in POLICIES}
+
+        if self.ttl:
+            while True:
+                expired = await asyncio.to_thread(self.catalog.expired, time.time() - self.ttl, self.batch)
+                if not expired:
+                    break
+                removed["ttl"] += await self._remove(expired, "ttl")
+
+        if self.user_quota or self.user_quotas:
+            _, _, per_user = await asyncio.to_thread(self.catalog.usage)
+            for user, used in per_user.items():
+                quota = self.user_quotas.get(user, self.user_quota)
+                while quota and used > quota:
+                    candidates = await asyncio.to_thread(self.catalog.least_recent, self.batch, user)
+                    if not candidates:
+                        break
+                    selected = _select(candidates, used - quota)
+                    removed["user_quota"] += await self._remove(selected, "user_quota")
+                    used -= sum(size for _, size in selected)
+
+        if self.max_bytes:
+            _, total, _ = await asyncio.to_thread(self.catalog.usage)
+            while total > self.max_bytes:
+                candidates = await asyncio.to_thread(self.catalog.least_recent, self.batch)
+                if not candidates:
+                    break
+                selected = _select(candidates, total - self.max_bytes)
+                removed["max_bytes"] += await self._remove(selected, "max_bytes")
+                total -= sum(size for _, size in selected)
+
+        elapsed = time.perf_counter() - start
+        self.sweeps += 1
+        self.last_sweep_at = time.time()
+        self.last_sweep_seconds = round(elapsed, 3)
+        self.total_sweep_seconds += elapsed
+        RETENTION_SWEEP_SECONDS.observe(elapsed)
+        RETENTION_LAST_SWEEP.set(self.last_sweep_at)
+        if any(removed.values()):
+            logger.info(f"Output retention removed {sum(removed.values())} files in {elapsed:.2f}s ({removed})")
+        return removed
+
+    async def _remove(self, files: List[Tuple[str, int]], policy: str) -> int:
+        """Delete one batch of files and their catalog entries, keeping the lease alive"""
+        await asyncio.to_thread(self._delete, files)
+        reclaimed = sum(size for _, size in files)
+        self.files_removed[policy] += len(files)
+        self.bytes_reclaimed[policy] += reclaimed
+        RETENTION_FILES_REMOVED.inc(len(files), policy=policy)
+        RETENTION_BYTES_RECLAIMED.inc(reclaimed, policy=policy)
+        await asyncio.to_thread(self._renew_lease)
+        return len(files)
+
+    def _delete(self, files: List[Tuple[str, int]]):
+        for filename, _ in files:
+            try:
+                os.remove(Path(self.output_dir) / filename)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Dropped from the catalog anyway, so one bad file can't stall the sweep
+                logger.warning(f"Failed to remove expired output {filename}: {e}")
+        self.catalog.forget_many([filename for filename, _ in files])
+
+    def stats(self) -> Dict:
+        """Current usage, limits and sweep counters (blocking)"""
+        files, size, _ = self.catalog.usage()
+        return {
+            "enabled": self.enabled,
+            "files": files,
+            "bytes": size,
+            "ttl_hours": self.ttl / 3600,
+            "max_bytes": self.max_bytes,
+            "user_quota_bytes": self.user_quota,
+            "sweeps": self.sweeps,
+            "last_sweep_at": self.last_sweep_at,
+            "last_sweep_seconds": self.last_sweep_seconds,
+            "total_sweep_seconds": round(self.total_sweep_seconds, 3),
+            "files_removed": dict(self.files_removed),
+            "bytes_reclaimed": dict(self.bytes_reclaimed)
+        }
+
+    async def stop(self):
+        """Stop sweeping"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,131 @@
+"""
+Micro-batching scheduler that coalesces concurrent generation requests
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.metrics import BATCH_SIZE, QUEUE_SECONDS
+
+# Generation parameters that must match for requests to share a model.generate call.
+# max_new_tokens is a length bucket, so batches hold requests of similar length
+BATCH_PARAMS = ("temperature", "guidance_scale", "guidance_steps", "top_p", "top_k", "max_new_tokens")
+
+
+class _PendingItem:
+    """A queued request waiting for its batch to run"""
+
+    __slots__ = ("payload", "future", "queued_at")
+
+    def __init__(self, payload: Any, future: asyncio.Future):
+        self.payload = payload
+        self.future = future
+        self.queued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """Collect requests for a short window and run compatible ones as one padded batch"""
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any], Dict], Awaitable[List[Any]]],
+        window_ms: int = settings.BATCH_WINDOW_MS,
+        max_batch_size: int = settings.BATCH_MAX_SIZE
+    ):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+
+        self._pending: Dict[Tuple, List[_PendingItem]] = {}
+        self._timers: Dict[Tuple, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+        # Counters
+        self.batches = 0
+        self.items = 0
+
+    async def submit(
+        self,
+        payload: Any,
+        seed: Optional[int] = None,
+        group: Optional[str] = None,
+        **params
+    ) -> Any:
+        """Queue one request and wait for its share of the batch result
+
+        ``group`` further restricts which requests may share a batch (e.g.
+        requests conditioned on the same voice prompt).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        item = _PendingItem(payload, future)
+
+        if seed is not None:
+            # Sampling in a batch depends on the other rows, so seeded
+            # requests run alone. The seed goes to torch's process-global
+            # generator, which stays theirs because the executor runs one
+            # generation at a time per model process (see executor.py)
+            self._start(dict(params, seed=seed), [item])
+            return await future
+
+        key = tuple(params[name] for name in BATCH_PARAMS) + (group,)
+        pending = self._pending.setdefault(key, [])
+        pending.append(item)
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+
+        return await future
+
+    def _flush(self, key: Tuple):
+        """Send the pending group for a parameter set to the model"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+        items = self._pending.pop(key, [])
+        if items:
+            self._start(dict(zip(BATCH_PARAMS, key[:-1])), items)
+
+    def _start(self, params: Dict, items: List[_PendingItem]):
+        """Run a batch in the background"""
+        task = asyncio.create_task(self._run(params, items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, params: Dict, items: List[_PendingItem]):
+        """Run one batch and hand each caller its result"""
+        self.batches += 1
+        self.items += len(items)
+        started = time.perf_counter()
+        for item in items:
+            QUEUE_SECONDS.observe(started - item.queued_at, stage="batch")
+        BATCH_SIZE.observe(len(items))
+
+        try:
+            results = await self.run_batch([item.payload for item in items], params)
+        except Exception as e:
+            logger.error(f"Batch of {len(items)} failed: {e}")
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item, result in zip(items, results):
+            if not item.future.done():
+                item.future.set_result(result)
+
+    def stats(self) -> Dict:
+        """Batching counters"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "pending": sum(len(group) for group in self._pending.values())
+        }
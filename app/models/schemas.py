@@ -6,21 +6,58 @@ from pydantic import BaseModel, Field, validator
 from typing import Optional, List, Dict
 from datetime import datetime
 
+from app.config import settings
+from app.models.encoders import get_encoder
+
 class TTSRequest(BaseModel):
     """Text-to-speech generation request"""
     text: str = Field(..., description="Text to convert to speech. Use [S1] and [S2] for dialogue")
     voice_id: Optional[str] = Field(None, description="Voice ID for cloned voice")
     temperature: float = Field(1.8, description="Sampling temperature", ge=0.1, le=2.0)
     guidance_scale: float = Field(3.0, description="Guidance scale for generation", ge=1.0, le=10.0)
+    guidance_steps: Optional[int] = Field(
+        None,
+        description="Apply guidance to the first N decoder steps only (about 86 per second of audio), then "
+                    "generate without it: faster, a little less faithful to the text. GUIDANCE_STEPS when unset",
+        ge=1
+    )
     top_p: float = Field(0.90, description="Top-p sampling parameter", ge=0.1, le=1.0)
     top_k: int = Field(45, description="Top-k sampling parameter", ge=1, le=100)
     seed: Optional[int] = Field(None, description="Random seed for reproducibility")
+    long_form: Optional[bool] = Field(
+        None,
+        description="Split the text into segments synthesized in parallel; automatic for long texts when unset"
+    )
+    format: str = Field(
+        settings.DEFAULT_OUTPUT_FORMAT,
+        description="Output format: mp3, wav, pcm (raw 16-bit little-endian), flac, ogg (Vorbis) or opus"
+    )
+    sample_rate: Optional[int] = Field(
+        None,
+        description="Resample the output, e.g. 8000 for telephony; the model's rate when unset",
+        ge=8000,
+        le=48000
+    )
+    persist: bool = Field(
+        False,
+        description="Also save the audio to the outputs directory (POST /tts/audio; /tts/generate always saves)"
+    )
     
     @validator('text')
     def validate_text(cls, v):
         if not v.strip():
             raise ValueError("Text cannot be empty")
         return v
+    
+    @validator('format')
+    def validate_format(cls, v):
+        return get_encoder(v).name
+    
+    @validator('sample_rate')
+    def validate_sample_rate(cls, v, values):
+        if v is not None and 'format' in values:
+            get_encoder(values['format']).output_rate(v, v)
+        return v
 
 class TTSResponse(BaseModel):
     """Text-to-speech generation response"""
@@ -54,6 +91,21 @@ class VoiceCloneResponse(BaseModel):
     voice_id: str
     message: str
 
+class VoiceImportItem(BaseModel):
+    """Outcome for one voice of an archive import"""
+    index: int
+    file: str
+    name: str
+    voice_id: Optional[str] = None
+    error: Optional[str] = None
+
+class VoiceImportResponse(BaseModel):
+    """Bulk voice import response"""
+    success: bool
+    imported: List[VoiceImportItem]
+    failed: List[VoiceImportItem]
+    total: int
+
 class Voice(BaseModel):
     """Voice information"""
     id: str
@@ -66,6 +118,8 @@ class VoiceListResponse(BaseModel):
     """Voice list response"""
     voices: List[Voice]
     total: int
+    limit: Optional[int] = None
+    offset: int = 0
 
 class BatchTTSRequest(BaseModel):
     """Batch TTS generation request"""
@@ -75,8 +129,8 @@ class BatchTTSRequest(BaseModel):
     def validate_items(cls, v):
         if not v:
             raise ValueError("Batch must contain at least one item")
-        if len(v) > 10:
-            raise ValueError("Batch size cannot exceed 10 items")
+        if len(v) > settings.MAX_BATCH_ITEMS:
+            raise ValueError(f"Batch size cannot exceed {settings.MAX_BATCH_ITEMS} items")
         return v
 
 class BatchTTSResponse(BaseModel):
@@ -84,4 +138,30 @@ class BatchTTSResponse(BaseModel):
     success: bool
     results: List[TTSResponse]
     failed: List[Dict]
-    total: int
\ No newline at end of file
+    total: int
+
+class JobRequest(TTSRequest):
+    """Asynchronous TTS job request"""
+    webhook_url: Optional[str] = Field(None, description="URL to POST the finished job to")
+    
+    @validator('webhook_url')
+    def validate_webhook_url(cls, v):
+        if v is not None and not v.startswith(("http://", "https://")):
+            raise ValueError("Webhook URL must be http(s)")
+        return v
+
+class JobResponse(BaseModel):
+    """Asynchronous TTS job status"""
+    job_id: str
+    status: str = Field(..., description="queued, running, succeeded, failed or cancelled")
+    progress: float = Field(..., description="Fraction of the token budget generated so far")
+    queue_position: Optional[int] = Field(None, description="Jobs ahead of this one while queued")
+    attempts: int
+    request: Dict
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    webhook_url: Optional[str] = None
+    webhook_status: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,200 @@
+"""
+Pre-serialized model snapshots for fast cold starts
+
+A snapshot holds the model already in its inference precision, so startup
+skips checkpoint parsing, dtype conversion and quantization. fp32 / bf16
+weights are stored as safetensors and memory-mapped on load; pages are
+read lazily and shared through the page cache between processes on the
+same host. int8 models are stored as a pickled module (safetensors cannot
+hold packed quantized weights) and loaded with ``torch.load(mmap=True)``.
+
+Write one with:
+
+    python -m app.models.snapshot /app/data/snapshot --precision int8
+
+and set MODEL_SNAPSHOT_DIR to its path.
+"""
+
+import argparse
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import torch
+import transformers
+from loguru import logger
+from safetensors.torch import load_file, save_file
+from transformers import (
+    AutoConfig,
+    AutoFeatureExtractor,
+    AutoProcessor,
+    AutoTokenizer,
+    DacModel,
+    DiaForConditionalGeneration,
+    DiaProcessor,
+    GenerationConfig,
+)
+
+from app.models.precision import apply_precision, load_dtype, resolve_precision
+
+SNAPSHOT_INFO = "snapshot.json"
+WEIGHTS_FILE = "model.safetensors"
+MODULE_FILE = "model.pt"
+
+
+class SnapshotError(RuntimeError):
+    """Raised when a snapshot is missing or was written by incompatible versions"""
+
+
+@contextmanager
+def phase_timer(timings: Dict[str, float], phase: str):
+    """Record how long a startup phase took, in seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = round(time.perf_counter() - start, 3)
+
+
+def _save_module(module: torch.nn.Module, directory: Path):
+    """Write config and every parameter and buffer (including non-persistent ones)"""
+    directory.mkdir(parents=True, exist_ok=True)
+    module.config.save_pretrained(directory)
+    if getattr(module, "generation_config", None) is not None:
+        module.generation_config.save_pretrained(directory)
+
+    tensors = {
+        name: tensor.detach().contiguous()
+        for name, tensor in chain(
+            module.named_parameters(remove_duplicate=False),
+            module.named_buffers(remove_duplicate=False)
+        )
+    }
+    save_file(tensors, str(directory / WEIGHTS_FILE), metadata={"format": "pt"})
+
+
+def _load_module(model_class, directory: Path) -> torch.nn.Module:
+    """Build a module without allocating weights, then point it at the mapped file"""
+    config = AutoConfig.from_pretrained(directory)
+    with torch.device("meta"):
+        module = model_class(config)
+
+    for name, tensor in load_file(str(directory / WEIGHTS_FILE)).items():
+        owner_name, _, attr = name.rpartition(".")
+        owner = module.get_submodule(owner_name)
+        if attr in owner._parameters:
+            owner._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+        else:
+            owner._buffers[attr] = tensor
+
+    missing = [
+        name for name, tensor in chain(module.named_parameters(), module.named_buffers())
+        if tensor.is_meta
+    ]
+    if missing:
+        raise SnapshotError(f"Snapshot in {directory} is missing tensors: {', '.join(missing[:5])}")
+
+    if (directory / "generation_config.json").exists():
+        module.generation_config = GenerationConfig.from_pretrained(directory)
+    return module.eval()
+
+
+def read_snapshot_info(snapshot_dir: str) -> Dict:
+    """Metadata of a snapshot, checked against the running library versions"""
+    info_path = Path(snapshot_dir) / SNAPSHOT_INFO
+    if not info_path.exists():
+        raise SnapshotError(f"No model snapshot in {snapshot_dir}")
+
+    with open(info_path, "r") as f:
+        info = json.load(f)
+
+    # Pickled modules only load reliably with the versions that wrote them
+    if info["format"] == "torch" and (
+        info["torch_version"] != torch.__version__
+        or info["transformers_version"] != transformers.__version__
+    ):
+        raise SnapshotError(
+            f"Snapshot was written with torch {info['torch_version']} / transformers "
+            f"{info['transformers_version']}; rebuild it for this environment"
+        )
+    return info
+
+
+def write_snapshot(output_dir: str, model_name: str, precision: str) -> Dict:
+    """Load a model the way the engine does and save it ready to serve"""
+    output_dir = Path(output_dir)
+    precision = resolve_precision(precision)
+
+    processor = AutoProcessor.from_pretrained(model_name)
+    model = DiaForConditionalGeneration.from_pretrained(model_name, torch_dtype=load_dtype(precision))
+    model = apply_precision(model, precision).eval()
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    processor.tokenizer.save_pretrained(output_dir / "processor")
+    processor.feature_extractor.save_pretrained(output_dir / "processor")
+    _save_module(processor.audio_tokenizer, output_dir / "audio_tokenizer")
+
+    if precision == "int8":
+        (output_dir / "model").mkdir(parents=True, exist_ok=True)
+        torch.save(model, output_dir / "model" / MODULE_FILE)
+        snapshot_format = "torch"
+    else:
+        _save_module(model, output_dir / "model")
+        snapshot_format = "safetensors"
+
+    revision = getattr(model.config, "_commit_hash", None) or "local"
+    info = {
+        "model_name": model_name,
+        "revision": f"{model_name}@{revision}:{precision}",
+        "precision": precision,
+        "format": snapshot_format,
+        "torch_version": torch.__version__,
+        "transformers_version": transformers.__version__,
+        "created_at": datetime.now().isoformat()
+    }
+    with open(output_dir / SNAPSHOT_INFO, "w") as f:
+        json.dump(info, f, indent=2)
+
+    logger.info(f"Wrote {precision} snapshot of {model_name} to {output_dir}")
+    return info
+
+
+def load_snapshot(
+    snapshot_dir: str,
+    timings: Optional[Dict[str, float]] = None
+) -> Tuple[DiaProcessor, torch.nn.Module, Dict]:
+    """Load processor and model from a snapshot, recording phase timings"""
+    snapshot_dir = Path(snapshot_dir)
+    timings = timings if timings is not None else {}
+    info = read_snapshot_info(str(snapshot_dir))
+
+    with phase_timer(timings, "processor"):
+        processor = DiaProcessor(
+            feature_extractor=AutoFeatureExtractor.from_pretrained(snapshot_dir / "processor"),
+            tokenizer=AutoTokenizer.from_pretrained(snapshot_dir / "processor"),
+            audio_tokenizer=_load_module(DacModel, snapshot_dir / "audio_tokenizer")
+        )
+
+    with phase_timer(timings, "weights"):
+        if info["format"] == "torch":
+            model = torch.load(snapshot_dir / "model" / MODULE_FILE, mmap=True, weights_only=False).eval()
+        else:
+            model = _load_module(DiaForConditionalGeneration, snapshot_dir / "model")
+
+    return processor, model, info
+
+
+if __name__ == "__main__":
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="Write a ready-to-serve model snapshot")
+    parser.add_argument("output_dir")
+    parser.add_argument("--model", default=settings.MODEL_NAME)
+    parser.add_argument("--precision", default=settings.INFERENCE_PRECISION, choices=("fp32", "bf16", "int8", "auto"))
+    args = parser.parse_args()
+
+    print(json.dumps(write_snapshot(args.output_dir, args.model, args.precision), indent=2))
@@ -0,0 +1,146 @@
+"""
+Incremental audio decoding for streaming generation
+"""
+
+import threading
+from typing import Callable, List
+
+import numpy as np
+import torch
+from transformers.generation.streamers import BaseStreamer
+from transformers.generation.stopping_criteria import StoppingCriteria
+
+from app.config import settings
+
+
+class StreamingUnavailable(RuntimeError):
+    """Raised when the engine can't stream (worker processes can't push chunks back)"""
+
+
+class AudioStreamer(BaseStreamer):
+    """Decode codebook frames into audio while model.generate is still running
+
+    Dia emits one token per codebook channel per step, with channel ``c``
+    delayed by ``delay_pattern[c]`` steps. Audio frame ``t`` is complete once
+    step ``t + 1 + max(delay_pattern)`` has been generated. Completed frames
+    are decoded with the DAC audio tokenizer in chunks, using a few frames of
+    left context and holding back a few lookahead frames so chunk boundaries
+    stay clean.
+    """
+
+    def __init__(
+        self,
+        config,
+        audio_tokenizer,
+        on_audio: Callable[[np.ndarray], None],
+        prompt_frames: int = 0,
+        chunk_frames: int = settings.STREAM_CHUNK_FRAMES,
+        context_frames: int = settings.STREAM_CONTEXT_FRAMES,
+        lookahead_frames: int = settings.STREAM_LOOKAHEAD_FRAMES
+    ):
+        self.audio_tokenizer = audio_tokenizer
+        self.delay_pattern = list(config.delay_pattern)
+        self.eos_token_id = config.decoder_config.eos_token_id
+        self.pad_token_id = config.decoder_config.pad_token_id
+        self.num_channels = len(self.delay_pattern)
+        self.max_delay = max(self.delay_pattern)
+
+        self.on_audio = on_audio
+        self.chunk_frames = max(1, chunk_frames)
+        self.context_frames = max(0, context_frames)
+        self.lookahead_frames = max(0, lookahead_frames)
+
+        self.steps: List[torch.Tensor] = []  # one (channels,) tensor per step
+        self.start_frame = prompt_frames  # frames belonging to an audio prompt are not emitted
+        self.emitted_frames = prompt_frames
+        self.total_frames = None  # set once EOS is seen
+        self.cancelled = threading.Event()
+
+    def put(self, value: torch.Tensor):
+        """Receive the tokens of one or more generation steps"""
+        steps = value.reshape(self.num_channels, -1)
+        for idx in range(steps.shape[1]):
+            self.steps.append(steps[:, idx])
+
+        if self.total_frames is None:
+            self._find_eos()
+
+        available = self._complete_frames() - self.lookahead_frames
+        if available - self.emitted_frames >= self.chunk_frames:
+            self._emit(available)
+
+    def end(self):
+        """Flush the remaining frames when generation finishes"""
+        self._emit(self._complete_frames())
+
+    def _find_eos(self):
+        """Detect the end of audio on the undelayed channel"""
+        # Step 0 is BOS; frame t of channel 0 lives at step t + 1
+        for step in range(max(1, self.emitted_frames + 1), len(self.steps)):
+            token = int(self.steps[step][0])
+            if token in (self.eos_token_id, self.pad_token_id):
+                self.total_frames = step - 1
+                return
+
+    def _complete_frames(self) -> int:
+        """Number of frames with every channel generated"""
+        complete = max(0, len(self.steps) - 1 - self.max_delay)
+        if self.total_frames is not None:
+            complete = min(complete, self.total_frames)
+        return complete
+
+    def _emit(self, end_frame: int):
+        """Decode frames up to ``end_frame`` and hand the new audio to the callback"""
+        if end_frame <= self.emitted_frames:
+            return
+
+        start = max(self.start_frame, self.emitted_frames - self.context_frames)
+        codes = torch.stack([
+            torch.stack([self.steps[t + 1 + delay][c] for c, delay in enumerate(self.delay_pattern)])
+            for t in range(start, end_frame)
+        ]).long().clamp_(0, self.eos_token_id - 1)
+
+        with torch.no_grad():
+            audio = self.audio_tokenizer.decode(
+                audio_codes=codes.T[None].to(self.audio_tokenizer.device)
+            ).audio_values.cpu().squeeze().float()
+
+        hop = audio.shape[-1] // (end_frame - start)
+        audio = audio[(self.emitted_frames - start) * hop:].numpy()
+        self.emitted_frames = end_frame
+        if audio.size:
+            self.on_audio(audio)
+
+
+class StreamCancelled(StoppingCriteria):
+    """Stop generation once the streaming client has gone away"""
+
+    def __init__(self, streamer: AudioStreamer):
+        self.streamer = streamer
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.full(
+            (input_ids.shape[0],),
+            self.streamer.cancelled.is_set(),
+            dtype=torch.bool,
+            device=input_ids.device
+        )
+
+
+class GenerationProgress(StoppingCriteria):
+    """Report the fraction of ``max_new_tokens`` generated so far; never stops generation"""
+
+    def __init__(self, callback: Callable[[float], None], max_new_tokens: int, every: int = 16):
+        self.callback = callback
+        self.max_new_tokens = max(1, max_new_tokens)
+        self.every = max(1, every)
+        self.start = None
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        length = input_ids.shape[-1]
+        if self.start is None:
+            self.start = length - 1
+        step = length - self.start
+        if step % self.every == 0:
+            self.callback(min(1.0, step / self.max_new_tokens))
+        return torch.zeros((input_ids.shape[0],), dtype=torch.bool, device=input_ids.device)
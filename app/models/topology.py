@@ -0,0 +1,192 @@
+"""
+CPU topology of the model processes: core sets, NUMA nodes and torch thread counts
+
+Every process that holds a model (the engine process with the thread
+executor, or each worker of the process executor) claims one of
+``model_processes()`` slots on the host. A slot maps to a core set from
+CPU_AFFINITY; the process is pinned to it, and torch gets as many
+intra-op threads as the set has cores, so replicas never compete for the
+same cores. Without pinning, each process still only takes its share of
+the cores.
+"""
+
+import fcntl
+import glob
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import torch
+from loguru import logger
+
+from app.config import settings
+
+# Slot lock files held for the life of the process
+_slot_file = None
+_process_info: Dict = {}
+
+
+def parse_cpu_list(text: str) -> List[int]:
+    """CPU numbers of a list like ``0-3,8,10-11``"""
+    cpus = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def numa_nodes() -> Dict[int, List[int]]:
+    """Available CPUs per NUMA node (a single node where the kernel reports none)"""
+    cpus = set(available_cpus())
+    nodes = {}
+    for path in glob.glob("/sys/devices/system/node/node*/cpulist"):
+        node = int(re.search(r"node(\d+)", path).group(1))
+        with open(path) as f:
+            node_cpus = [cpu for cpu in parse_cpu_list(f.read()) if cpu in cpus]
+        if node_cpus:
+            nodes[node] = node_cpus
+    return dict(sorted(nodes.items())) or {0: sorted(cpus)}
+
+
+def _split(cpus: List[int], parts: int) -> List[List[int]]:
+    """Contiguous, near-equal chunks"""
+    parts = max(1, min(parts, len(cpus)))
+    size, extra = divmod(len(cpus), parts)
+    chunks, start = [], 0
+    for idx in range(parts):
+        end = start + size + (idx < extra)
+        chunks.append(cpus[start:end])
+        start = end
+    return chunks
+
+
+def cpu_sets(spec: str, slots: int) -> List[List[int]]:
+    """Core set of each slot for a CPU_AFFINITY value; empty when processes are not pinned
+
+    ``auto`` splits the available cores evenly (in NUMA node order, so sets
+    only span nodes when there are fewer slots than nodes), ``numa`` puts
+    slots on nodes round-robin and splits each node among its slots, and
+    an explicit list like ``0-31;32-63`` gives the sets themselves (reused
+    round-robin if there are more slots).
+    """
+    spec = spec.strip().lower()
+    if not spec:
+        return []
+    if spec == "auto":
+        ordered = [cpu for node_cpus in numa_nodes().values() for cpu in node_cpus]
+        chunks = _split(ordered, slots)
+    elif spec == "numa":
+        nodes = list(numa_nodes().values())
+        per_node = [list(range(idx, slots, len(nodes))) for idx in range(len(nodes))]
+        chunks = [None] * slots
+        for node_cpus, node_slots in zip(nodes, per_node):
+            for slot, chunk in zip(node_slots, _split(node_cpus, len(node_slots))):
+                chunks[slot] = chunk
+        chunks = [chunk for chunk in chunks if chunk]
+    else:
+        chunks = [parse_cpu_list(part) for part in spec.split(";") if part.strip()]
+        if not chunks:
+            raise ValueError(f"Invalid CPU_AFFINITY: {spec}")
+    return [chunks[slot % len(chunks)] for slot in range(slots)]
+
+
+def model_processes() -> int:
+    """How many processes on this host hold a model"""
+    per_engine = settings.INFERENCE_WORKERS if settings.INFERENCE_EXECUTOR == "process" else 1
+    engines = 1 if settings.DEPLOYMENT_MODE == "model_server" else settings.WORKERS
+    return max(1, engines * per_engine)
+
+
+def _claim_slot(slots: int) -> Optional[int]:
+    """Lock the first free slot; the lock goes away with the process"""
+    global _slot_file
+    directory = Path(settings.DATA_DIR) / "topology"
+    directory.mkdir(parents=True, exist_ok=True)
+    for slot in range(slots):
+        handle = open(directory / f"slot{slot}.lock", "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            continue
+        _slot_file = handle
+        return slot
+    return None
+
+
+def _pin(cpus: List[int]):
+    """Pin every thread of this process; threads started later inherit it"""
+    os.sched_setaffinity(0, cpus)
+    for task in os.listdir("/proc/self/task"):
+        try:
+            os.sched_setaffinity(int(task), cpus)
+        except OSError:
+            pass
+
+
+def configure_process(
+    spec: str = settings.CPU_AFFINITY,
+    threads: int = settings.TORCH_THREADS,
+    interop_threads: int = settings.TORCH_INTEROP_THREADS
+) -> Dict:
+    """Claim a slot, pin this process to its cores and size torch's thread pools (once per process)"""
+    global _process_info
+    if _process_info:
+        return _process_info
+
+    slots = model_processes()
+    sets = cpu_sets(spec, slots)
+    slot = _claim_slot(slots)
+    cpus = available_cpus()
+    if sets and slot is not None:
+        cpus = sets[slot]
+        _pin(cpus)
+    elif sets:
+        logger.warning(f"All {slots} CPU slots are taken; running this model process unpinned")
+
+    if threads <= 0:
+        threads = len(cpus) if sets else max(1, len(cpus) // slots)
+    torch.set_num_threads(threads)
+    if interop_threads > 0:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Only possible before the first inter-op work in this process
+            interop_threads = torch.get_num_interop_threads()
+
+    nodes = numa_nodes()
+    _process_info = {
+        "pid": os.getpid(),
+        "slot": slot,
+        "slots": slots,
+        "pinned": bool(sets) and slot is not None,
+        "cpus": cpus,
+        "numa_nodes": sorted(node for node, node_cpus in nodes.items() if set(cpus) & set(node_cpus)),
+        "threads": threads,
+        "interop_threads": interop_threads
+    }
+    logger.info(
+        f"Model process {os.getpid()}: slot {slot}/{slots}, {len(cpus)} cores"
+        f"{' (pinned)' if _process_info['pinned'] else ''}, {threads} intra-op threads"
+    )
+    return _process_info
+
+
+def process_info() -> Dict:
+    """The topology this process was configured with"""
+    return dict(_process_info)
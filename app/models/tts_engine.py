@@ -4,18 +4,52 @@ TTS Engine wrapper for dia model
 
 import os
 import asyncio
+import time
 import torch
 import torchaudio
+import numpy as np
 from pathlib import Path
-from typing import Optional, Dict, List, Tuple
+from typing import Any, AsyncIterator, Callable, Hashable, Iterator, Optional, Dict, List, Tuple
 from datetime import datetime
 import hashlib
-import json
+import multiprocessing
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 
 from transformers import AutoProcessor, DiaForConditionalGeneration
+from transformers.generation.stopping_criteria import StoppingCriteriaList
 from loguru import logger
 
 from app.config import settings
+from app.metrics import (
+    AUDIO_SECONDS, GENERATION_SECONDS, GENERATIONS_IN_FLIGHT, PHASE_SECONDS, REAL_TIME_FACTOR, REGISTRY,
+    TOKENS_PER_SECOND, Family, process_memory, voice_label
+)
+from app.models.admission import AdmissionController
+from app.models.budget import TokenBudget
+from app.models.cache import ResultCache, make_cache_key
+from app.models.compilation import generation_options, resolve_decoder_mode, warmup_plan
+from app.models.encoders import encode_audio, get_encoder
+from app.models.executor import InferenceExecutor
+from app.models.guidance import guidance_window, uses_guidance
+from app.models.jobs import JobQueue
+from app.models.kv_cache import KVCachePool
+from app.models.longform import split_text, stitch_segments
+from app.models.outputs import OutputCatalog
+from app.models.precision import apply_precision, load_dtype, log_memory_footprint, resolve_precision
+from app.models.reference_audio import (
+    AUDIO_EXTENSIONS, init_preprocess_worker, load_audio, preprocess_reference, probe_audio
+)
+from app.models.retention import RetentionSweeper
+from app.models.scheduler import BatchScheduler
+from app.models.snapshot import SnapshotError, load_snapshot, phase_timer, read_snapshot_info
+from app.models.streaming import AudioStreamer, GenerationProgress, StreamCancelled, StreamingUnavailable
+from app.models.topology import process_info
+from app.models.voice_archive import ArchiveError, VoiceArchive
+from app.models.voices import VoiceStore
 
 class TTSEngine:
     """TTS Engine for CPU-based text-to-speech generation"""
@@ -24,26 +58,69 @@ class TTSEngine:
         self.model = None
         self.processor = None
         self.device = "cpu"  # Force CPU usage
-        self.voices_db = {}
-        self.voices_db_path = Path(settings.VOICES_DIR) / "voices_db.json"
+        self.sample_rate = None
+        self.model_revision = None
+        self.decoder_mode = None
+        self.generation_options: Dict = {}  # extra model.generate arguments of the decoder mode
+        self.kv_cache: Optional[KVCachePool] = None  # static decoder modes only
+        self.precision = None
+        self.load_timings: Dict[str, float] = {}
+        self.voices = VoiceStore(on_change=lambda voice_id: self.audio_prompts.pop(voice_id, None))
+        self.executor = InferenceExecutor(process_initializer=_init_worker_engine)
+        self.scheduler = BatchScheduler(self._generate_batch)
+        self.budget = TokenBudget()
+        self.admission = AdmissionController()
+        self.outputs = OutputCatalog()
+        self.retention = RetentionSweeper(self.outputs)
+        self.cache = ResultCache() if settings.RESULT_CACHE_ENABLED else None
+        self.jobs = JobQueue(self._run_job)
+        self.audio_prompts: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+        self._preprocess_pool: Optional[ProcessPoolExecutor] = None
+        self.ready = False
+        self.warmup: Dict = {"status": "pending"}
+        self._warmup_task: Optional[asyncio.Task] = None
         
     async def initialize(self):
         """Initialize the TTS model and processor"""
         try:
-            logger.info(f"Loading model from {settings.MODEL_NAME}...")
+            self.executor.start()
             
-            # Load processor and model
-            self.processor = AutoProcessor.from_pretrained(settings.MODEL_NAME)
-            self.model = DiaForConditionalGeneration.from_pretrained(
-                settings.MODEL_NAME,
-                torch_dtype=torch.float32  # Use float32 for CPU
-            ).to(self.device)
+            if self.executor.kind == "process":
+                # Each worker process loads its own model; wait until all are up
+                logger.info(f"Loading model from {settings.MODEL_NAME} in {self.executor.max_workers} worker processes...")
+                model_infos = await self.executor.broadcast(_call_worker_engine, "_get_model_info")
+                self.executor.set_replica_info(await self.executor.broadcast(process_info))
+                model_info = model_infos[0]
+                self.sample_rate = model_info["sample_rate"]
+                self.model_revision = model_info["model_revision"]
+                self.decoder_mode = model_info["decoder_mode"]
+                self.load_timings = model_info["load_timings"]
+                self.budget.configure(model_info["frame_rate"], model_info["max_delay"])
+            else:
+                await self.executor.run(self._load_model)
+            self.admission.workers = self.executor.max_workers
             
-            # Set model to evaluation mode
-            self.model.eval()
+            if self.cache is not None:
+                self.cache.open()
+            self.outputs.open()
+            self.outputs.start()
+            self.retention.start()
             
             # Load voices database
-            await self._load_voices_db()
+            await asyncio.to_thread(self.voices.open)
+            self.voices.start()
+            
+            # Drain queued jobs, including any left over from a previous run
+            self.jobs.open()
+            self.jobs.start()
+            
+            REGISTRY.add_collector(self._collect_metrics)
+            
+            # Warm up in the background, so liveness checks pass while it runs
+            if settings.WARMUP_ENABLED:
+                self._warmup_task = asyncio.create_task(self.warm_up())
+            else:
+                self.ready = True
             
             logger.info("TTS Engine initialized successfully")
             
@@ -51,6 +128,241 @@ class TTSEngine:
             logger.error(f"Failed to initialize TTS engine: {e}")
             raise
     
+    def _load_model(self):
+        """Load the processor and model (blocking)"""
+        timings = {}
+        self.precision = resolve_precision(settings.INFERENCE_PRECISION)
+        
+        with phase_timer(timings, "total"):
+            snapshot = self._find_snapshot()
+            if snapshot is not None:
+                logger.info(f"Loading model snapshot from {settings.MODEL_SNAPSHOT_DIR}...")
+                self.processor, self.model, _ = load_snapshot(settings.MODEL_SNAPSHOT_DIR, timings)
+                self.model_revision = snapshot["revision"]
+            else:
+                logger.info(f"Loading model from {settings.MODEL_NAME}...")
+                
+                # Load processor and model (bf16 weights are loaded directly, without an fp32 copy)
+                with phase_timer(timings, "processor"):
+                    self.processor = AutoProcessor.from_pretrained(settings.MODEL_NAME)
+                with phase_timer(timings, "weights"):
+                    self.model = DiaForConditionalGeneration.from_pretrained(
+                        settings.MODEL_NAME,
+                        torch_dtype=load_dtype(self.precision)
+                    ).to(self.device)
+                with phase_timer(timings, "precision"):
+                    self.model = apply_precision(self.model, self.precision)
+                
+                revision = getattr(self.model.config, "_commit_hash", None) or "local"
+                self.model_revision = f"{settings.MODEL_NAME}@{revision}:{self.precision}"
+            
+            # Set model to evaluation mode
+            self.model.eval()
+        
+        self.decoder_mode = resolve_decoder_mode(settings.DECODER_MODE)
+        self.generation_options = generation_options(self.decoder_mode, settings.DECODER_COMPILE_MODE)
+        if self.decoder_mode != "eager":
+            self.kv_cache = KVCachePool(self.model)
+        self.load_timings = timings
+        log_memory_footprint(self.model, self.precision)
+        phases = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items() if phase != "total")
+        logger.info(f"Model ready in {timings['total']:.2f}s ({phases}), {self.decoder_mode} decoder")
+        
+        self.sample_rate = self.processor.feature_extractor.sampling_rate
+        self.budget.configure(*self._frame_info())
+    
+    def _frame_info(self) -> Tuple[float, int]:
+        """Audio frames per second and maximum codebook delay of the loaded model"""
+        hop_length = self.processor.audio_tokenizer.config.hop_length
+        return self.sample_rate / hop_length, max(self.model.config.delay_pattern)
+    
+    def _find_snapshot(self) -> Optional[Dict]:
+        """Info of the configured snapshot, if it is usable for this precision"""
+        if not settings.MODEL_SNAPSHOT_DIR:
+            return None
+        
+        try:
+            snapshot = read_snapshot_info(settings.MODEL_SNAPSHOT_DIR)
+        except SnapshotError as e:
+            logger.warning(f"{e}; loading {settings.MODEL_NAME} instead")
+            return None
+        
+        if snapshot["precision"] != self.precision:
+            logger.warning(
+                f"Snapshot precision {snapshot['precision']} does not match {self.precision}; "
+                f"loading {settings.MODEL_NAME} instead"
+            )
+            return None
+        return snapshot
+    
+    @property
+    def supports_streaming(self) -> bool:
+        """Streaming decodes in-process, so it needs the thread executor"""
+        return self.executor.kind != "process"
+    
+    async def get_stats(self) -> Dict:
+        """Executor, batching and result cache counters"""
+        return {
+            "inference": self.executor.stats(),
+            "batching": self.scheduler.stats(),
+            "cache": await asyncio.to_thread(self.cache.stats) if self.cache is not None else None,
+            "jobs": await asyncio.to_thread(self.jobs.stats),
+            "budget": self.budget.stats(),
+            "admission": self.admission.stats(),
+            "warmup": dict(self.warmup),
+            "kv_cache": self.kv_cache.stats() if self.kv_cache is not None else None,
+            "memory": process_memory(),
+            "retention": await asyncio.to_thread(self.retention.stats),
+            "startup": self.load_timings
+        }
+    
+    async def get_metrics(self) -> List[Family]:
+        """Metrics of this process, for GET /metrics"""
+        return REGISTRY.collect()
+    
+    def _collect_metrics(self) -> List[Family]:
+        """Queue and load gauges, read at scrape time"""
+        inference = self.executor.stats()
+        admission = self.admission.stats()
+        families = [
+            ("tts_inference_in_flight", "gauge", "Calls running on the inference executor",
+             [("tts_inference_in_flight", {}, inference["in_flight"])]),
+            ("tts_inference_queued", "gauge", "Calls waiting for a free inference worker",
+             [("tts_inference_queued", {}, inference["queued"])]),
+            ("tts_ready", "gauge", "1 once warm-up has finished and the engine reports ready",
+             [("tts_ready", {}, int(self.ready))]),
+            ("tts_batch_pending", "gauge", "Requests waiting in the batching window",
+             [("tts_batch_pending", {}, self.scheduler.stats()["pending"])]),
+            ("tts_admission_in_progress", "gauge", "Admitted requests that have not finished",
+             [("tts_admission_in_progress", {"priority": priority}, count)
+              for priority, count in admission["in_progress_by_priority"].items()]),
+            ("tts_admission_projected_wait_seconds", "gauge", "Estimated seconds until admitted work is done",
+             [("tts_admission_projected_wait_seconds", {}, admission["projected_wait"])]),
+            ("tts_replica_in_flight", "gauge", "Calls running on each inference replica",
+             [("tts_replica_in_flight", {"replica": str(r["replica"])}, r["in_flight"]) for r in inference["replicas"]]),
+            ("tts_replica_utilization", "gauge", "Fraction of worker time each inference replica has been busy",
+             [("tts_replica_utilization", {"replica": str(r["replica"])}, r["utilization"]) for r in inference["replicas"]]),
+            ("tts_replica_resident_memory_bytes", "gauge", "Resident memory of each inference replica's process",
+             [("tts_replica_resident_memory_bytes", {"replica": str(r["replica"])}, r["rss_bytes"])
+              for r in inference["replicas"] if r["rss_bytes"] is not None]),
+            ("tts_replica_peak_resident_memory_bytes", "gauge", "Highest resident memory of each inference replica's process",
+             [("tts_replica_peak_resident_memory_bytes", {"replica": str(r["replica"])}, r["peak_rss_bytes"])
+              for r in inference["replicas"] if r["peak_rss_bytes"] is not None])
+        ]
+        if self.kv_cache is not None:
+            kv_cache = self.kv_cache.stats()
+            families += [
+                ("tts_kv_cache_bytes", "gauge", "Bytes of pooled static KV caches",
+                 [("tts_kv_cache_bytes", {"state": "idle"}, kv_cache["idle_bytes"]),
+                  ("tts_kv_cache_bytes", {"state": "in_use"}, kv_cache["in_use_bytes"])]),
+                ("tts_kv_cache_acquired_total", "counter", "KV caches handed to generations, reused or newly allocated",
+                 [("tts_kv_cache_acquired_total", {"result": "reused"}, kv_cache["hits"]),
+                  ("tts_kv_cache_acquired_total", {"result": "allocated"}, kv_cache["misses"])])
+            ]
+        return families
+    
+    def _get_model_info(self) -> Dict:
+        """Properties of the model loaded in this process"""
+        frame_rate, max_delay = self._frame_info()
+        return {
+            "sample_rate": self.sample_rate,
+            "model_revision": self.model_revision,
+            "decoder_mode": self.decoder_mode,
+            "load_timings": self.load_timings,
+            "frame_rate": frame_rate,
+            "max_delay": max_delay
+        }
+    
+    async def warm_up(self):
+        """Run warm-up generations on every replica, then report ready
+
+        The first generations pay for compiling the decoder (``compiled``
+        mode), growing the allocator and picking kernels; warm-up takes that
+        cost before traffic does. A failed warm-up is logged and the engine
+        reports ready anyway.
+        """
+        plan = warmup_plan(
+            settings.WARMUP_LENGTHS,
+            settings.WARMUP_BATCH_SIZES,
+            self.budget.frame_rate,
+            settings.BUDGET_CHARS_PER_SECOND,
+            settings.MAX_NEW_TOKENS
+        )
+        self.warmup = {"status": "running", "generations": len(plan)}
+        logger.info(f"Warming up with {len(plan)} generations ({self.decoder_mode} decoder)...")
+        start = time.perf_counter()
+        try:
+            if self.executor.kind == "process":
+                await self.executor.broadcast(_call_worker_engine, "_warm_up", plan)
+            else:
+                await self.executor.run(self._warm_up, plan)
+        except Exception as e:
+            logger.error(f"Warm-up failed: {e}")
+            self.warmup.update(status="failed", error=str(e))
+        else:
+            self.warmup["status"] = "done"
+        
+        seconds = time.perf_counter() - start
+        self.warmup["seconds"] = round(seconds, 3)
+        self.load_timings = dict(self.load_timings, warmup=seconds)
+        self.ready = True
+        logger.info(f"Warm-up finished in {seconds:.2f}s; engine ready")
+    
+    def _warm_up(self, plan: List[Tuple[List[str], int]]):
+        """Run the warm-up generations in this process (blocking)"""
+        for texts, steps in plan:
+            _, timings = self._synthesize_batch(
+                texts,
+                [None] * len(texts),
+                temperature=settings.TEMPERATURE,
+                guidance_scale=settings.GUIDANCE_SCALE,
+                top_p=settings.TOP_P,
+                top_k=settings.TOP_K,
+                seed=0,
+                max_new_tokens=steps
+            )
+            logger.debug(f"Warm-up: batch of {len(texts)}, {steps} steps in {timings['generate']:.2f}s")
+    
+    async def readiness(self) -> Dict:
+        """Whether warm-up has finished, for GET /health/ready"""
+        return {"ready": self.ready, "decoder_mode": self.decoder_mode, "warmup": dict(self.warmup)}
+    
+    async def _run_inference(self, method: str, *args, **kwargs):
+        """Run a blocking engine method on the inference executor"""
+        if self.executor.kind == "process":
+            return await self.executor.run(_call_worker_engine, method, *args, **kwargs)
+        return await self.executor.run(getattr(self, method), *args, **kwargs)
+    
+    async def admit(
+        self,
+        items: List[Dict[str, Any]],
+        user: str,
+        priority: Optional[str] = None,
+        owner: Optional[Hashable] = None
+    ) -> str:
+        """Admit a request or raise AdmissionRejected; pass the ticket to release_admission when it is done
+
+        ``items`` are the request's texts with their ``voice_id`` and
+        ``long_form`` settings; the cost is their estimated decoder steps.
+        Raises ValueError for a long-form text that is only speaker tags.
+        """
+        tokens = sum(
+            self._estimate_tokens(item["text"], item.get("voice_id"), item.get("long_form"))
+            for item in items
+        )
+        return self.admission.admit(user, tokens, priority, owner)
+    
+    async def release_admission(self, ticket: str):
+        """Mark an admitted request as finished"""
+        self.admission.release(ticket)
+    
+    def _estimate_tokens(self, text: str, voice_id: Optional[str] = None, long_form: Optional[bool] = None) -> int:
+        """Decoder steps a text is expected to take, over all long-form segments"""
+        if long_form is None:
+            long_form = len(text) > settings.LONGFORM_MIN_CHARS
+        segments = split_text(text, settings.LONGFORM_SEGMENT_CHARS) if long_form else [text]
+        return sum(self.budget.estimate(segment, voice_id)[0] for segment in segments)
+    
     async def generate_speech(
         self,
         text: str,
@@ -59,72 +371,702 @@ class TTSEngine:
         guidance_scale: float = settings.GUIDANCE_SCALE,
         top_p: float = settings.TOP_P,
         top_k: int = settings.TOP_K,
-        seed: Optional[int] = None
+        seed: Optional[int] = None,
+        guidance_steps: Optional[int] = None,
+        on_progress: Optional[Callable[[float], None]] = None,
+        long_form: Optional[bool] = None,
+        output_format: str = settings.DEFAULT_OUTPUT_FORMAT,
+        output_sample_rate: Optional[int] = None,
+        user: Optional[str] = None
     ) -> Tuple[str, Dict]:
-        """Generate speech from text"""
+        """Generate speech from text and save it to OUTPUTS_DIR
+
+        Texts longer than LONGFORM_MIN_CHARS (or any text, with
+        ``long_form=True``) are split into segments that are synthesized
+        concurrently and stitched together. ``on_progress`` is called with
+        the fraction of the token budget generated so far (thread executor
+        only). The file is recorded in the output catalog under ``user``.
+        ``guidance_steps`` limits guidance to the first decoder steps
+        (GUIDANCE_STEPS when unset).
+        """
+        _, metadata = await self._generate(
+            text, voice_id, temperature, guidance_scale, top_p, top_k, seed, guidance_steps,
+            on_progress, long_form, output_format, output_sample_rate, persist=True, user=user
+        )
+        return metadata["filename"], metadata
+    
+    async def render_speech(
+        self,
+        text: str,
+        voice_id: Optional[str] = None,
+        temperature: float = settings.TEMPERATURE,
+        guidance_scale: float = settings.GUIDANCE_SCALE,
+        top_p: float = settings.TOP_P,
+        top_k: int = settings.TOP_K,
+        seed: Optional[int] = None,
+        guidance_steps: Optional[int] = None,
+        long_form: Optional[bool] = None,
+        output_format: str = settings.DEFAULT_OUTPUT_FORMAT,
+        output_sample_rate: Optional[int] = None,
+        persist: bool = False,
+        user: Optional[str] = None
+    ) -> Tuple[bytes, Dict]:
+        """Generate speech from text and return the encoded audio, saving it only if ``persist``"""
+        return await self._generate(
+            text, voice_id, temperature, guidance_scale, top_p, top_k, seed, guidance_steps,
+            None, long_form, output_format, output_sample_rate, persist, return_audio=True, user=user
+        )
+    
+    async def _generate(
+        self,
+        text: str,
+        voice_id: Optional[str],
+        temperature: float,
+        guidance_scale: float,
+        top_p: float,
+        top_k: int,
+        seed: Optional[int],
+        guidance_steps: Optional[int],
+        on_progress: Optional[Callable[[float], None]],
+        long_form: Optional[bool],
+        output_format: str,
+        output_sample_rate: Optional[int],
+        persist: bool,
+        return_audio: bool = False,
+        user: Optional[str] = None
+    ) -> Tuple[Optional[bytes], Dict]:
+        """Synthesize, encode once in memory, then write and/or return the bytes"""
+        start = time.perf_counter()
+        voice = voice_label(voice_id)
+        GENERATIONS_IN_FLIGHT.inc()
         try:
-            # Prepare input text
-            if not text.startswith("[S1]") and not text.startswith("[S2]"):
-                text = f"[S1] {text}"
-            
-            # Handle voice cloning if voice_id provided
-            if voice_id and voice_id in self.voices_db:
-                voice_data = self.voices_db[voice_id]
-                # Prepend voice transcript for cloning
-                text = f"{voice_data['transcript']} {text}"
-            
-            # Set seed for reproducibility
-            if seed is not None:
-                torch.manual_seed(seed)
-            
-            # Process input
-            inputs = self.processor(
-                text=[text],
-                padding=True,
-                return_tensors="pt"
-            ).to(self.device)
-            
-            # Generate audio
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=settings.MAX_NEW_TOKENS,
-                    guidance_scale=guidance_scale,
-                    temperature=temperature,
-                    top_p=top_p,
-                    top_k=top_k
-                )
+            encoder = get_encoder(output_format)
+            output_rate = encoder.output_rate(self.sample_rate, output_sample_rate)
+            if long_form is None:
+                long_form = len(text) > settings.LONGFORM_MIN_CHARS
+            params = {
+                "temperature": temperature,
+                "guidance_scale": guidance_scale,
+                "guidance_steps": self._guidance_steps(guidance_scale, guidance_steps),
+                "top_p": top_p,
+                "top_k": top_k
+            }
+            # Another worker may have cloned the voice since our last refresh
+            await self.voices.fetch(voice_id)
+            prepared_text = self._prepare_text(text, voice_id)
             
-            # Decode outputs
-            audio_outputs = self.processor.batch_decode(outputs)
+            # Seeded requests are deterministic, so identical ones can reuse earlier audio.
+            # Cached results are files, so only saved outputs take part.
+            cache_key = None
+            if seed is not None and self.cache is not None and persist:
+                variant = []
+                if long_form:
+                    variant.append("long_form")
+                if encoder.name != "mp3" or output_rate != self.sample_rate:
+                    variant.append(f"{encoder.name}@{output_rate}")
+                if params["guidance_steps"]:
+                    variant.append(f"guidance_steps={params['guidance_steps']}")
+                cache_key = make_cache_key(
+                    prepared_text, voice_id, temperature, guidance_scale, top_p, top_k, seed, self.model_revision,
+                    variant=",".join(variant) or None,
+                    user=user
+                )
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    await self.outputs.touch(cached["filename"])
+                    data = None
+                    if return_audio:
+                        data = await asyncio.to_thread((Path(settings.OUTPUTS_DIR) / cached["filename"]).read_bytes)
+                    GENERATION_SECONDS.observe(time.perf_counter() - start, voice=voice, cached="true")
+                    return data, dict(cached, cached=True)
             
-            # Save audio file
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"tts_{timestamp}_{hashlib.md5(text.encode()).hexdigest()[:8]}.mp3"
-            output_path = Path(settings.OUTPUTS_DIR) / filename
             
-            self.processor.save_audio(audio_outputs, str(output_path))
+            if long_form:
+                audio, long_form_info = await self._synthesize_long(text, voice_id, seed, params, on_progress)
+            else:
+                # Reference audio of a cloned voice conditions the generation
+                prompt = await self._get_audio_prompt(voice_id)
+                audio = await self._synthesize(
+                    prepared_text,
+                    text,
+                    voice_id,
+                    prompt,
+                    voice_id if prompt is not None else None,
+                    seed,
+                    params,
+                    on_progress
+                )
+                long_form_info = None
+            
+            # Encode straight from memory, off the event loop
+            with PHASE_SECONDS.time(phase="encode", voice=voice):
+                data, output_rate = await asyncio.to_thread(
+                    encode_audio, audio, self.sample_rate, encoder.name, output_sample_rate
+                )
+            
+            duration = round(len(audio) / self.sample_rate, 3)
+            filename = None
+            if persist:
+                # Random suffix: concurrent batch items can share text and timestamp
+                filename = f"tts_{timestamp}_{uuid.uuid4().hex[:8]}{encoder.extension}"
+                with PHASE_SECONDS.time(phase="write", voice=voice):
+                    await asyncio.to_thread((Path(settings.OUTPUTS_DIR) / filename).write_bytes, data)
+                await self.outputs.record(
+                    filename,
+                    len(data),
+                    user=user,
+                    duration=duration,
+                    format=encoder.name,
+                    sample_rate=output_rate,
+                    voice_id=voice_id,
+                    parameters=dict(params, seed=seed)
+                )
             
             # Prepare metadata
             metadata = {
-                "text": text,
+                "text": prepared_text,
                 "voice_id": voice_id,
-                "parameters": {
-                    "temperature": temperature,
-                    "guidance_scale": guidance_scale,
-                    "top_p": top_p,
-                    "top_k": top_k,
-                    "seed": seed
-                },
+                "parameters": dict(params, seed=seed),
                 "timestamp": timestamp,
-                "filename": filename
+                "filename": filename,
+                "format": encoder.name,
+                "sample_rate": output_rate,
+                "duration": duration
             }
+            if long_form_info is not None:
+                metadata["long_form"] = long_form_info
             
-            return filename, metadata
+            if cache_key is not None:
+                await self.cache.put(cache_key, metadata)
+            
+            elapsed = time.perf_counter() - start
+            GENERATION_SECONDS.observe(elapsed, voice=voice, cached="false")
+            REAL_TIME_FACTOR.observe(duration / elapsed, voice=voice)
+            AUDIO_SECONDS.inc(duration, voice=voice)
+            
+            return (data if return_audio else None), metadata
             
         except Exception as e:
             logger.error(f"Speech generation failed: {e}")
             raise
+        finally:
+            GENERATIONS_IN_FLIGHT.dec()
+    
+    async def _synthesize(
+        self,
+        text: str,
+        spoken_text: str,
+        voice_id: Optional[str],
+        prompt: Optional[torch.Tensor],
+        group: Optional[str],
+        seed: Optional[int],
+        params: Dict,
+        on_progress: Optional[Callable[[float], None]] = None
+    ) -> np.ndarray:
+        """Generate audio for one prepared text, batched with concurrent compatible requests
+
+        Requests only share a batch within the same ``group`` (one per
+        voice prompt), so prompts never need padding to each other's length.
+        The token budget is estimated from ``spoken_text``, the part of the
+        text that is new speech (no voice transcript).
+        """
+        estimate, budget = self.budget.estimate(spoken_text, voice_id)
+        audio, truncated, timings = await self.scheduler.submit(
+            (text, prompt, on_progress), seed=seed, group=group, max_new_tokens=budget, **params
+        )
+        self._record_timings(timings, voice_id)
+        
+        overrun = truncated and budget < settings.MAX_NEW_TOKENS
+        if overrun:
+            # Underestimated: generate again with the full budget
+            audio, truncated, timings = await self.scheduler.submit(
+                (text, prompt, on_progress), seed=seed, group=group, max_new_tokens=settings.MAX_NEW_TOKENS, **params
+            )
+            self._record_timings(timings, voice_id)
+        
+        self.budget.record(spoken_text, voice_id, estimate, budget, len(audio) / self.sample_rate, overrun, truncated)
+        return audio
+    
+    def _record_timings(self, timings: Dict[str, float], voice_id: Optional[str]):
+        """Observe the model phases of the batch a request ran in"""
+        voice = voice_label(voice_id)
+        for phase in ("tokenize", "generate", "decode"):
+            PHASE_SECONDS.observe(timings[phase], phase=phase, voice=voice)
+        if timings["generate"] > 0:
+            TOKENS_PER_SECOND.observe(timings["steps"] / timings["generate"], voice=voice)
+    
+    async def _synthesize_long(
+        self,
+        text: str,
+        voice_id: Optional[str],
+        seed: Optional[int],
+        params: Dict,
+        on_progress: Optional[Callable[[float], None]] = None
+    ) -> Tuple[np.ndarray, Dict]:
+        """Synthesize a long text segment by segment and stitch the audio"""
+        segments = split_text(text, settings.LONGFORM_SEGMENT_CHARS)
+        audios: List[Optional[np.ndarray]] = [None] * len(segments)
+        
+        progress = [0.0] * len(segments)
+        
+        def tracker(idx: int) -> Optional[Callable[[float], None]]:
+            if on_progress is None:
+                return None
+            
+            def update(fraction: float):
+                progress[idx] = fraction
+                on_progress(sum(progress) / len(progress))
+            return update
+        
+        def segment_seed(idx: int) -> Optional[int]:
+            return None if seed is None else seed + idx
+        
+        prompt = await self._get_audio_prompt(voice_id)
+        group = voice_id if prompt is not None else None
+        anchor_text, first = "", 0
+        
+        if prompt is None and len(segments) > 1 and settings.LONGFORM_ANCHOR_VOICE:
+            # Without a cloned voice every segment would pick its own speaker;
+            # condition the rest on the first segment so the voice stays the same
+            audios[0] = await self._synthesize(
+                self._prepare_text(segments[0], voice_id),
+                segments[0],
+                voice_id,
+                None,
+                None,
+                segment_seed(0),
+                params,
+                tracker(0)
+            )
+            prompt = await self._run_inference(
+                "_encode_audio_prompt", torch.from_numpy(audios[0])[None], self.sample_rate
+            )
+            anchor_text, first = f"{segments[0]} ", 1
+            group = f"long_form:{uuid.uuid4().hex}"
+        
+        # The remaining segments run concurrently; unseeded ones share model batches
+        audios[first:] = await asyncio.gather(*[
+            self._synthesize(
+                self._prepare_text(anchor_text + segments[idx], voice_id),
+                segments[idx],
+                voice_id,
+                prompt,
+                group,
+                segment_seed(idx),
+                params,
+                tracker(idx)
+            )
+            for idx in range(first, len(segments))
+        ])
+        
+        audio, truncated = await asyncio.to_thread(
+            stitch_segments,
+            audios,
+            self.sample_rate,
+            settings.LONGFORM_CROSSFADE_MS,
+            settings.MAX_AUDIO_LENGTH
+        )
+        if truncated:
+            logger.warning(f"Long-form audio cut at MAX_AUDIO_LENGTH ({settings.MAX_AUDIO_LENGTH}s)")
+        
+        return audio, {
+            "segments": len(segments),
+            "anchored": first == 1,
+            "truncated": truncated,
+            "duration": round(len(audio) / self.sample_rate, 2)
+        }
+    
+    def stream_speech(
+        self,
+        text: str,
+        voice_id: Optional[str] = None,
+        temperature: float = settings.TEMPERATURE,
+        guidance_scale: float = settings.GUIDANCE_SCALE,
+        top_p: float = settings.TOP_P,
+        top_k: int = settings.TOP_K,
+        seed: Optional[int] = None,
+        guidance_steps: Optional[int] = None
+    ) -> AsyncIterator[np.ndarray]:
+        """Generate speech from text, yielding audio chunks as they are decoded
+
+        Raises StreamingUnavailable right away, before anything is iterated,
+        when the inference executor can't stream.
+        """
+        if not self.supports_streaming:
+            raise StreamingUnavailable("Streaming requires the thread inference executor")
+        return self._stream_chunks(text, voice_id, temperature, guidance_scale, top_p, top_k, seed, guidance_steps)
+    
+    async def _stream_chunks(
+        self,
+        text: str,
+        voice_id: Optional[str],
+        temperature: float,
+        guidance_scale: float,
+        top_p: float,
+        top_k: int,
+        seed: Optional[int],
+        guidance_steps: Optional[int]
+    ) -> AsyncIterator[np.ndarray]:
+        """Audio chunks of one streamed generation"""
+        await self.voices.fetch(voice_id)
+        text = self._prepare_text(text, voice_id)
+        prompt = await self._get_audio_prompt(voice_id)
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        streamer = AudioStreamer(
+            self.model.config,
+            self.processor.audio_tokenizer,
+            on_audio=lambda audio: loop.call_soon_threadsafe(chunks.put_nowait, audio),
+            prompt_frames=prompt.shape[0] if prompt is not None else 0
+        )
+        
+        generation = asyncio.ensure_future(self.executor.run(
+            self._synthesize_stream,
+            text,
+            prompt,
+            streamer,
+            temperature=temperature,
+            guidance_scale=guidance_scale,
+            top_p=top_p,
+            top_k=top_k,
+            seed=seed,
+            guidance_steps=self._guidance_steps(guidance_scale, guidance_steps)
+        ))
+        generation.add_done_callback(lambda _: chunks.put_nowait(None))
+        
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                yield chunk
+            # Surface generation errors to the caller
+            await generation
+        finally:
+            streamer.cancelled.set()
+    
+    def _synthesize_stream(
+        self,
+        text: str,
+        prompt: Optional[torch.Tensor],
+        streamer: AudioStreamer,
+        temperature: float,
+        guidance_scale: float,
+        top_p: float,
+        top_k: int,
+        seed: Optional[int] = None,
+        guidance_steps: int = settings.GUIDANCE_STEPS
+    ):
+        """Run the model for one text, pushing decoded chunks through the streamer (blocking)"""
+        # Process-global, but each model process runs one generation at a time
+        if seed is not None:
+            torch.manual_seed(seed)
+        
+        inputs, _ = self._prepare_inputs([text], [prompt])
+        
+        with torch.no_grad(), self._generation_cache(inputs, guidance_scale, settings.MAX_NEW_TOKENS) as cache:
+            with guidance_window(self.model, guidance_scale, guidance_steps):
+                self.model.generate(
+                    **inputs,
+                    max_new_tokens=settings.MAX_NEW_TOKENS,
+                    guidance_scale=guidance_scale,
+                    temperature=temperature,
+                    top_p=top_p,
+                    top_k=top_k,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([StreamCancelled(streamer)]),
+                    **cache,
+                    **self.generation_options
+                )
+    
+    async def submit_job(
+        self,
+        request: Dict,
+        user: str,
+        idempotency_key: Optional[str] = None,
+        webhook_url: Optional[str] = None
+    ) -> Tuple[Dict, bool]:
+        """Queue a generation to run in the background"""
+        return await self.jobs.submit(request, user, idempotency_key, webhook_url)
+    
+    async def get_job(self, job_id: str, user: str) -> Dict:
+        """Status, progress and result of a job"""
+        return await self.jobs.get(job_id, user)
+    
+    async def cancel_job(self, job_id: str, user: str) -> Dict:
+        """Cancel a queued or running job"""
+        return await self.jobs.cancel(job_id, user)
+    
+    async def _run_job(self, request: Dict, user: str, on_progress: Callable[[float], None]) -> Dict:
+        """Generate the audio for one queued job"""
+        options = dict(request)
+        options.pop("persist", None)
+        output_format = options.pop("format", settings.DEFAULT_OUTPUT_FORMAT)
+        output_sample_rate = options.pop("sample_rate", None)
+        filename, metadata = await self.generate_speech(
+            **options,
+            output_format=output_format,
+            output_sample_rate=output_sample_rate,
+            on_progress=on_progress,
+            user=user
+        )
+        return {
+            "filename": filename,
+            "audio_url": f"/outputs/{filename}",
+            "metadata": metadata
+        }
+    
+    def _prepare_text(self, text: str, voice_id: Optional[str] = None) -> str:
+        """Add the default speaker tag and any cloned-voice transcript"""
+        # Prepare input text
+        if not text.startswith("[S1]") and not text.startswith("[S2]"):
+            text = f"[S1] {text}"
+        
+        # Handle voice cloning if voice_id provided
+        voice_data = self.voices.get(voice_id)
+        if voice_data is not None:
+            # Prepend voice transcript for cloning
+            text = f"{voice_data['transcript']} {text}"
+        
+        return text
+    
+    async def _generate_batch(
+        self,
+        items: List[Tuple[str, Optional[torch.Tensor], Optional[Callable[[float], None]]]],
+        params: Dict
+    ) -> List[Tuple[np.ndarray, bool, Dict[str, float]]]:
+        """Run one scheduler batch on the inference executor; each result carries the batch's phase timings"""
+        texts = [text for text, _, _ in items]
+        prompts = [prompt for _, prompt, _ in items]
+        
+        # Progress callbacks can't cross into worker processes
+        callbacks = [on_progress for _, _, on_progress in items if on_progress is not None]
+        if callbacks and self.executor.kind == "thread":
+            loop = asyncio.get_running_loop()
+            
+            def progress(fraction: float):
+                if loop.is_closed():
+                    return
+                for callback in callbacks:
+                    loop.call_soon_threadsafe(callback, fraction)
+            
+            params = dict(params, progress=progress)
+        
+        results, timings = await self._run_inference("_synthesize_batch", texts, prompts, **params)
+        self.admission.observe(timings["steps"] * len(texts), timings["generate"])
+        return [(audio, truncated, timings) for audio, truncated in results]
+    
+    def _synthesize_batch(
+        self,
+        texts: List[str],
+        prompts: List[Optional[torch.Tensor]],
+        temperature: float,
+        guidance_scale: float,
+        top_p: float,
+        top_k: int,
+        seed: Optional[int] = None,
+        progress: Optional[Callable[[float], None]] = None,
+        max_new_tokens: int = settings.MAX_NEW_TOKENS,
+        guidance_steps: int = settings.GUIDANCE_STEPS
+    ) -> Tuple[List[Tuple[np.ndarray, bool]], Dict[str, float]]:
+        """Run the model on a padded batch of texts (blocking)
+
+        Returns each waveform with whether it was cut short by ``max_new_tokens``,
+        and the seconds spent tokenizing, generating and decoding (timed here
+        so they survive the trip back from a worker process).
+        """
+        timings = {}
+        
+        # Set seed for reproducibility (process-global, but each model process
+        # runs one generation at a time)
+        if seed is not None:
+            torch.manual_seed(seed)
+        
+        # Process input
+        with phase_timer(timings, "tokenize"):
+            inputs, prompt_len = self._prepare_inputs(texts, prompts)
+        
+        # Generate audio
+        with phase_timer(timings, "generate"), torch.no_grad():
+            with self._generation_cache(inputs, guidance_scale, max_new_tokens) as cache:
+                with guidance_window(self.model, guidance_scale, guidance_steps):
+                    outputs = self.model.generate(
+                        **inputs,
+                        max_new_tokens=max_new_tokens,
+                        guidance_scale=guidance_scale,
+                        temperature=temperature,
+                        top_p=top_p,
+                        top_k=top_k,
+                        stopping_criteria=StoppingCriteriaList(
+                            [GenerationProgress(progress, max_new_tokens)] if progress else []
+                        ),
+                        **cache,
+                        **self.generation_options
+                    )
+        
+        # Dia forces EOS once the budget is used up, max_delay steps before
+        # the end; a row whose EOS sits there was cut short
+        max_length = prompt_len + max_new_tokens
+        forced_eos = max_length - max(self.model.config.delay_pattern) - 1
+        eos_positions = (outputs[:, :, 0] == self.model.config.decoder_config.eos_token_id).int().argmax(dim=1)
+        truncated = (outputs.shape[1] >= max_length) & (eos_positions >= forced_eos)
+        
+        timings["steps"] = outputs.shape[1] - prompt_len
+        
+        # Decode only the generated part, one waveform per input text
+        with phase_timer(timings, "decode"):
+            audio_outputs = self.processor.batch_decode(outputs, audio_prompt_len=prompt_len)
+        return [
+            (audio.float().numpy(), bool(cut))
+            for audio, cut in zip(audio_outputs, truncated.tolist())
+        ], timings
+    
+    @staticmethod
+    def _guidance_steps(guidance_scale: float, guidance_steps: Optional[int]) -> int:
+        """Guided decoder steps of a request, 0 for all of them (or when it isn't guided at all)"""
+        if not uses_guidance(guidance_scale):
+            return 0
+        return settings.GUIDANCE_STEPS if guidance_steps is None else guidance_steps
+    
+    @contextmanager
+    def _generation_cache(self, inputs: Dict, guidance_scale: float, max_new_tokens: int) -> Iterator[Dict]:
+        """``generate`` arguments for a pooled static KV cache (none with the eager decoder)"""
+        if self.kv_cache is None:
+            yield {}
+            return
+        
+        with self.kv_cache.generation_cache(
+            batch_size=inputs["input_ids"].shape[0],
+            guidance_scale=guidance_scale,
+            decoder_length=inputs["decoder_input_ids"].shape[1],
+            encoder_length=inputs["input_ids"].shape[1],
+            max_new_tokens=max_new_tokens
+        ) as cache:
+            yield {"past_key_values": cache}
+    
+    def _prepare_inputs(
+        self,
+        texts: List[str],
+        prompts: List[Optional[torch.Tensor]]
+    ) -> Tuple[Dict, int]:
+        """Tokenize texts and build delayed decoder inputs from cached audio prompts
+
+        Mirrors what the processor does when given ``audio``, but starts from
+        precomputed codebook tokens so reference audio is never re-encoded.
+        Shorter prompts are left-padded, as in the processor. Returns the
+        model inputs and the audio prompt length (BOS included) to strip
+        when decoding.
+        """
+        inputs = self.processor(
+            text=texts,
+            padding=True,
+            return_tensors="pt"
+        )
+        
+        config = self.model.config
+        delay_pattern = config.delay_pattern
+        bos_token_id = config.decoder_config.bos_token_id
+        pad_token_id = config.decoder_config.pad_token_id
+        num_channels = len(delay_pattern)
+        max_delay = max(delay_pattern)
+        
+        lengths = [0 if prompt is None else prompt.shape[0] for prompt in prompts]
+        max_len = max(lengths)
+        seq_len = max_len + 1 + max_delay
+        batch_size = len(texts)
+        
+        prefill = torch.full((batch_size, seq_len, num_channels), pad_token_id, dtype=torch.int)
+        attention_mask = torch.zeros((batch_size, seq_len), dtype=torch.long)
+        for idx, (prompt, length) in enumerate(zip(prompts, lengths)):
+            padding_len = max_len - length
+            prefill[idx, :padding_len + 1] = bos_token_id
+            if prompt is not None:
+                prefill[idx, padding_len + 1:max_len + 1] = prompt.to(torch.int)
+            attention_mask[idx, padding_len:] = 1
+        
+        inputs["decoder_input_ids"] = self.processor.apply_audio_delay(
+            audio=prefill,
+            pad_token_id=pad_token_id,
+            bos_token_id=bos_token_id,
+            precomputed_idx=self.processor.build_indices(
+                bsz=batch_size,
+                seq_len=seq_len,
+                num_channels=num_channels,
+                delay_pattern=delay_pattern,
+                revert=False
+            )
+        )
+        inputs["decoder_attention_mask"] = attention_mask
+        
+        return inputs.to(self.device), max_len + 1
+    
+    def _encode_audio_prompt(self, waveform: torch.Tensor, sample_rate: int) -> torch.Tensor:
+        """Encode reference audio into codebook tokens, shape (frames, channels) (blocking)"""
+        # Downmix and resample to the audio tokenizer's rate
+        waveform = waveform.float().mean(dim=0)
+        if sample_rate != self.sample_rate:
+            waveform = torchaudio.functional.resample(waveform, sample_rate, self.sample_rate)
+        
+        features = self.processor.feature_extractor(
+            waveform.numpy(),
+            sampling_rate=self.sample_rate,
+            return_tensors="pt"
+        )
+        with torch.no_grad():
+            codes = self.processor.audio_tokenizer.encode(
+                features["input_values"].to(self.device)
+            ).audio_codes
+        
+        # Codebook indices fit in 16 bits
+        return codes[0].T.to(torch.int16).cpu().contiguous()
+    
+    def _encode_audio_file(self, audio_path: str) -> torch.Tensor:
+        """Decode reference audio once and encode it into codebook tokens (blocking)"""
+        waveform, sample_rate = load_audio(audio_path)
+        return self._encode_audio_prompt(waveform, sample_rate)
+    
+    async def _get_audio_prompt(self, voice_id: Optional[str]) -> Optional[torch.Tensor]:
+        """Codebook tokens for a cloned voice's reference audio, from memory when possible"""
+        if voice_id not in self.voices:
+            return None
+        
+        prompt = self.audio_prompts.get(voice_id)
+        if prompt is not None:
+            self.audio_prompts.move_to_end(voice_id)
+            return prompt
+        
+        voice_data = self.voices.get(voice_id)
+        prompt_path = voice_data.get("prompt_path")
+        if prompt_path and Path(prompt_path).exists():
+            prompt = await asyncio.to_thread(torch.load, prompt_path)
+        else:
+            # Voice cloned before prompts were precomputed; encode it once now
+            prompt = await self._backfill_audio_prompt(voice_id)
+            if prompt is None:
+                return None
+        
+        self.audio_prompts[voice_id] = prompt
+        while len(self.audio_prompts) > settings.AUDIO_PROMPT_CACHE_SIZE:
+            self.audio_prompts.popitem(last=False)
+        return prompt
+    
+    async def _backfill_audio_prompt(self, voice_id: str) -> Optional[torch.Tensor]:
+        """Encode and persist the prompt of a voice that has none yet"""
+        audio_files = [
+            path for path in Path(settings.VOICES_DIR).glob(f"{voice_id}.*")
+            if path.suffix.lower() in AUDIO_EXTENSIONS
+        ]
+        if not audio_files:
+            logger.warning(f"No reference audio found for voice {voice_id}")
+            return None
+        
+        prompt = await self._run_inference("_encode_audio_file", str(audio_files[0]))
+        
+        prompt_path = Path(settings.VOICES_DIR) / f"{voice_id}.pt"
+        await asyncio.to_thread(torch.save, prompt, prompt_path)
+        await self.voices.update(voice_id, prompt_path=str(prompt_path))
+        return prompt
     
     async def clone_voice(
         self,
@@ -133,76 +1075,205 @@ class TTSEngine:
         voice_name: str,
         voice_description: Optional[str] = None
     ) -> str:
-        """Clone a voice from audio sample"""
+        """Clone a voice from an audio sample
+
+        The sample is preprocessed once into VOICES_DIR/``{voice_id}.wav``
+        (mono, model sample rate, loudness-normalized, silence trimmed,
+        16-bit PCM) and encoded from there. On success the sample itself is
+        deleted; on failure it is left where it is for the caller to remove.
+        """
+        canonical_path = None
         try:
-            # Load and validate audio
-            waveform, sample_rate = torchaudio.load(audio_path)
-            duration = waveform.shape[1] / sample_rate
+            # The header is enough to check the duration before decoding anything
+            info = await asyncio.to_thread(probe_audio, audio_path)
             
-            if duration < settings.MIN_CLONE_DURATION:
+            if info.duration < settings.MIN_CLONE_DURATION:
                 raise ValueError(f"Audio too short. Minimum {settings.MIN_CLONE_DURATION}s required")
-            if duration > settings.MAX_CLONE_DURATION:
+            if info.duration > settings.MAX_CLONE_DURATION:
                 raise ValueError(f"Audio too long. Maximum {settings.MAX_CLONE_DURATION}s allowed")
             
             # Generate voice ID
             voice_id = hashlib.md5(f"{voice_name}_{datetime.now().isoformat()}".encode()).hexdigest()[:12]
             
+            # Decode, resample, normalize and trim in the preprocessing pool
+            canonical_path = Path(settings.VOICES_DIR) / f"{voice_id}.wav"
+            preprocessing = await asyncio.get_running_loop().run_in_executor(
+                self._preprocessor(),
+                partial(preprocess_reference, audio_path, canonical_path, self.sample_rate)
+            )
+            if preprocessing["duration"] < settings.MIN_CLONE_DURATION:
+                raise ValueError(
+                    f"Audio too short after trimming silence ({preprocessing['duration']:.1f}s). "
+                    f"Minimum {settings.MIN_CLONE_DURATION}s required"
+                )
+            
+            # Encode the canonical audio once so requests can condition on it
+            prompt = await self._run_inference("_encode_audio_file", str(canonical_path))
+            prompt_path = Path(settings.VOICES_DIR) / f"{voice_id}.pt"
+            await asyncio.to_thread(torch.save, prompt, prompt_path)
+            
             # Store voice data
             voice_data = {
                 "id": voice_id,
                 "name": voice_name,
                 "description": voice_description or "",
                 "transcript": transcript,
-                "audio_path": audio_path,
-                "duration": duration,
+                "audio_path": str(canonical_path),
+                "prompt_path": str(prompt_path),
+                "prompt_frames": prompt.shape[0],
+                "duration": preprocessing["duration"],
+                "preprocessing": preprocessing,
                 "created_at": datetime.now().isoformat()
             }
             
-            self.voices_db[voice_id] = voice_data
-            await self._save_voices_db()
+            await self.voices.add(voice_data)
+            self.audio_prompts[voice_id] = prompt
+            await asyncio.to_thread(Path(audio_path).unlink, missing_ok=True)
             
             logger.info(f"Voice cloned successfully: {voice_name} (ID: {voice_id})")
             return voice_id
             
         except Exception as e:
             logger.error(f"Voice cloning failed: {e}")
+            if canonical_path is not None:
+                await asyncio.to_thread(canonical_path.unlink, missing_ok=True)
             raise
     
-    async def list_voices(self) -> List[Dict]:
-        """List all available voices"""
-        return list(self.voices_db.values())
+    def _preprocessor(self) -> ProcessPoolExecutor:
+        """Process pool for reference-audio preprocessing, started on first use"""
+        if self._preprocess_pool is None:
+            self._preprocess_pool = ProcessPoolExecutor(
+                max_workers=settings.VOICE_PREPROCESS_WORKERS or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_preprocess_worker
+            )
+        return self._preprocess_pool
+    
+    async def import_voices(self, archive_path: str) -> Dict:
+        """Clone every voice in a zip or tar archive (layout in app.models.voice_archive)
+
+        Entries are extracted one at a time while up to
+        VOICE_IMPORT_CONCURRENCY of them (by default one per preprocessing
+        process) are being cloned; an entry that fails is reported without
+        stopping the others.
+        """
+        archive = await asyncio.to_thread(VoiceArchive, archive_path)
+        tasks: List[asyncio.Task] = []
+        try:
+            entries = await asyncio.to_thread(archive.entries)
+            if len(entries) > settings.VOICE_IMPORT_MAX_ENTRIES:
+                raise ArchiveError(f"Archive lists {len(entries)} voices; at most {settings.VOICE_IMPORT_MAX_ENTRIES} allowed")
+            results: List[Dict] = [{} for _ in entries]
+            slots = asyncio.Semaphore(
+                settings.VOICE_IMPORT_CONCURRENCY or settings.VOICE_PREPROCESS_WORKERS or os.cpu_count() or 1
+            )
+            
+            def result(idx: int, **outcome) -> Dict:
+                entry = entries[idx]
+                return {"index": idx, "file": entry["file"], "name": entry["name"], **outcome}
+            
+            async def clone(idx: int, path: Path):
+                entry = entries[idx]
+                try:
+                    voice_id = await self.clone_voice(
+                        audio_path=str(path),
+                        transcript=entry["transcript"],
+                        voice_name=entry["name"],
+                        voice_description=entry["description"] or None
+                    )
+                    results[idx] = result(idx, voice_id=voice_id)
+                except Exception as e:
+                    results[idx] = result(idx, error=str(e))
+                finally:
+                    # Still there only if cloning failed
+                    await asyncio.to_thread(path.unlink, missing_ok=True)
+                    slots.release()
+            
+            extracted = archive.extract(entries, Path(settings.VOICES_DIR), settings.MAX_CLONE_UPLOAD_BYTES)
+            while True:
+                await slots.acquire()
+                item = await asyncio.to_thread(next, extracted, None)
+                if item is None:
+                    slots.release()
+                    break
+                idx, path, error = item
+                if error is not None:
+                    results[idx] = result(idx, error=error)
+                    slots.release()
+                else:
+                    tasks.append(asyncio.create_task(clone(idx, path)))
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.to_thread(archive.close)
+        
+        imported = [entry for entry in results if "voice_id" in entry]
+        failed = [entry for entry in results if "error" in entry]
+        logger.info(f"Imported {len(imported)} of {len(entries)} voices ({len(failed)} failed)")
+        return {"imported": imported, "failed": failed, "total": len(entries)}
+    
+    async def list_outputs(self, limit: int = 50, cursor: Optional[str] = None, **filters) -> Dict:
+        """One page of generated files, newest first"""
+        return await self.outputs.list(limit, cursor, **filters)
+    
+    async def touch_output(self, filename: str):
+        """Record that a generated file was used"""
+        await self.outputs.touch(filename)
+    
+    async def delete_output(self, filename: str) -> bool:
+        """Delete a generated file and its catalog entry"""
+        path = Path(settings.OUTPUTS_DIR) / filename
+        await self.outputs.remove(filename)
+        try:
+            await asyncio.to_thread(os.remove, path)
+        except FileNotFoundError:
+            return False
+        return True
+    
+    async def list_voices(self, limit: Optional[int] = None, offset: int = 0) -> Tuple[List[Dict], int]:
+        """One page of the available voices, and how many there are"""
+        return await self.voices.list(limit, offset)
+    
+    async def get_voice(self, voice_id: str) -> Optional[Dict]:
+        """A voice by id"""
+        return await self.voices.fetch(voice_id)
     
     async def delete_voice(self, voice_id: str) -> bool:
         """Delete a voice"""
-        if voice_id in self.voices_db:
-            del self.voices_db[voice_id]
-            await self._save_voices_db()
-            return True
-        return False
-    
-    async def _load_voices_db(self):
-        """Load voices database from file"""
-        if self.voices_db_path.exists():
-            try:
-                with open(self.voices_db_path, 'r') as f:
-                    self.voices_db = json.load(f)
-                logger.info(f"Loaded {len(self.voices_db)} voices")
-            except Exception as e:
-                logger.error(f"Failed to load voices database: {e}")
-                self.voices_db = {}
-    
-    async def _save_voices_db(self):
-        """Save voices database to file"""
-        try:
-            with open(self.voices_db_path, 'w') as f:
-                json.dump(self.voices_db, f, indent=2)
-        except Exception as e:
-            logger.error(f"Failed to save voices database: {e}")
+        self.audio_prompts.pop(voice_id, None)
+        return await self.voices.delete(voice_id)
     
     async def cleanup(self):
         """Cleanup resources"""
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+        REGISTRY.remove_collector(self._collect_metrics)
+        await self.jobs.stop()
+        await self.voices.close()
+        await self.retention.stop()
+        await self.outputs.close()
         if self.model:
             del self.model
         if self.processor:
             del self.processor
-        torch.cuda.empty_cache()
\ No newline at end of file
+        self.executor.shutdown()
+        if self._preprocess_pool is not None:
+            self._preprocess_pool.shutdown(wait=False, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
+        torch.cuda.empty_cache()
+
+
+# Engine instance owned by an inference worker process
+_worker_engine: Optional[TTSEngine] = None
+
+def _init_worker_engine():
+    """Load the model once when an inference worker process starts"""
+    global _worker_engine
+    _worker_engine = TTSEngine()
+    _worker_engine._load_model()
+
+def _call_worker_engine(method: str, *args, **kwargs):
+    """Invoke a blocking engine method inside an inference worker process"""
+    return getattr(_worker_engine, method)(*args, **kwargs)
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+Bulk voice import: reading reference audio and transcripts from a zip or tar archive
+
+An archive holds audio files (see AUDIO_EXTENSIONS) plus either a manifest
+or a transcript next to each file:
+
+- ``voices.csv`` with the columns ``file``, ``name``, ``transcript`` and
+  optionally ``description``, or ``voices.json``, a list of objects with
+  the same keys. ``file`` is the path inside the archive.
+- Otherwise every audio file with a ``.txt`` of the same name is a voice
+  named after the file, with the text file as its transcript.
+
+Members are read in archive order (tars are streamed, never seeked, so a
+compressed tar is not decompressed again for every member), each one is
+size-checked against its header first, and audio is copied to generated
+file names, never to a member's own path.
+"""
+
+import csv
+import io
+import json
+import tarfile
+import uuid
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from app.models.reference_audio import AUDIO_EXTENSIONS
+
+MANIFESTS = ("voices.csv", "voices.json")
+
+# Manifests and transcripts are small; anything bigger is not one
+_MAX_TEXT_BYTES = 16 * 1024 ** 2
+_CHUNK_BYTES = 1024 ** 2
+
+
+class ArchiveError(ValueError):
+    """Raised for archives that can't be imported"""
+
+
+def _normalize(name: str) -> str:
+    return str(PurePosixPath(name.replace("\\", "/").lstrip("/")))
+
+
+class VoiceArchive:
+    """A zip or tar archive of voices to import"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        if zipfile.is_zipfile(self.path):
+            self._zip: Optional[zipfile.ZipFile] = zipfile.ZipFile(self.path)
+            self._members = {
+                _normalize(info.filename): info for info in self._zip.infolist() if not info.is_dir()
+            }
+        elif tarfile.is_tarfile(self.path):
+            self._zip = None
+            with tarfile.open(self.path, "r:*") as tar:
+                self._members = {_normalize(info.name): info for info in tar if info.isfile()}
+        else:
+            raise ArchiveError("Not a zip or tar archive")
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+    def _size(self, name: str) -> int:
+        member = self._members[name]
+        return member.file_size if self._zip is not None else member.size
+
+    def _read_text(self, names: List[str]) -> Dict[str, str]:
+        """Contents of small text members"""
+        texts = {}
+        for name, handle in self._open(names):
+            data = handle.read(_MAX_TEXT_BYTES + 1)
+            if len(data) > _MAX_TEXT_BYTES:
+                raise ArchiveError(f"{name} is too large")
+            texts[name] = data.decode("utf-8-sig").strip()
+        return texts
+
+    def _open(self, names: List[str]) -> Iterator[Tuple[str, IO[bytes]]]:
+        """Open the given members one after another, in archive order"""
+        wanted = set(names)
+        if self._zip is not None:
+            for name in self._members:
+                if name in wanted:
+                    with self._zip.open(self._members[name]) as handle:
+                        yield name, handle
+            return
+        # Stream through the tar once instead of seeking back for every member
+        with tarfile.open(self.path, "r|*") as tar:
+            for info in tar:
+                name = _normalize(info.name)
+                if info.isfile() and name in wanted:
+                    handle = tar.extractfile(info)
+                    if handle is not None:
+                        yield name, handle
+
+    def entries(self) -> List[Dict[str, str]]:
+        """Voices listed in the archive: ``file``, ``name``, ``transcript`` and ``description``"""
+        manifests = [name for name in self._members if PurePosixPath(name).name in MANIFESTS]
+        if len(manifests) > 1:
+            raise ArchiveError(f"More than one manifest: {', '.join(manifests)}")
+
+        if manifests:
+            manifest = manifests[0]
+            base = PurePosixPath(manifest).parent
+            text = self._read_text([manifest])[manifest]
+            try:
+                if manifest.endswith(".json"):
+                    rows = json.loads(text)
+                    if not isinstance(rows, list):
+                        raise ArchiveError("voices.json must be a list of voices")
+                else:
+                    rows = list(csv.DictReader(io.StringIO(text)))
+            except (ValueError, csv.Error) as e:
+                raise ArchiveError(f"Invalid {PurePosixPath(manifest).name}: {e}")
+            entries = []
+            for row in rows:
+                if not isinstance(row, dict):
+                    raise ArchiveError(f"Invalid {PurePosixPath(manifest).name}: every voice must be an object")
+                row = {key: str(value).strip() for key, value in row.items() if isinstance(key, str) and value is not None}
+                entries.append({
+                    "file": _normalize(str(base / row.get("file", ""))) if row.get("file") else "",
+                    "name": row.get("name") or PurePosixPath(row.get("file", "")).stem,
+                    "transcript": row.get("transcript", ""),
+                    "description": row.get("description", "")
+                })
+            return entries
+
+        # No manifest: audio files with a transcript beside them
+        audio = [
+            name for name in self._members
+            if PurePosixPath(name).suffix.lower() in AUDIO_EXTENSIONS
+        ]
+        sidecars = {name: str(PurePosixPath(name).with_suffix(".txt")) for name in audio}
+        transcripts = self._read_text([txt for txt in sidecars.values() if txt in self._members])
+        return [
+            {
+                "file": name,
+                "name": PurePosixPath(name).stem,
+                "transcript": transcripts.get(sidecars[name], ""),
+                "description": ""
+            }
+            for name in audio
+        ]
+
+    def extract(
+        self,
+        entries: List[Dict[str, str]],
+        destination: Path,
+        max_bytes: int
+    ) -> Iterator[Tuple[int, Optional[Path], Optional[str]]]:
+        """Copy each entry's audio to its own file in ``destination``
+
+        Yields ``(index, path, None)`` per extracted entry or
+        ``(index, None, error)`` for entries that can't be imported, in
+        archive order; the caller owns (and removes) the files.
+        """
+        indexes: Dict[str, int] = {}
+        for idx, entry in enumerate(entries):
+            name = entry["file"]
+            error = None
+            if not name or name not in self._members:
+                error = f"{name or 'file'} not found in archive"
+            elif PurePosixPath(name).suffix.lower() not in AUDIO_EXTENSIONS:
+                error = f"{name} is not a supported audio file ({', '.join(AUDIO_EXTENSIONS)})"
+            elif not entry["transcript"]:
+                error = f"{name} has no transcript"
+            elif max_bytes and self._size(name) > max_bytes:
+                error = f"{name} is larger than {max_bytes} bytes"
+            elif name in indexes:
+                error = f"{name} is listed more than once"
+            if error is not None:
+                yield idx, None, error
+            else:
+                indexes[name] = idx
+
+        for name, handle in self._open(list(indexes)):
+            path = Path(destination) / f"import_{uuid.uuid4().hex}{PurePosixPath(name).suffix.lower()}"
+            with open(path, "wb") as out:
+                while True:
+                    chunk = handle.read(_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+            yield indexes[name], path, None
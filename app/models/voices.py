@@ -0,0 +1,258 @@
+"""
+Cloned-voice metadata store shared by all engine processes
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+
+# Change log rows kept for processes catching up; older ones are trimmed
+_CHANGE_LOG_SIZE = 10000
+
+
+class VoiceStore:
+    """Voices stored in SQLite under VOICES_DIR, mirrored in memory for O(1) lookups
+
+    Every write touches only its own row and appends the voice id to a
+    change log. Each process polls ``PRAGMA data_version``, which changes
+    when another connection commits, and then re-reads just the voices in
+    the log since its last poll. A process that fell behind the trimmed
+    log reloads everything.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = Path(settings.VOICES_DIR) / "voices.db",
+        legacy_path: Path = Path(settings.VOICES_DIR) / "voices_db.json",
+        poll_interval: float = settings.VOICE_STORE_POLL_INTERVAL,
+        on_change: Optional[Callable[[str], None]] = None
+    ):
+        self.db_path = Path(db_path)
+        self.legacy_path = Path(legacy_path)
+        self.poll_interval = poll_interval
+        self.on_change = on_change
+
+        self._voices: Dict[str, Dict] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._last_seq = 0
+        self._data_version = None
+        self._poller: Optional[asyncio.Task] = None
+
+    def open(self):
+        """Open (and create) the database, migrate voices_db.json and load all voices"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS voices (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS voices_created ON voices (created_at, id)")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                voice_id TEXT NOT NULL
+            )"""
+        )
+        self._migrate_legacy()
+        self._reload()
+        logger.info(f"Loaded {len(self._voices)} voices")
+
+    def start(self):
+        """Start following changes made by other processes"""
+        self._poller = asyncio.create_task(self._poll())
+
+    def _migrate_legacy(self):
+        """Import voices_db.json once; the first process to get here does it"""
+        if not self.legacy_path.exists():
+            return
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if self._db.execute("SELECT COUNT(*) FROM voices").fetchone()[0] or not self.legacy_path.exists():
+                    self._db.execute("COMMIT")
+                    return
+                with open(self.legacy_path, "r") as f:
+                    voices = json.load(f)
+                for voice in voices.values():
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO voices (id, name, created_at, data) VALUES (?, ?, ?, ?)",
+                        (voice["id"], voice["name"], voice["created_at"], json.dumps(voice))
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        self.legacy_path.rename(self.legacy_path.with_name(self.legacy_path.name + ".migrated"))
+        logger.info(f"Migrated {len(voices)} voices from {self.legacy_path.name}")
+
+    def _reload(self):
+        """Replace the in-memory mirror with the whole table"""
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                rows = self._db.execute("SELECT id, data FROM voices").fetchall()
+                last_seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            finally:
+                self._db.execute("COMMIT")
+            self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        self._voices = {voice_id: json.loads(data) for voice_id, data in rows}
+        self._last_seq = last_seq
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                for voice_id in await asyncio.to_thread(self._sync):
+                    if self.on_change is not None:
+                        self.on_change(voice_id)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to refresh voices: {e}")
+
+    def _sync(self) -> List[str]:
+        """Apply other processes' changes; returns the ids that changed"""
+        with self._lock:
+            data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return []
+            self._data_version = data_version
+
+            self._db.execute("BEGIN")
+            try:
+                oldest = self._db.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+                if oldest is not None and oldest > self._last_seq + 1:
+                    changes = None
+                else:
+                    changes = self._db.execute(
+                        "SELECT seq, voice_id FROM changes WHERE seq > ? ORDER BY seq", (self._last_seq,)
+                    ).fetchall()
+                    ids = sorted({voice_id for _, voice_id in changes})
+                    rows = dict(self._db.execute(
+                        f"SELECT id, data FROM voices WHERE id IN ({', '.join('?' * len(ids))})", ids
+                    ).fetchall()) if ids else {}
+            finally:
+                self._db.execute("COMMIT")
+
+        if changes is None:
+            # Fell behind the trimmed change log
+            before = self._voices
+            self._reload()
+            return [voice_id for voice_id in before.keys() | self._voices.keys()
+                    if before.get(voice_id) != self._voices.get(voice_id)]
+
+        for voice_id in ids:
+            if voice_id in rows:
+                self._voices[voice_id] = json.loads(rows[voice_id])
+            else:
+                self._voices.pop(voice_id, None)
+        if changes:
+            self._last_seq = changes[-1][0]
+        return ids
+
+    def get(self, voice_id: Optional[str]) -> Optional[Dict]:
+        """A voice from the in-memory mirror"""
+        return self._voices.get(voice_id) if voice_id else None
+
+    async def fetch(self, voice_id: Optional[str]) -> Optional[Dict]:
+        """A voice, reading the database when another process created it since the last poll"""
+        if not voice_id:
+            return None
+        voice = self._voices.get(voice_id)
+        if voice is None:
+            voice = await asyncio.to_thread(self._load, voice_id)
+            if voice is not None:
+                self._voices[voice_id] = voice
+        return voice
+
+    def __contains__(self, voice_id: Optional[str]) -> bool:
+        return bool(voice_id) and voice_id in self._voices
+
+    def __len__(self) -> int:
+        return len(self._voices)
+
+    def _load(self, voice_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM voices WHERE id = ?", (voice_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    async def add(self, voice: Dict):
+        """Insert or replace a voice"""
+        await asyncio.to_thread(self._write, voice["id"], voice)
+        self._voices[voice["id"]] = voice
+
+    async def update(self, voice_id: str, **fields) -> Optional[Dict]:
+        """Change some fields of a voice"""
+        voice = await self.fetch(voice_id)
+        if voice is None:
+            return None
+        voice = dict(voice, **fields)
+        await self.add(voice)
+        return voice
+
+    async def delete(self, voice_id: str) -> bool:
+        """Remove a voice; False if it did not exist"""
+        deleted = await asyncio.to_thread(self._write, voice_id, None)
+        self._voices.pop(voice_id, None)
+        return deleted
+
+    def _write(self, voice_id: str, voice: Optional[Dict]) -> bool:
+        """Change one row and log it, in one transaction"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if voice is None:
+                    changed = self._db.execute("DELETE FROM voices WHERE id = ?", (voice_id,)).rowcount > 0
+                else:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO voices (id, name, created_at, data) VALUES (?, ?, ?, ?)",
+                        (voice_id, voice["name"], voice["created_at"], json.dumps(voice))
+                    )
+                    changed = True
+                if changed:
+                    seq = self._db.execute(
+                        "INSERT INTO changes (voice_id) VALUES (?)", (voice_id,)
+                    ).lastrowid
+                    self._db.execute("DELETE FROM changes WHERE seq <= ?", (seq - _CHANGE_LOG_SIZE,))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return changed
+
+    async def list(self, limit: Optional[int] = None, offset: int = 0) -> Tuple[List[Dict], int]:
+        """One page of voices, oldest first, and the total number"""
+        return await asyncio.to_thread(self._page, limit, offset)
+
+    def _page(self, limit: Optional[int], offset: int) -> Tuple[List[Dict], int]:
+        with self._lock:
+            total = self._db.execute("SELECT COUNT(*) FROM voices").fetchone()[0]
+            rows = self._db.execute(
+                "SELECT data FROM voices ORDER BY created_at, id LIMIT ? OFFSET ?",
+                (-1 if limit is None else limit, offset)
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows], total
+
+    async def close(self):
+        """Stop following changes and close the database"""
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for driaClaude
+
+Run the suites from the repository root with ``python -m benchmarks.run``
+and compare two result files with ``python -m benchmarks.compare``.
+"""
@@ -0,0 +1,42 @@
+"""
+/tts/batch throughput with and without micro-batching, against one request at a time
+"""
+
+from benchmarks.harness import Results, Stopwatch, app_client, check, sample_text
+
+
+async def run(results: Results, args):
+    # Similar lengths, so the items fall into the same token budget buckets
+    items = [{"text": sample_text(60 + 10 * (idx % 4))} for idx in range(args.items)]
+
+    async with app_client() as (client, engine):
+        check(await client.post("/api/v1/tts/generate", json=items[0]))
+        max_batch_size = engine.scheduler.max_batch_size
+
+        for mode, batch_size in (("batched", max_batch_size), ("unbatched", 1)):
+            # Unbatched items still run concurrently, on the executor's workers
+            engine.scheduler.max_batch_size = batch_size
+            before = engine.scheduler.stats()
+            throughput = []
+            for _ in range(args.repeats):
+                watch = Stopwatch()
+                body = check(await client.post("/api/v1/tts/batch", json={"items": items}))
+                if body["failed"]:
+                    raise RuntimeError(f"{len(body['failed'])} batch items failed: {body['failed'][0]}")
+                throughput.append(len(items) / watch.elapsed)
+            after = engine.scheduler.stats()
+            model_calls = after["batches"] - before["batches"]
+
+            results.add(
+                f"batch.{mode}.items_per_second", throughput, unit="items/s", better="higher",
+                items=len(items), avg_batch_size=round((after["items"] - before["items"]) / max(1, model_calls), 2)
+            )
+        engine.scheduler.max_batch_size = max_batch_size
+
+        throughput = []
+        for _ in range(args.repeats):
+            watch = Stopwatch()
+            for item in items:
+                check(await client.post("/api/v1/tts/generate", json=item))
+            throughput.append(len(items) / watch.elapsed)
+        results.add("batch.sequential.items_per_second", throughput, unit="items/s", better="higher", items=len(items))
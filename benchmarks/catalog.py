@@ -0,0 +1,163 @@
+"""
+Voice store and /tts/list with many entries (100k by default)
+"""
+
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Awaitable, Callable, List
+
+from app.config import settings
+from app.models.encoders import ENCODERS
+from app.models.outputs import OutputCatalog
+from app.models.voices import VoiceStore
+from benchmarks.harness import Results, Stopwatch, app_client, check
+
+USERS = 100
+VOICES_IN_USE = 1000
+
+
+async def _timed(repeats: int, call: Callable[[], Awaitable]) -> List[float]:
+    latencies = []
+    for _ in range(repeats):
+        watch = Stopwatch()
+        await call()
+        latencies.append(watch.elapsed)
+    return latencies
+
+
+def _write_legacy_voices(path: Path, count: int) -> List[str]:
+    """A voices_db.json as written before the SQLite store, so opening the store migrates it"""
+    start = datetime(2024, 1, 1)
+    voices = {}
+    for idx in range(count):
+        voice_id = f"{idx:012x}"
+        voices[voice_id] = {
+            "id": voice_id,
+            "name": f"Voice {idx}",
+            "description": "",
+            "transcript": "[S1] This is a sample of my voice for the benchmark.",
+            "audio_path": f"/data/uploads/{voice_id}.wav",
+            "prompt_path": str(Path(settings.VOICES_DIR) / f"{voice_id}.pt"),
+            "prompt_frames": 860,
+            "duration": 10.0,
+            "created_at": (start + timedelta(seconds=idx)).isoformat()
+        }
+    with open(path, "w") as f:
+        json.dump(voices, f)
+    return list(voices)
+
+
+def _fill_outputs(catalog: OutputCatalog, count: int, voice_ids: List[str]) -> float:
+    """Catalog rows for ``count`` files (the files themselves are not needed for listing)"""
+    formats = [(name, encoder.extension) for name, encoder in ENCODERS.items()]
+    now = time.time()
+    parameters = json.dumps({"temperature": 1.3, "guidance_scale": 3.0, "top_p": 0.95, "top_k": 45, "seed": None})
+    rows = []
+    for idx in range(count):
+        format, extension = formats[idx % len(formats)]
+        created_at = now - (count - idx) * 10
+        rows.append((
+            f"tts_bench_{idx:08d}{extension}", f"user{idx % USERS}", 200_000, 5.0, format, 44100,
+            voice_ids[idx % len(voice_ids)], parameters, created_at, created_at
+        ))
+    watch = Stopwatch()
+    for start in range(0, len(rows), 10_000):
+        catalog._insert_missing(rows[start:start + 10_000])
+    return watch.elapsed
+
+
+async def run(results: Results, args):
+    count = args.entries
+    rng = random.Random(0)
+    voices_dir = Path(settings.VOICES_DIR)
+
+    # Voice store: migration, loading, lookups, paging and writes
+    voice_ids = _write_legacy_voices(voices_dir / "voices_db.json", count)
+    watch = Stopwatch()
+    store = VoiceStore()
+    store.open()
+    results.add("voices.migrate_legacy", [watch.elapsed], entries=count)
+    await store.close()
+
+    load = []
+    for _ in range(args.repeats):
+        watch = Stopwatch()
+        store = VoiceStore()
+        store.open()
+        load.append(watch.elapsed)
+        if len(store) < count:
+            raise RuntimeError(f"Voice store has {len(store)} voices, expected {count}")
+        await store.close()
+    results.add("voices.open", load, entries=count)
+
+    store = VoiceStore()
+    store.open()
+    try:
+        sample = [rng.choice(voice_ids) for _ in range(10_000)]
+        watch = Stopwatch()
+        for voice_id in sample:
+            store.get(voice_id)
+        results.add("voices.get", [watch.elapsed / len(sample)], ops=len(sample))
+
+        missing = iter(f"missing{idx}" for idx in range(10 ** 9))
+        results.add("voices.fetch_miss", await _timed(args.repeats * 20, lambda: store.fetch(next(missing))))
+
+        for name, offset in (("first", 0), ("middle", count // 2), ("last", max(0, count - 50))):
+            results.add(f"voices.list.{name}_page", await _timed(args.repeats * 5, lambda: store.list(50, offset)))
+
+        new_ids = iter(f"bench{idx:07d}" for idx in range(10 ** 7))
+
+        async def add():
+            voice_id = next(new_ids)
+            await store.add({"id": voice_id, "name": voice_id, "transcript": "", "created_at": datetime.now().isoformat()})
+            await store.delete(voice_id)
+
+        results.add("voices.add_and_delete", await _timed(args.repeats * 20, add))
+    finally:
+        await store.close()
+
+    # Output catalog rows, listed through the API
+    catalog = OutputCatalog()
+    catalog.open()
+    fill_seconds = _fill_outputs(catalog, count, voice_ids[:VOICES_IN_USE])
+    await catalog.close()
+    results.add("outputs.insert", [fill_seconds], entries=count)
+
+    watch = Stopwatch()
+    async with app_client() as (client, _):
+        results.add("catalog.app_startup", [watch.elapsed], voices=count, outputs=count)
+
+        def get(url: str):
+            async def call():
+                return check(await client.get(url))
+            return call
+
+        pages = {
+            "first_page": "/api/v1/tts/list?limit=50",
+            "by_user": "/api/v1/tts/list?limit=50&user=user7",
+            "by_voice": f"/api/v1/tts/list?limit=50&voice_id={voice_ids[3]}",
+            "by_format": "/api/v1/tts/list?limit=50&format=wav",
+            "by_date": f"/api/v1/tts/list?limit=50&created_after={time.time() - count * 5}",
+            "max_page": "/api/v1/tts/list?limit=1000"
+        }
+        for name, url in pages.items():
+            results.add(f"tts_list.{name}", await _timed(args.repeats * 5, get(url)), entries=count)
+
+        # Walking deep into the listing with cursors
+        async def walk():
+            params = {"limit": 50}
+            for _ in range(20):
+                body = check(await client.get("/api/v1/tts/list", params=params))
+                params["cursor"] = body["next_cursor"]
+
+        results.add("tts_list.cursor_walk_20_pages", await _timed(args.repeats, walk), entries=count)
+
+        for name, offset in (("first_page", 0), ("last_page", max(0, count - 50))):
+            results.add(
+                f"voices_list.{name}",
+                await _timed(args.repeats * 5, get(f"/api/v1/voices/list?limit=50&offset={offset}")),
+                entries=count
+            )
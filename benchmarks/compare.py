@@ -0,0 +1,82 @@
+"""
+Compare two benchmark result files
+
+    python -m benchmarks.compare before.json after.json --threshold 0.1
+
+Prints the median of every measurement in both runs and the relative
+change, and exits with status 1 if any got worse by more than the
+threshold.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+def load(path: Path) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> Tuple[List[Tuple], List[str]]:
+    """One row per measurement (name, baseline, current, change, status) and the regressed names"""
+    rows, regressions = [], []
+    names = list(baseline["results"]) + [name for name in current["results"] if name not in baseline["results"]]
+    for name in names:
+        before, after = baseline["results"].get(name), current["results"].get(name)
+        if before is None or after is None:
+            rows.append((name, before and before["p50"], after and after["p50"], None, "added" if before is None else "removed"))
+            continue
+
+        change = (after["p50"] - before["p50"]) / before["p50"] if before["p50"] else 0.0
+        # Positive means worse, whichever direction is better for this measurement
+        worse = change if after["better"] == "lower" else -change
+        if worse > threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif worse < -threshold:
+            status = "improved"
+        else:
+            status = ""
+        rows.append((name, before["p50"], after["p50"], change, status))
+    return rows, regressions
+
+
+def _describe(meta: Dict) -> str:
+    commit = (meta.get("git_commit") or "unknown")[:12]
+    return f"{commit}{' (dirty)' if meta.get('git_dirty') else ''} {meta.get('timestamp', '')}"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change that counts (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    baseline, current = load(args.baseline), load(args.current)
+    print(f"baseline: {_describe(baseline['meta'])}")
+    print(f"current:  {_describe(current['meta'])}")
+    for key in ("model", "torch", "torch_threads", "cpu_count", "options"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"warning: {key} differs ({baseline['meta'].get(key)} vs {current['meta'].get(key)})")
+
+    rows, regressions = compare(baseline, current, args.threshold)
+    width = max(len(row[0]) for row in rows) if rows else 0
+    print(f"\n{'measurement':<{width}}  {'baseline':>12}  {'current':>12}  {'change':>8}")
+    for name, before, after, change, status in rows:
+        before_text = f"{before:.4g}" if before is not None else "-"
+        after_text = f"{after:.4g}" if after is not None else "-"
+        change_text = f"{change:+.1%}" if change is not None else ""
+        print(f"{name:<{width}}  {before_text:>12}  {after_text:>12}  {change_text:>8}  {status}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+TTSEngine.generate_speech latency and real-time factor by text length
+"""
+
+import statistics
+
+from app.config import settings
+from app.models.tts_engine import TTSEngine
+from benchmarks.harness import Results, Stopwatch, sample_text
+
+# Characters per text; long_form is past LONGFORM_MIN_CHARS, so it is split into segments
+LENGTHS = {"short": 40, "medium": 150, "long": 350, "long_form": 1200}
+
+
+async def run(results: Results, args):
+    watch = Stopwatch()
+    engine = TTSEngine()
+    await engine.initialize()
+    results.add("engine.startup", [watch.elapsed])
+
+    try:
+        # First calls pay for lazy initialization in torch and the codec
+        await engine.generate_speech(sample_text(LENGTHS["short"]), seed=0)
+
+        for name, chars in LENGTHS.items():
+            text = sample_text(chars)
+            latencies, factors, durations = [], [], []
+            for idx in range(args.repeats):
+                # Seeded, so every run of the suite generates the same audio
+                watch = Stopwatch()
+                _, metadata = await engine.generate_speech(text, seed=idx + 1)
+                latencies.append(watch.elapsed)
+                durations.append(metadata["duration"])
+                factors.append(metadata["duration"] / latencies[-1])
+
+            results.add(
+                f"engine.generate_speech.{name}", latencies,
+                chars=len(text), audio_seconds=statistics.fmean(durations), format=settings.DEFAULT_OUTPUT_FORMAT
+            )
+            results.add(f"engine.real_time_factor.{name}", factors, unit="x", better="higher")
+    finally:
+        await engine.cleanup()
@@ -0,0 +1,57 @@
+"""
+Guidance cost against quality: every step guided, only the first steps, and none
+
+Speed is the generation latency and real-time factor. Quality needs ears
+(run with ``--model`` and ``--workdir`` and listen to the saved outputs,
+listed with each result); the measurement here is how far the audio
+duration drifts from the fully guided generation of the same seed, since
+unguided decoding tends to rush, stall or ramble. With the tiny random
+model only the speed numbers mean anything.
+"""
+
+import statistics
+
+from app.config import settings
+from app.models.tts_engine import TTSEngine
+from benchmarks.harness import Results, Stopwatch, sample_text
+
+# guidance_steps per variant; 0 guides every step, None turns guidance off
+VARIANTS = {"full": 0, "first_256": 256, "first_64": 64, "first_16": 16, "off": None}
+
+
+async def run(results: Results, args):
+    engine = TTSEngine()
+    await engine.initialize()
+    text = sample_text(150)
+
+    try:
+        await engine.generate_speech(sample_text(40), seed=0)
+
+        durations = {}
+        for name, steps in VARIANTS.items():
+            latencies, factors, durations[name], outputs = [], [], [], []
+            for idx in range(args.repeats):
+                watch = Stopwatch()
+                filename, metadata = await engine.generate_speech(
+                    text,
+                    guidance_scale=settings.GUIDANCE_SCALE if steps is not None else 1.0,
+                    guidance_steps=steps or 0,
+                    seed=idx + 1
+                )
+                latencies.append(watch.elapsed)
+                durations[name].append(metadata["duration"])
+                factors.append(metadata["duration"] / latencies[-1])
+                outputs.append(filename)
+
+            results.add(
+                f"guidance.{name}.generate_speech", latencies,
+                chars=len(text), guidance_steps=steps, audio_seconds=statistics.fmean(durations[name]), outputs=outputs
+            )
+            results.add(f"guidance.{name}.real_time_factor", factors, unit="x", better="higher")
+            if name != "full":
+                # Same seeds as the fully guided run, so durations pair up
+                drift = [abs(duration / full - 1) for duration, full in zip(durations[name], durations["full"])]
+                results.add(f"guidance.{name}.duration_drift", drift, unit="ratio")
+    finally:
+        await engine.cleanup()
+
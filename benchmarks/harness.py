@@ -0,0 +1,164 @@
+"""
+Shared pieces of the benchmark suites: environment, timing and results
+
+Settings are read from the environment when ``app.config`` is first
+imported, so ``configure`` must run before anything under ``app`` (or
+``main``) is imported.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Text of a given length, cut at a word boundary
+_SAMPLE_TEXT = (
+    "The quick brown fox jumps over the lazy dog while the morning train rolls past the station. "
+    "She said the results would be ready by noon, but nobody expected them to be this good. "
+    "Numbers alone never tell the whole story, so we listened to every sample twice. "
+)
+
+
+def sample_text(chars: int) -> str:
+    """Plain English text of about ``chars`` characters"""
+    text = _SAMPLE_TEXT * (chars // len(_SAMPLE_TEXT) + 1)
+    return text[:chars].rsplit(" ", 1)[0].strip()
+
+
+def configure(workdir: Path, model: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """Point the service at a scratch directory and a model; returns the variables set"""
+    workdir = Path(workdir)
+    env = {
+        "MODEL_NAME": str(model),
+        "DATA_DIR": str(workdir / "data"),
+        "VOICES_DIR": str(workdir / "voices"),
+        "OUTPUTS_DIR": str(workdir / "outputs"),
+        "MODEL_SERVER_SOCKET": str(workdir / "model_server.sock"),
+        "DEPLOYMENT_MODE": "standalone",
+        "ENABLE_AUTH": "false",
+        "LOG_LEVEL": "WARNING",
+        "TRANSFORMERS_VERBOSITY": "error",
+        # Every request must really run the model
+        "RESULT_CACHE_ENABLED": "false",
+        # Load tests measure queueing, not shedding
+        "ADMISSION_ENABLED": "false",
+        # Suites warm up themselves; nothing may run in the background while measuring
+        "WARMUP_ENABLED": "false",
+        # Nothing may be deleted while a suite is measuring
+        "OUTPUT_TTL_HOURS": "0",
+        "OUTPUT_MAX_BYTES": "0",
+        "OUTPUT_USER_QUOTA_BYTES": "0"
+    }
+    env.update({key: str(value) for key, value in (overrides or {}).items()})
+    for name in ("DATA_DIR", "VOICES_DIR", "OUTPUTS_DIR"):
+        Path(env[name]).mkdir(parents=True, exist_ok=True)
+    os.environ.update(env)
+    return env
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    """Count, mean, median, p95, min and max"""
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, max(0, round(0.95 * len(ordered)) - 1))]
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": statistics.median(ordered),
+        "p95": p95,
+        "min": ordered[0],
+        "max": ordered[-1]
+    }
+
+
+class Results:
+    """Named measurements plus the environment they were taken in, saved as JSON
+
+    Every result has a unit, whether lower or higher is better, and summary
+    statistics; ``p50`` is what ``benchmarks.compare`` compares.
+    """
+
+    def __init__(self, meta: Dict[str, Any]):
+        self.meta = meta
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, values: Sequence[float], unit: str = "s", better: str = "lower", **info) -> Dict:
+        """Record one measurement (or several samples of it)"""
+        if not values:
+            raise ValueError(f"No samples for {name}")
+        result = dict(unit=unit, better=better, **summarize(values), **info)
+        self.results[name] = result
+        print(f"  {name}: p50 {result['p50']:.4g} {unit} (n={result['n']})", flush=True)
+        return result
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"meta": self.meta, "results": self.results}, f, indent=2)
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def system_info() -> Dict[str, Any]:
+    """Commit, library versions and CPU of this run"""
+    import torch
+    import transformers
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads()
+    }
+
+
+class Stopwatch:
+    """Seconds since creation"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+@asynccontextmanager
+async def app_client() -> AsyncIterator[Tuple[Any, Any]]:
+    """The FastAPI app, started as uvicorn would, and an HTTP client talking to it in process"""
+    import httpx
+
+    import main
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            yield client, main.tts_engine
+
+
+def check(response) -> Any:
+    """JSON body of a successful response"""
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path} -> {response.status_code}: {response.text}")
+    return response.json()
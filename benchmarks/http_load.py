@@ -0,0 +1,59 @@
+"""
+End-to-end HTTP load through the FastAPI app at several concurrency levels
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.harness import Results, Stopwatch, app_client, sample_text
+
+
+async def _load(
+    client,
+    method: str,
+    url: str,
+    concurrency: int,
+    total: int,
+    body: Optional[Dict] = None
+) -> Tuple[List[float], int, float]:
+    """Send ``total`` requests from ``concurrency`` clients; latencies, errors and wall time"""
+    remaining = iter(range(total))
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            watch = Stopwatch()
+            response = await client.request(method, url, json=body)
+            latencies.append(watch.elapsed)
+            errors += response.status_code >= 400
+
+    watch = Stopwatch()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, errors, watch.elapsed
+
+
+async def run(results: Results, args):
+    generate = {"text": sample_text(60)}
+    scenarios = [
+        # Framework, routing and middleware overhead
+        ("health", "GET", "/health", None, 32, args.requests * 10),
+        ("voices_list", "GET", "/api/v1/voices/list?limit=50", None, 32, args.requests * 10),
+        # Full pipeline, saved to a file or returned in the response
+        *[
+            (f"generate.c{concurrency}", "POST", "/api/v1/tts/generate", generate, concurrency,
+             max(args.requests, 2 * concurrency))
+            for concurrency in args.concurrency
+        ],
+        ("audio.c4", "POST", "/api/v1/tts/audio", dict(generate, format="wav"), 4, max(args.requests, 8))
+    ]
+
+    async with app_client() as (client, _):
+        await client.post("/api/v1/tts/generate", json=generate)
+
+        for name, method, url, body, concurrency, total in scenarios:
+            latencies, errors, elapsed = await _load(client, method, url, concurrency, total, body)
+            if errors:
+                raise RuntimeError(f"{errors} of {total} requests to {url} failed")
+            results.add(f"http.{name}.latency", latencies, concurrency=concurrency)
+            results.add(f"http.{name}.requests_per_second", [total / elapsed], unit="req/s", better="higher")
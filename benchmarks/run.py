@@ -0,0 +1,110 @@
+"""
+Run the benchmark suites and write the results to JSON
+
+    python -m benchmarks.run                      # all suites, tiny random model
+    python -m benchmarks.run --suites engine http --output before.json
+    python -m benchmarks.run --model /models/dia  # a real checkpoint
+
+Each run uses a scratch directory for data, voices and outputs, so it
+never touches the service's own files.
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.harness import REPO_ROOT, Results, configure, system_info
+
+SUITES = {
+    "engine": "benchmarks.engine",
+    "batching": "benchmarks.batching",
+    "guidance": "benchmarks.guidance",
+    "catalog": "benchmarks.catalog",
+    "http": "benchmarks.http_load"
+}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark driaClaude offline")
+    parser.add_argument("--suites", nargs="+", choices=list(SUITES), default=list(SUITES))
+    parser.add_argument("--output", type=Path, help="Results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--model", help="Model to load (default: a tiny random Dia built in the scratch directory)")
+    parser.add_argument("--workdir", type=Path, help="Scratch directory to keep (default: a temporary one)")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads")
+    parser.add_argument("--repeats", type=int, default=3, help="Samples per measurement")
+    parser.add_argument("--entries", type=int, default=100_000, help="Voices and catalog rows for the catalog suite")
+    parser.add_argument("--items", type=int, default=16, help="Items per /tts/batch request")
+    parser.add_argument("--requests", type=int, default=16, help="Requests per HTTP load scenario")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes, for checking that the suites run")
+    parser.add_argument(
+        "--set", action="append", default=[], metavar="NAME=VALUE",
+        help="Service setting for this run, e.g. --set BATCH_MAX_SIZE=4 (repeatable)"
+    )
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.repeats, args.entries, args.items, args.requests = 1, 2000, 4, 4
+        args.concurrency = [1, 4]
+    return args
+
+
+async def run_suites(args, results: Results):
+    for name in args.suites:
+        print(f"{name}:", flush=True)
+        suite = importlib.import_module(SUITES[name])
+        await suite.run(results, args)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="driaclaude-bench-"))
+    overrides = dict(item.split("=", 1) for item in args.set)
+
+    try:
+        model = args.model
+        if model is None:
+            from benchmarks.tiny_model import build_tiny_model
+            model = str(build_tiny_model(workdir / "tiny-dia"))
+        env = configure(workdir, model, overrides)
+
+        # Relative paths in the app (static files) are resolved from the repository root
+        os.chdir(REPO_ROOT)
+        sys.path.insert(0, str(REPO_ROOT))
+
+        import torch
+        from loguru import logger
+
+        if args.threads:
+            torch.set_num_threads(args.threads)
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+        meta = system_info()
+        meta.update({
+            "model": "tiny-random-dia" if args.model is None else args.model,
+            "suites": args.suites,
+            "options": {
+                key: value for key, value in vars(args).items()
+                if key in ("repeats", "entries", "items", "requests", "concurrency", "quick")
+            },
+            "settings": {key: value for key, value in env.items() if key not in ("DATA_DIR", "VOICES_DIR", "OUTPUTS_DIR")}
+        })
+        results = Results(meta)
+        asyncio.run(run_suites(args, results))
+
+        output = args.output or REPO_ROOT / "benchmarks" / "results" / f"{(meta['git_commit'] or 'unknown')[:12]}.json"
+        results.save(output)
+        print(f"Results written to {output}")
+        return 0
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
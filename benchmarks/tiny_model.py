@@ -0,0 +1,61 @@
+"""
+Tiny randomly initialized Dia checkpoint, a stand-in for the real model
+
+It has the real architecture, tokenizer, delay pattern and DAC codec with a
+few layers of width 32, so the whole pipeline runs in well under a second
+per request without downloading anything. Audio is noise and lengths are
+whatever the random weights produce, so only compare timings between runs
+that used the same seed.
+"""
+
+import argparse
+from pathlib import Path
+
+import torch
+from transformers import (
+    DacConfig, DacModel, DiaConfig, DiaFeatureExtractor, DiaForConditionalGeneration, DiaProcessor, DiaTokenizer
+)
+
+SAMPLE_RATE = 44100
+
+
+def build_tiny_model(path: Path, seed: int = 0) -> Path:
+    """Write the tiny checkpoint to ``path`` (if it is not there yet) and return the path"""
+    path = Path(path)
+    if (path / "config.json").exists():
+        return path
+
+    torch.manual_seed(seed)
+    config = DiaConfig(
+        encoder_config=dict(
+            num_hidden_layers=1, hidden_size=32, intermediate_size=64,
+            num_attention_heads=2, num_key_value_heads=2, head_dim=16
+        ),
+        decoder_config=dict(
+            num_hidden_layers=1, hidden_size=32, intermediate_size=64,
+            num_attention_heads=2, num_key_value_heads=1, head_dim=16,
+            cross_hidden_size=32, cross_num_attention_heads=2, cross_num_key_value_heads=2, cross_head_dim=16
+        )
+    )
+    model = DiaForConditionalGeneration(config).eval()
+
+    codec = DacModel(DacConfig(
+        encoder_hidden_size=8, decoder_hidden_size=16, n_codebooks=9, codebook_size=1024,
+        downsampling_ratios=[2, 4, 8, 8], upsampling_ratios=[8, 8, 4, 2], sampling_rate=SAMPLE_RATE
+    )).eval()
+    codec.save_pretrained(path / "dac")
+    # The processor config refers to the codec by this path
+    codec = DacModel.from_pretrained(path / "dac")
+
+    processor = DiaProcessor(DiaFeatureExtractor(sampling_rate=SAMPLE_RATE), DiaTokenizer(), codec)
+    processor.save_pretrained(path)
+    model.save_pretrained(path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a tiny random Dia checkpoint")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(build_tiny_model(args.path, args.seed))
@@ -4,21 +4,26 @@ driaClaude - CPU-based TTS Web Service
 Based on dia TTS model with web interface and API
 """
 
+import asyncio
 import os
 import sys
+import time
 from pathlib import Path
 from contextlib import asynccontextmanager
 
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
 
 from app.config import settings
+from app.metrics import HTTP_IN_FLIGHT, HTTP_SECONDS, REGISTRY, render, set_process_role
 from app.api import router as api_router
 from app.web import router as web_router
 from app.models.tts_engine import TTSEngine
+from app.models.model_server import RemoteTTSEngine, start_model_server_process
 
 # Configure logging
 logger.remove()
@@ -31,6 +36,9 @@ logger.add(
 # Global TTS engine instance
 tts_engine = None
 
+# Seconds /health waits for the engine's stats before reporting "degraded"
+HEALTH_STATS_TIMEOUT = 5.0
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle"""
@@ -42,9 +50,15 @@ async def lifespan(app: FastAPI):
     for dir_path in [settings.DATA_DIR, settings.VOICES_DIR, settings.OUTPUTS_DIR]:
         Path(dir_path).mkdir(parents=True, exist_ok=True)
     
-    # Initialize TTS engine
-    logger.info("Initializing TTS engine...")
-    tts_engine = TTSEngine()
+    # Initialize TTS engine, or connect to the shared model server
+    if settings.DEPLOYMENT_MODE == "model_server":
+        set_process_role("http_worker")
+        tts_engine = RemoteTTSEngine()
+    elif settings.DEPLOYMENT_MODE == "standalone":
+        logger.info("Initializing TTS engine...")
+        tts_engine = TTSEngine()
+    else:
+        raise ValueError(f"Unknown deployment mode: {settings.DEPLOYMENT_MODE}")
     await tts_engine.initialize()
     
     # Store engine in app state
@@ -76,6 +90,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _endpoint(request: Request) -> str:
+    """Route template a request matched, so metrics aren't labeled per file or id"""
+    if "endpoint" not in request.scope:
+        return "unmatched"
+    root_path = request.scope.get("root_path", "")
+    app_root_path = request.scope.get("app_root_path", root_path)
+    if root_path != app_root_path:
+        # A mounted app (static files): one label for the whole mount
+        return f"{root_path[len(app_root_path):]}/{{path}}"
+    path = request.url.path
+    for name, value in request.path_params.items():
+        value = str(value).strip("/")
+        if value:
+            head, found, tail = path.rpartition(f"/{value}")
+            if found:
+                path = f"{head}/{{{name}}}{tail}"
+    return path
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    """Time every request per endpoint and count the ones in flight"""
+    if not settings.METRICS_ENABLED:
+        return await call_next(request)
+    
+    start = time.perf_counter()
+    status = 500
+    HTTP_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        HTTP_SECONDS.observe(
+            time.perf_counter() - start, endpoint=_endpoint(request), method=request.method, status=str(status)
+        )
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 app.mount("/outputs", StaticFiles(directory=settings.OUTPUTS_DIR), name="outputs")
@@ -86,19 +137,70 @@ app.include_router(web_router)
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint; "degraded" when the engine's stats can't be read"""
+    status, error = "healthy", None
+    try:
+        # IPC to the model server and SQLite reads; a hung one must not hang the check
+        stats = await asyncio.wait_for(tts_engine.get_stats(), HEALTH_STATS_TIMEOUT) if tts_engine else {}
+    except Exception as e:
+        logger.warning(f"Health check could not read engine stats: {e!r}")
+        stats, status, error = {}, "degraded", repr(e)
     return {
-        "status": "healthy",
+        "status": status,
+        "error": error,
         "service": "driaClaude",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "deployment_mode": settings.DEPLOYMENT_MODE,
+        "inference": stats.get("inference"),
+        "batching": stats.get("batching"),
+        "admission": stats.get("admission"),
+        "warmup": stats.get("warmup"),
+        "memory": stats.get("memory"),
+        "kv_cache": stats.get("kv_cache")
     }
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness: the process is up and serving HTTP"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: the model is loaded and warmed up (503 until then)"""
+    try:
+        readiness = await tts_engine.readiness() if tts_engine else {"ready": False}
+    except Exception as e:
+        # e.g. the model server is down
+        readiness = {"ready": False, "error": str(e)}
+    return JSONResponse(
+        status_code=200 if readiness["ready"] else 503,
+        content={"status": "ready" if readiness["ready"] else "not_ready", **readiness}
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    families = await tts_engine.get_metrics() if tts_engine else REGISTRY.collect()
+    return PlainTextResponse(render(families), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=settings.PORT,
-        workers=settings.WORKERS,
-        log_level=settings.LOG_LEVEL.lower(),
-        access_log=True
-    )
\ No newline at end of file
+    # One model process shared by all HTTP workers
+    model_server = None
+    if settings.DEPLOYMENT_MODE == "model_server" and settings.MODEL_SERVER_AUTOSTART:
+        model_server = start_model_server_process()
+    
+    try:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=settings.PORT,
+            workers=settings.WORKERS,
+            log_level=settings.LOG_LEVEL.lower(),
+            access_log=True
+        )
+    finally:
+        if model_server is not None:
+            model_server.terminate()
+            model_server.join()
\ No newline at end of file
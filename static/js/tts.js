@@ -32,7 +32,7 @@ function setupParameterListeners() {
 // Load available voices
 async function loadVoices() {
     try {
-        const data = await apiRequest('GET', '/voices/list');
+        const data = await apiRequest('GET', '/voices/list?limit=1000');
         const select = document.getElementById('voiceSelect');
         
         // Clear existing options except default
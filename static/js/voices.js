@@ -10,7 +10,7 @@ async function loadVoiceLibrary() {
     const voiceLibrary = document.getElementById('voiceLibrary');
     
     try {
-        const data = await apiRequest('GET', '/voices/list');
+        const data = await apiRequest('GET', '/voices/list?limit=1000');
         
         if (data.voices.length === 0) {
             voiceLibrary.innerHTML = '<p class="text-muted">No voices cloned yet. Clone your first voice above!</p>';
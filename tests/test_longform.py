@@ -0,0 +1,32 @@
+"""
+Tests for splitting long texts and stitching their audio
+"""
+
+import numpy as np
+import pytest
+
+from app.models.longform import split_text, stitch_segments
+
+
+def test_split_text_keeps_speaker_tags():
+    segments = split_text("[S1] Hello there. How are you? [S2] Fine, thanks.", 20)
+    assert segments == ["[S1] Hello there.", "[S1] How are you?", "[S2] Fine, thanks."]
+
+
+@pytest.mark.parametrize("text", ["[S1]", "[S1] [S2]", " [S2]  "])
+def test_split_text_rejects_tag_only_text(text):
+    with pytest.raises(ValueError, match="speaker tags"):
+        split_text(text, 200)
+
+
+def test_stitch_segments_rejects_no_segments():
+    with pytest.raises(ValueError, match="No segments"):
+        stitch_segments([], 44100, 50, 60.0)
+
+
+def test_stitch_segments_crossfades():
+    rate, crossfade_ms = 1000, 10
+    segments = [np.ones(100, dtype=np.float32), np.ones(100, dtype=np.float32)]
+    audio, truncated = stitch_segments(segments, rate, crossfade_ms, 60.0)
+    assert not truncated
+    assert len(audio) == 200 - rate * crossfade_ms // 1000